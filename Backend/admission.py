@@ -0,0 +1,241 @@
+"""
+Admission control for the expensive endpoints.
+
+/nurseries (Overpass and geocoding), /geocode/batch (rate-limited geocoding),
+/recommend (weather API and the model), /signup, /login and
+/resend-verification (bcrypt and SMTP) and the /export streams cost far more
+than the rest. One worker serves everything, so a few
+clients hammering them would slow every other request down. Each route in
+ROUTE_POLICIES gets:
+
+- token buckets per user and per client IP, so a single caller can't use up
+  the route; an empty bucket answers 429 with Retry-After
+- a concurrency limit with a short wait queue; when the queue is full, or a
+  request waits longer than the policy allows, the answer is 503 with
+  Retry-After
+
+The user is taken from the Authorization header, the user_id URL argument,
+or user_id/email in the request body. Counters for admitted and shed
+requests are reported by admission_stats().
+"""
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "true").lower() == "true"
+ADMISSION_MAX_BUCKETS = int(os.getenv("ADMISSION_MAX_BUCKETS", "10000"))
+# Proxies in front of the app that append to X-Forwarded-For (Render adds one)
+TRUSTED_PROXIES = int(os.getenv("TRUSTED_PROXIES", "1" if os.getenv("ENVIRONMENT") == "production" else "0"))
+
+# rate: tokens per second, burst: bucket size; max_wait in seconds
+RoutePolicy = namedtuple('RoutePolicy', [
+    'user_rate', 'user_burst', 'ip_rate', 'ip_burst', 'max_concurrent', 'max_queue', 'max_wait',
+])
+
+ROUTE_POLICIES = {
+    'get_nurseries': RoutePolicy(user_rate=0.2, user_burst=5, ip_rate=0.5, ip_burst=15,
+                                 max_concurrent=2, max_queue=4, max_wait=5.0),
+    # Uncached points wait a second each on the geocoding rate limiter
+    'geocode_batch': RoutePolicy(user_rate=0.1, user_burst=3, ip_rate=0.2, ip_burst=5,
+                                 max_concurrent=1, max_queue=2, max_wait=3.0),
+    'recommend': RoutePolicy(user_rate=0.5, user_burst=5, ip_rate=1.0, ip_burst=15,
+                             max_concurrent=2, max_queue=4, max_wait=5.0),
+    'signup': RoutePolicy(user_rate=0.05, user_burst=3, ip_rate=0.1, ip_burst=10,
+                          max_concurrent=2, max_queue=2, max_wait=3.0),
+    'login': RoutePolicy(user_rate=0.2, user_burst=5, ip_rate=1.0, ip_burst=20,
+                         max_concurrent=4, max_queue=8, max_wait=3.0),
+    'resend_verification': RoutePolicy(user_rate=0.02, user_burst=2, ip_rate=0.1, ip_burst=5,
+                                       max_concurrent=1, max_queue=2, max_wait=3.0),
+    # Streams hold a database connection for as long as the download lasts
+    'export_users': RoutePolicy(user_rate=0.1, user_burst=5, ip_rate=0.2, ip_burst=10,
+                                max_concurrent=2, max_queue=2, max_wait=3.0),
+    'export_user_data': RoutePolicy(user_rate=0.2, user_burst=10, ip_rate=0.5, ip_burst=20,
+                                    max_concurrent=2, max_queue=4, max_wait=3.0),
+}
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def take(self, now):
+        """Spend a token; returns 0 if there was one, else the seconds until there will be."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class BucketTable:
+    """Token buckets by key, dropping the least recently used past max_buckets."""
+
+    def __init__(self, max_buckets=ADMISSION_MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, capacity):
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(rate, capacity)
+                while len(self._buckets) > self.max_buckets:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket.take(now)
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class RouteGate:
+    """At most max_concurrent requests inside, max_queue more waiting for a slot."""
+
+    def __init__(self, max_concurrent, max_queue):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.active = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def enter(self, timeout):
+        """'admitted', 'queued' (admitted after waiting), 'queue_full' or 'timeout'."""
+        with self._cond:
+            if self.active < self.max_concurrent:
+                self.active += 1
+                return 'admitted'
+            if self.waiting >= self.max_queue:
+                return 'queue_full'
+            self.waiting += 1
+            try:
+                deadline = time.monotonic() + timeout
+                while self.active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return 'timeout'
+                    self._cond.wait(remaining)
+                self.active += 1
+                return 'queued'
+            finally:
+                self.waiting -= 1
+
+    def leave(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+
+class AdmissionStats:
+    OUTCOMES = ('admitted', 'queued', 'user_rate_limited', 'ip_rate_limited', 'queue_full', 'timeout')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def count(self, endpoint, outcome):
+        with self._lock:
+            counts = self._counts.setdefault(endpoint, dict.fromkeys(self.OUTCOMES, 0))
+            counts[outcome] += 1
+
+    def as_dict(self):
+        with self._lock:
+            routes = {endpoint: dict(counts) for endpoint, counts in self._counts.items()}
+        for endpoint, counts in routes.items():
+            total = sum(counts.values())
+            shed = total - counts['admitted'] - counts['queued']
+            counts['shed_ratio'] = round(shed / total, 3) if total else 0.0
+            gate = _gates.get(endpoint)
+            if gate is not None:
+                counts['active'] = gate.active
+                counts['waiting'] = gate.waiting
+        return routes
+
+
+_buckets = BucketTable()
+_gates = {endpoint: RouteGate(policy.max_concurrent, policy.max_queue)
+          for endpoint, policy in ROUTE_POLICIES.items()}
+_stats = AdmissionStats()
+
+
+def admission_stats():
+    """Admitted and shed requests per route, and how full each route is right now."""
+    return {'enabled': ADMISSION_CONTROL, 'buckets': len(_buckets), 'routes': _stats.as_dict()}
+
+
+def client_ip(request):
+    route = request.access_route
+    if TRUSTED_PROXIES and len(route) >= TRUSTED_PROXIES:
+        # The address the outermost trusted proxy saw; entries further left can be forged
+        return route[-TRUSTED_PROXIES]
+    return request.remote_addr or 'unknown'
+
+
+def client_user(request):
+    """Best-effort caller identity: user id or email, or None for anonymous requests."""
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        return auth_header.split(' ', 1)[1]
+    if request.view_args and 'user_id' in request.view_args:
+        return str(request.view_args['user_id'])
+    data = request.get_json(silent=True) if request.is_json else None
+    if isinstance(data, dict):
+        for key in ('user_id', 'email'):
+            if data.get(key):
+                return str(data[key]).strip().lower()
+    return request.args.get('user_id')
+
+
+def _reject(status, retry_after, message):
+    from flask import jsonify
+    response = jsonify({'error': message, 'retry_after': retry_after})
+    response.status_code = status
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def init_app(app):
+    from flask import g, request
+
+    @app.before_request
+    def admit_request():
+        if not ADMISSION_CONTROL or request.method == 'OPTIONS':
+            return None
+        policy = ROUTE_POLICIES.get(request.endpoint)
+        if policy is None:
+            return None
+        endpoint = request.endpoint
+
+        user = client_user(request)
+        if user is not None:
+            wait = _buckets.take((endpoint, 'user', user), policy.user_rate, policy.user_burst)
+            if wait:
+                _stats.count(endpoint, 'user_rate_limited')
+                return _reject(429, math.ceil(wait), 'Too many requests, please slow down')
+        wait = _buckets.take((endpoint, 'ip', client_ip(request)), policy.ip_rate, policy.ip_burst)
+        if wait:
+            _stats.count(endpoint, 'ip_rate_limited')
+            return _reject(429, math.ceil(wait), 'Too many requests, please slow down')
+
+        gate = _gates[endpoint]
+        outcome = gate.enter(policy.max_wait)
+        _stats.count(endpoint, outcome)
+        if outcome in ('queue_full', 'timeout'):
+            return _reject(503, math.ceil(policy.max_wait), 'Server is busy, please try again shortly')
+        g.admission_gate = gate
+        return None
+
+    @app.teardown_request
+    def release_slot(exc):
+        gate = g.pop('admission_gate', None)
+        if gate is not None:
+            gate.leave()
@@ -1,19 +1,23 @@
-from flask import Flask, request, jsonify, g
+from flask import Flask, request, jsonify, g, Response, stream_with_context
 import requests
-import sqlite3
-import psycopg2
 from crops import recommend_crops
+from nurseries import (
+    fetch_nursery_elements, nursery_name, cluster_nurseries,
+    adaptive_nursery_search, ADAPTIVE_DEFAULT_K
+)
 from flask_socketio import SocketIO, join_room, emit
 import time
 import threading
 import os
 import sys
-from functools import lru_cache
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import json
+import base64
 from flask_cors import CORS
 from dotenv import load_dotenv
 import bcrypt
 from datetime import datetime, timedelta
-import math
 import logging
 import traceback
 import random
@@ -31,54 +35,27 @@ if current_dir not in sys.path:
     sys.path.insert(0, current_dir)
 
 # Import database functions
-try:
-    from database_config import get_db, get_cursor
-except ModuleNotFoundError:
-    # If the import fails, define the functions here as fallback
-    def get_db():
-        """Get a database connection based on environment."""
-        is_production = os.getenv("ENVIRONMENT", "development") == "production"
-        db_url = os.getenv("DATABASE_URL")
-        
-        if is_production and db_url and db_url.startswith('postgres'):
-            # PostgreSQL connection (for production on Render)
-            try:
-                # Connect to PostgreSQL
-                import psycopg2
-                from psycopg2.extras import RealDictCursor
-                conn = psycopg2.connect(db_url)
-                conn.autocommit = False
-                return conn
-            except Exception as e:
-                print(f"PostgreSQL connection error: {str(e)}")
-                raise
-        else:
-            # SQLite connection (for development)
-            try:
-                db_path = os.getenv("DATABASE_URL", "PocketFarm.db")
-                conn = sqlite3.connect(db_path, timeout=30)
-                conn.row_factory = sqlite3.Row
-                # Enable WAL mode for better concurrency
-                conn.execute('PRAGMA journal_mode=WAL')
-                # Set busy timeout
-                conn.execute('PRAGMA busy_timeout=30000')
-                return conn
-            except sqlite3.Error as e:
-                print(f"SQLite connection error: {str(e)}")
-                raise
-
-    def get_cursor(conn):
-        """Get an appropriate cursor based on connection type."""
-        if isinstance(conn, psycopg2.extensions.connection):
-            from psycopg2.extras import RealDictCursor
-            return conn.cursor(cursor_factory=RealDictCursor)
-        return conn.cursor()
+from database_config import get_db, get_cursor, init_app as init_db_pool, pool_stats
+from queries import run, insert_returning_id, transaction, as_text, as_bytes
+from migrations import migrate
+from crop_catalog import get_catalog
+from crop_search import get_index as get_crop_search_index
+from crop_views import parse_crop_shape
+from write_queue import execute_write, write_queue_stats
+from notification_retention import start_retention_worker, retention_stats
+import json_provider
+import compression
+import admission
+import exports
 
 # Load environment variables
 load_dotenv()
 
 app = Flask(__name__)
 
+# jsonify() and request.get_json() use orjson when it is installed
+json_provider.init_app(app)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -103,6 +80,27 @@ app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'secret!')
 app.config['CORS_HEADERS'] = 'Content-Type'
 CORS(app, supports_credentials=True, origins=allowed_origins)
 
+# Return pooled database connections at the end of every request
+init_db_pool(app)
+
+# gzip/brotli, ETags and Cache-Control for responses
+compression.init_app(app)
+
+# Rate limits and concurrency caps for the expensive endpoints
+admission.init_app(app)
+
+# Bring the schema up to date; already-applied migrations are skipped
+try:
+    migrate()
+except Exception as e:
+    print(f"Error applying database migrations: {str(e)}")
+
+# Load the crop reference data into memory before the first request
+try:
+    print(f"Loaded {len(get_catalog())} crops into the crop catalog")
+except Exception as e:
+    print(f"Error loading crop catalog: {str(e)}")
+
 # Configure Socket.IO with proper CORS settings
 socketio = SocketIO(app, 
                    cors_allowed_origins=allowed_origins,
@@ -114,7 +112,8 @@ socketio = SocketIO(app,
                    always_connect=True,
                    cors_credentials=True,
                    websocket_ping_interval=25,
-                   manage_session=False)
+                   manage_session=False,
+                   json=json_provider)
 
 # Add CORS headers to all responses
 @app.after_request
@@ -127,6 +126,8 @@ def add_cors_headers(response):
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
     response.headers.add('Access-Control-Allow-Credentials', 'true')
+    # Lets the frontend read the pagination cursor on /notifications
+    response.headers.add('Access-Control-Expose-Headers', 'X-Next-Cursor')
     return response
 
 # Handle preflight OPTIONS requests
@@ -135,6 +136,18 @@ def add_cors_headers(response):
 def handle_options(path):
     return app.make_default_options_response()
 
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Operational counters for monitoring."""
+    return jsonify({
+        'db_pool': pool_stats(),
+        'write_queue': write_queue_stats(),
+        'notification_retention': retention_stats(),
+        'compression': compression.compression_stats(),
+        'admission': admission.admission_stats(),
+        'json_encoder': json_provider.encoder_name(),
+    }), 200
+
 # Socket.IO event handlers
 @socketio.on('connect')
 def handle_connect():
@@ -155,6 +168,18 @@ def on_join(data):
         join_room(room)
         logger.info(f"User {user_id} joined room: {room}")
 
+        # Start the client off with the current count; changes are pushed from then on
+        try:
+            conn = get_db(readonly=True)
+            try:
+                cursor = get_cursor(conn)
+                emit('unread_count', {'user_id': user_id, 'unread': read_unread_count(cursor, user_id)})
+                cursor.close()
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.error(f"Error sending unread count: {str(e)}")
+
 # Use environment variable for API key
 API_KEY = os.getenv("OPENWEATHERMAP_API_KEY")
 if not API_KEY:
@@ -227,6 +252,42 @@ def get_weather_data(location):
         print(f"Error fetching weather data: {e}")
         return None
 
+# Current weather changes slowly; a short cache spares OpenWeatherMap repeat lookups
+WEATHER_CACHE_TTL = int(os.getenv("WEATHER_CACHE_TTL", "600"))  # seconds
+WEATHER_CACHE_SIZE = 500
+
+_weather_cache = OrderedDict()
+_weather_cache_lock = threading.Lock()
+
+def cached_weather_data(location):
+    """get_weather_data() with results kept for WEATHER_CACHE_TTL seconds."""
+    key = location.strip().lower()
+    now = time.monotonic()
+    with _weather_cache_lock:
+        entry = _weather_cache.get(key)
+        if entry is not None and now - entry[0] < WEATHER_CACHE_TTL:
+            _weather_cache.move_to_end(key)
+            return entry[1]
+
+    weather_data = get_weather_data(location)
+    if weather_data:
+        with _weather_cache_lock:
+            _weather_cache[key] = (now, weather_data)
+            _weather_cache.move_to_end(key)
+            while len(_weather_cache) > WEATHER_CACHE_SIZE:
+                _weather_cache.popitem(last=False)
+    return weather_data
+
+def summarize_weather(weather_data):
+    """The fields the app shows from an OpenWeatherMap current weather response."""
+    return {
+        'temp': weather_data['main']['temp'],
+        'condition': weather_data['weather'][0]['main'],
+        'humidity': weather_data['main']['humidity'],
+        'wind_speed': weather_data['wind']['speed'],
+        'icon': weather_data['weather'][0]['icon'],  # Weather icon code
+    }
+
 def get_weather_alerts(location):
     """Fetch weather data using OpenWeatherMap Current Weather Data API (free plan)."""
     url = f"http://api.openweathermap.org/data/2.5/weather?lat={location['lat']}&lon={location['lon']}&appid={API_KEY}&units=metric"
@@ -239,7 +300,7 @@ def get_weather_alerts(location):
         print(f"Error fetching weather data: {e}")
         return None
 
-def check_weather_alerts(weather_data):
+def check_weather_alerts(weather_data, user_id):
     """Check weather conditions against thresholds and return alerts."""
     alerts = []
     
@@ -251,38 +312,34 @@ def check_weather_alerts(weather_data):
     
     # Get current timestamp
     current_time = datetime.now()
-    
-    # Check each threshold
-    for alert_type, threshold_data in WEATHER_ALERT_THRESHOLDS.items():
-        # Check if enough time has passed since last alert
-        conn = get_db()
-        cursor = get_cursor(conn)
-        
+
+    # One connection for the preference check and every cooldown lookup
+    conn = get_db(readonly=True)
+    cursor = get_cursor(conn)
+    try:
         # First check if user has weather alerts enabled
-        cursor.execute("""
-            SELECT weather_alerts FROM notification_preferences 
-            WHERE user_id = ?
-        """, (user_id,))
+        run(cursor, 'weather_alerts_enabled', (user_id,))
         preferences = cursor.fetchone()
-        
+
         if not preferences or not preferences[0]:
-            cursor.close()
-            conn.close()
-            continue
-            
-        # Check if enough time has passed since last alert
-        cursor.execute("""
-            SELECT timestamp FROM notifications 
-            WHERE message LIKE ? AND user_id = ?
-            ORDER BY timestamp DESC LIMIT 1
-        """, (f"%{threshold_data['message']}%", user_id))
-        last_alert = cursor.fetchone()
+            return alerts
+
+        last_alerts = {}
+        for alert_type, threshold_data in WEATHER_ALERT_THRESHOLDS.items():
+            # Check if enough time has passed since last alert
+            run(cursor, 'last_matching_notification', (f"%{threshold_data['message']}%", user_id))
+            last_alerts[alert_type] = cursor.fetchone()
+    finally:
         cursor.close()
         conn.close()
+
+    # Check each threshold
+    for alert_type, threshold_data in WEATHER_ALERT_THRESHOLDS.items():
+        last_alert = last_alerts[alert_type]
         
         # If there's a last alert, check if enough time has passed
         if last_alert:
-            last_alert_time = datetime.strptime(last_alert[0], '%Y-%m-%d %H:%M:%S')
+            last_alert_time = datetime.strptime(as_text(last_alert[0]), '%Y-%m-%d %H:%M:%S')
             hours_since_last_alert = (current_time - last_alert_time).total_seconds() / 3600
             if hours_since_last_alert < threshold_data['cooldown_hours']:
                 continue  # Skip this alert if within cooldown period
@@ -335,17 +392,14 @@ def fetch_weather_alerts():
     while True:
         try:
             # Get all users from the database
-            conn = get_db()
-            cursor = get_cursor(conn)
-            cursor.execute("""
-                SELECT u.id, u.location_latitude, u.location_longitude, np.weather_alerts
-                FROM users u
-                LEFT JOIN notification_preferences np ON u.id = np.user_id
-                WHERE u.location_latitude IS NOT NULL AND u.location_longitude IS NOT NULL
-            """)
-            users = cursor.fetchall()
-            cursor.close()
-            conn.close()
+            conn = get_db(readonly=True)
+            try:
+                cursor = get_cursor(conn)
+                run(cursor, 'users_with_location')
+                users = cursor.fetchall()
+                cursor.close()
+            finally:
+                conn.close()
 
             for user in users:
                 user_id, lat, lon, weather_alerts_enabled = user
@@ -359,7 +413,7 @@ def fetch_weather_alerts():
                 weather_data = get_weather_alerts(location)
                 if weather_data:
                     # Check for weather alerts
-                    alerts = check_weather_alerts(weather_data)
+                    alerts = check_weather_alerts(weather_data, user_id)
                     
                     # Emit both weather data and alerts to specific user
                     socketio.emit('weather_update', {
@@ -371,32 +425,87 @@ def fetch_weather_alerts():
                     # If there are alerts, create notifications and emit them
                     if alerts:
                         # Create notifications in the database
-                        conn = get_db()
-                        cursor = get_cursor(conn)
-                        for alert in alerts:
-                            cursor.execute("""
-                                INSERT INTO notifications (user_id, message)
-                                VALUES (?, ?)
-                            """, (user_id, alert['message']))
-                        cursor.close()
-                        conn.commit()
-                        conn.close()
+                        def insert_alerts(cursor, user_id=user_id, alerts=alerts):
+                            for alert in alerts:
+                                run(cursor, 'insert_notification', (user_id, alert['message']))
+                            return read_unread_count(cursor, user_id)
+                        unread = execute_write(insert_alerts)
                         
                         # Emit alerts for immediate notification
                         socketio.emit('weather_alert', alerts, room=f'user_{user_id}')
+                        emit_unread_count(user_id, unread)
             
             time.sleep(1800)  # Check every 30 minutes
         except Exception as e:
             print(f"Error in fetch_weather_alerts: {str(e)}")
             time.sleep(300)  # Wait 5 minutes before retrying on error
 
-@lru_cache(maxsize=1000)
+# Reverse geocoding cache and rate limiting
+GEOCODE_CACHE_SIZE = 1000
+GEOCODE_MIN_INTERVAL = 1.0  # seconds between uncached lookups (Nominatim allows 1 request/second)
+GEOCODE_BATCH_MAX_POINTS = 100
+GEOCODE_BATCH_MAX_LOOKUPS = 5  # uncached points a non-streamed batch resolves; the rest come back deferred
+GEOCODE_CACHE_PRECISION = 4  # decimal places coordinates are rounded to for caching (~11 m)
+
+_geocode_cache = OrderedDict()
+_geocode_cache_lock = threading.Lock()
+
+class RateLimiter:
+    """Spaces out calls so that at most one happens every `min_interval` seconds."""
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._next_call = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_call - now
+            self._next_call = max(now, self._next_call) + self.min_interval
+        if delay > 0:
+            time.sleep(delay)
+
+geocode_rate_limiter = RateLimiter(GEOCODE_MIN_INTERVAL)
+
+def geocode_key(latitude, longitude):
+    """Coordinates rounded the way every geocode cache lookup rounds them."""
+    return round(float(latitude), GEOCODE_CACHE_PRECISION), round(float(longitude), GEOCODE_CACHE_PRECISION)
+
+def peek_cached_geocode(latitude, longitude, service="openweathermap"):
+    """Return a cached geocode result without calling any external service, or None."""
+    key = (*geocode_key(latitude, longitude), service)
+    with _geocode_cache_lock:
+        result = _geocode_cache.get(key)
+        if result is not None:
+            _geocode_cache.move_to_end(key)
+        return result
+
 def cached_geocode(latitude, longitude, service="openweathermap"):
     """
     Fetch geocode data from OpenWeatherMap (primary) or Nominatim (fallback).
     Caches results to avoid hitting API rate limits.
     """
+    latitude, longitude = geocode_key(latitude, longitude)
+    result = peek_cached_geocode(latitude, longitude, service)
+    if result is not None:
+        return result
+
+    result = fetch_geocode(latitude, longitude, service)
+    with _geocode_cache_lock:
+        _geocode_cache[(latitude, longitude, service)] = result
+        while len(_geocode_cache) > GEOCODE_CACHE_SIZE:
+            _geocode_cache.popitem(last=False)
+    return result
+
+def fetch_geocode(latitude, longitude, service="openweathermap"):
+    """
+    Fetch geocode data from OpenWeatherMap (primary) or Nominatim (fallback), uncached.
+    Every call waits its turn on geocode_rate_limiter, so the limit holds
+    across all callers while cache hits never wait.
+    """
     headers = {"User-Agent": "PocketFarm/1.0 (contact: arjunsanthosh11b2@gmail.com)"}
+    geocode_rate_limiter.wait()
 
     if service == "openweathermap" and API_KEY:
         # Use OpenWeatherMap Geocoding API
@@ -419,6 +528,24 @@ def cached_geocode(latitude, longitude, service="openweathermap"):
     except requests.exceptions.RequestException as e:
         raise Exception(f"Geocoding failed: {e}")
 
+def format_geocode(result):
+    """Extract (city, state, country) from a cached_geocode result."""
+    source = result["source"]
+    geocode_data = result["data"]
+
+    if source == "openweathermap":
+        # Extract details from OpenWeatherMap response
+        city = geocode_data.get('name', 'Unknown City')
+        state = geocode_data.get('state', 'Unknown State')
+        country = geocode_data.get('country', 'Unknown Country')
+    else:
+        # Extract details from Nominatim response
+        address = geocode_data.get('address', {})
+        city = address.get('city') or address.get('town') or address.get('village') or 'Unknown City'
+        state = address.get('state') or 'Unknown State'
+        country = address.get('country') or 'Unknown Country'
+    return city, state, country
+
 @app.route('/geocode', methods=['POST'])
 def geocode():
     """
@@ -432,23 +559,10 @@ def geocode():
 
         # Fetch geocode data (cached)
         result = cached_geocode(latitude, longitude, service="openweathermap")
-        source = result["source"]
-        geocode_data = result["data"]
-
-        if source == "openweathermap":
-            # Extract details from OpenWeatherMap response
-            city = geocode_data.get('name', 'Unknown City')
-            state = geocode_data.get('state', 'Unknown State')
-            country = geocode_data.get('country', 'Unknown Country')
-        else:
-            # Extract details from Nominatim response
-            address = geocode_data.get('address', {})
-            city = address.get('city') or address.get('town') or address.get('village') or 'Unknown City'
-            state = address.get('state') or 'Unknown State'
-            country = address.get('country') or 'Unknown Country'
+        city, state, country = format_geocode(result)
 
         # Log the result for debugging
-        print(f"Geocoded {latitude}, {longitude} using {source}: {city}, {state}, {country}")
+        print(f"Geocoded {latitude}, {longitude} using {result['source']}: {city}, {state}, {country}")
 
         return jsonify({
             'city': city,
@@ -459,7 +573,88 @@ def geocode():
         return jsonify({'error': f"Missing required field: {str(e)}"}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    
+
+@app.route('/geocode/batch', methods=['POST'])
+def geocode_batch():
+    """
+    Reverse geocode a list of {latitude, longitude} points in one request.
+    Points are deduplicated after rounding, cached results are served first and
+    the rest are resolved one at a time through the geocoding rate limiter.
+    Results come back in input order with a per-item status, or as NDJSON lines
+    in resolution order when `stream` is true. Without `stream`, only the first
+    GEOCODE_BATCH_MAX_LOOKUPS uncached points are looked up and the others
+    come back with status 'deferred', so the response can't wait on the rate
+    limiter for long; send them again or stream the batch.
+    """
+    data = request.get_json(silent=True) or {}
+    points = data.get('points')
+    stream = bool(data.get('stream')) or request.args.get('stream') == 'true'
+
+    if not isinstance(points, list) or not points:
+        return jsonify({'error': 'points must be a non-empty list of {latitude, longitude}'}), 400
+    if len(points) > GEOCODE_BATCH_MAX_POINTS:
+        return jsonify({'error': f'At most {GEOCODE_BATCH_MAX_POINTS} points per batch'}), 400
+
+    results = [None] * len(points)
+    pending = {}  # rounded (lat, lon) -> input indexes
+    for index, point in enumerate(points):
+        try:
+            latitude = float(point['latitude'])
+            longitude = float(point['longitude'])
+            if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+                raise ValueError('out of range')
+        except (TypeError, KeyError, ValueError):
+            results[index] = {'index': index, 'status': 'invalid', 'error': 'Invalid latitude/longitude'}
+            continue
+        pending.setdefault(geocode_key(latitude, longitude), []).append(index)
+
+    def resolve(max_lookups=None):
+        """Yield (key, status, result, error) for every unique point, cache hits first."""
+        misses = []
+        for key in pending:
+            result = peek_cached_geocode(*key)
+            if result is not None:
+                yield key, 'cached', result, None
+            else:
+                misses.append(key)
+
+        if max_lookups is not None:
+            # Left for a later request so this one doesn't wait on the rate limiter for long
+            for key in misses[max_lookups:]:
+                yield key, 'deferred', None, None
+            misses = misses[:max_lookups]
+
+        for key in misses:
+            try:
+                yield key, 'ok', cached_geocode(*key), None
+            except Exception as e:
+                yield key, 'error', None, str(e)
+
+    def items(max_lookups=None):
+        """Yield finished result items as their points resolve."""
+        for item in results:
+            if item is not None:
+                yield item
+        for key, status, result, error in resolve(max_lookups):
+            for index in pending[key]:
+                item = {'index': index, 'latitude': key[0], 'longitude': key[1], 'status': status}
+                if result is not None:
+                    item['city'], item['state'], item['country'] = format_geocode(result)
+                elif error is not None:
+                    item['error'] = error
+                results[index] = item
+                yield item
+
+    if stream:
+        def generate():
+            for item in items():
+                yield json_provider.dumps(item) + '\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    for _ in items(GEOCODE_BATCH_MAX_LOOKUPS):
+        pass
+    return jsonify({'results': results}), 200
+
 @app.route('/response', methods=['POST'])
 def handle_response():
     """Handle user response for watering."""
@@ -477,12 +672,10 @@ def handle_response():
         if response.lower() == 'yes':
             # Update last watered date and set next watering date (e.g., 7 days later)
             next_watering_date = time.strftime('%Y-%m-%d', time.localtime(time.time() + 7 * 86400))  # 7 days later
-            cursor.execute("UPDATE users SET last_watered_date=?, next_watering_date=? WHERE device_token=?", 
-                          (current_date, next_watering_date, device_token))
+            run(cursor, 'update_watering_by_device', (current_date, next_watering_date, device_token))
         elif response.lower() == 'no':
             # Set the next watering date to the current date
-            cursor.execute("UPDATE users SET next_watering_date=? WHERE device_token=?", 
-                          (current_date, device_token))
+            run(cursor, 'update_next_watering_by_device', (current_date, device_token))
 
         cursor.close()
         conn.commit()
@@ -520,6 +713,9 @@ def predict():
         return jsonify({'error': str(e)}), 500
 
 
+# Flat recommendation attributes for the summary view, instead of the nested recommended_info
+RECOMMEND_ATTRIBUTE_FIELDS = ('sunlight', 'water_needs', 'soil_type', 'potted', 'avg_area')
+
 @app.route('/recommend', methods=['POST'])
 def recommend():
     try:
@@ -531,6 +727,21 @@ def recommend():
         water_needs = data['water_needs']
         area = data['avg_area']
         include_companions = data.get('include_companions', False)
+
+        # view/fields may come in the body or the query string
+        companions = ('companion_crops',) if include_companions else ()
+        try:
+            shape = parse_crop_shape(
+                data.get('view', request.args.get('view')),
+                data.get('fields', request.args.get('fields')),
+                extra_fields=('recommended_info',) + RECOMMEND_ATTRIBUTE_FIELDS + companions,
+                view_extras={
+                    'summary': RECOMMEND_ATTRIBUTE_FIELDS + companions,
+                    'full': ('recommended_info',) + companions,
+                },
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         # Ensure water_needs and sunlight match the case in crop.csv
         water_needs = water_needs.capitalize()  # Convert to capitalized form (e.g., 'medium' -> 'Medium')
@@ -549,58 +760,44 @@ def recommend():
         # Call the recommend_crops function with actual weather data
         recommended_crops = recommend_crops(sunlight, water_needs, avg_temp, avg_humidity, area, current_month)
         
-        # Connect to the SQLite database
-        conn = get_db()
-        cursor = get_cursor(conn)
+        # Crop details come from the in-memory catalog
+        catalog = get_catalog()
 
         # Prepare a list to hold crop details
         crops_with_details = []
 
         # Fetch details for each recommended crop
         for crop in recommended_crops['Crops']:
-            crop_name = crop['Crop']
-            cursor.execute("SELECT * FROM crops WHERE name = ?", (crop_name,))
-            crop_details = cursor.fetchone()
-            if crop_details:
-                detailed_info = {
-                    'id': crop_details[0],
-                    'name': crop_details[1],
-                    'imageURL': crop_details[2],
-                    'scientific_name': crop_details[3],
-                    'description': crop_details[4],
-                    'origin': crop_details[5],
-                    'growing_conditions': crop_details[6],
-                    'planting_info': crop_details[7],
-                    'care_instructions': crop_details[8],
-                    'storage_info': crop_details[9],
-                    'nutritional_info': crop_details[10],
-                    'culinary_info': crop_details[11],
-                    'recommended_info': {
-                        'Crop': crop['Crop'],
-                        'Avg Area': crop['Avg Area'],
-                        'Drainage': crop['Drainage'],
-                        'Companion Crop 1': crop['Companion Crop 1'],
-                        'Companion Crop 2': crop['Companion Crop 2'],
-                        'Soil Type': crop['Soil Type'],
-                        'Potted': crop['Potted'],
-                        'Sunlight': crop['Sunlight'],
-                        'Water Needs': crop['Water Needs']
-                    }
+            extras = {
+                'sunlight': crop['Sunlight'],
+                'water_needs': crop['Water Needs'],
+                'soil_type': crop['Soil Type'],
+                'potted': crop['Potted'],
+                'avg_area': crop['Avg Area'],
+            }
+            if shape.wants('recommended_info'):
+                extras['recommended_info'] = {
+                    'Crop': crop['Crop'],
+                    'Avg Area': crop['Avg Area'],
+                    'Drainage': crop['Drainage'],
+                    'Companion Crop 1': crop['Companion Crop 1'],
+                    'Companion Crop 2': crop['Companion Crop 2'],
+                    'Soil Type': crop['Soil Type'],
+                    'Potted': crop['Potted'],
+                    'Sunlight': crop['Sunlight'],
+                    'Water Needs': crop['Water Needs']
                 }
 
-                # Add companion crops if requested
-                if include_companions:
-                    companion_crops = []
-                    if crop['Companion Crop 1']:
-                        companion_crops.append(crop['Companion Crop 1'])
-                    if crop['Companion Crop 2']:
-                        companion_crops.append(crop['Companion Crop 2'])
-                    detailed_info['companion_crops'] = companion_crops
+            # Add companion crops if requested
+            if include_companions:
+                extras['companion_crops'] = [
+                    companion for companion in (crop['Companion Crop 1'], crop['Companion Crop 2']) if companion
+                ]
 
+            detailed_info = shape.build(catalog, crop['Crop'], extras)
+            if detailed_info is not None:
                 crops_with_details.append(detailed_info)
 
-        cursor.close()
-        conn.close()
         return jsonify(crops_with_details)
     except KeyError as e:
         return jsonify({'error': f'Missing feature: {str(e)}'}), 400
@@ -613,38 +810,71 @@ def recommend():
 def get_crop_details(crop_name):
     """Get details for a specific crop."""
     try:
-        conn = get_db()
-        cursor = get_cursor(conn)
-        crop_name=crop_name.capitalize()
-        cursor.execute("SELECT * FROM crops WHERE name = ?", (crop_name,))
-        crop = cursor.fetchone()
+        try:
+            shape = parse_crop_shape(request.args.get('view'), request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
-        cursor.close()
-        conn.close()
+        catalog = get_catalog()
+        crop_name=crop_name.capitalize()
+        crop_details = shape.build(catalog, crop_name)
 
-        if crop is None:
+        if crop_details is None:
             return jsonify({'error': 'Crop not found.'}), 404
 
-        crop_details = {
-            'id': crop[0],
-            'name': crop[1],
-            'imageURL': crop[2],
-            'scientific_name': crop[3],
-            'description': crop[4],
-            'origin': crop[5],
-            'growing_conditions': crop[6],
-            'planting_info': crop[7],
-            'care_instructions': crop[8],
-            'storage_info': crop[9],
-            'nutritional_info': crop[10],
-            'culinary_info': crop[11]
-        }
-
-        return jsonify(crop_details)
+        response = jsonify(crop_details)
+        response.headers['Cache-Control'] = 'no-cache'
+        if not shape.is_default:
+            # Other shapes get an ETag hashed from the body by the compression middleware
+            return response
+
+        # Strong ETag so clients can revalidate with If-None-Match and get a 304
+        response.set_etag(catalog.etag(crop_name))
+        return response.make_conditional(request)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+CROP_SEARCH_DEFAULT_LIMIT = 10
+CROP_SEARCH_MAX_LIMIT = 50
+
+@app.route('/crops/search', methods=['GET'])
+def search_crops():
+    """Ranked crops for a search box: ?q=<text>&limit=<n>.
+
+    Matches names and local names by prefix, tolerates typos and plurals, and
+    falls back to the scientific name and description. Each result is the
+    /crop/<name> payload plus its score and the field that matched; view=
+    and fields= trim it as on /crop/<name>.
+    """
+    query = request.args.get('q', '').strip()
+    try:
+        limit = int(request.args.get('limit', CROP_SEARCH_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    if not 1 <= limit <= CROP_SEARCH_MAX_LIMIT:
+        return jsonify({'error': f'limit must be between 1 and {CROP_SEARCH_MAX_LIMIT}'}), 400
+
+    try:
+        shape = parse_crop_shape(request.args.get('view'), request.args.get('fields'),
+                                 extra_fields=('score', 'matched'),
+                                 view_extras={'summary': ('score', 'matched')})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        catalog = get_catalog()
+        results = []
+        for score, name, matched in get_crop_search_index().search(query, limit):
+            crop = shape.build(catalog, name, {'score': round(score, 3), 'matched': matched})
+            if crop is not None:
+                results.append(crop)
+        return jsonify({'query': query, 'results': results}), 200
+    except Exception as e:
+        print(f"Error searching crops: {str(e)}")
+        return jsonify({'error': 'Crop search failed'}), 500
+
+
 @app.route('/add_to_library', methods=['POST'])
 def add_to_library():
     try:
@@ -658,56 +888,35 @@ def add_to_library():
         if not user_id or not crop_name:
             return jsonify({'error': 'Missing required fields: user_id or crop_name'}), 400
 
-        conn = get_db()
-        cursor = get_cursor(conn)
-
-        try:
-            # Start transaction
-            cursor.execute('BEGIN TRANSACTION')
-
+        def add_crop(cursor):
             # Check if the crop exists in the crops table
-            cursor.execute("SELECT id FROM crops WHERE name = ?", (crop_name,))
+            run(cursor, 'crop_id_by_name', (crop_name,))
             crop = cursor.fetchone()
             if not crop:
-                cursor.execute('ROLLBACK')
-                cursor.close()
-                conn.close()
-                return jsonify({'error': f'Crop "{crop_name}" not found in the database'}), 404
+                return 'crop_not_found'
 
             # Check if the user exists
-            cursor.execute("SELECT id FROM users WHERE id = ?", (user_id,))
-            user = cursor.fetchone()
-            if not user:
-                cursor.execute('ROLLBACK')
-                cursor.close()
-                conn.close()
-                return jsonify({'error': f'User with id "{user_id}" not found'}), 404
+            run(cursor, 'user_id_by_id', (user_id,))
+            if not cursor.fetchone():
+                return 'user_not_found'
 
-            # Check if the crop is already in the user's library
-            cursor.execute("SELECT * FROM user_crops WHERE user_id = ? AND crop_id = ?", (user_id, crop[0]))
-            existing_entry = cursor.fetchone()
-            if existing_entry:
-                cursor.execute('COMMIT')
-                cursor.close()
-                conn.close()
-                return jsonify({'message': 'Crop is already in your library!'}), 200
-
-            # Insert the crop into the user's library
-            cursor.execute("INSERT INTO user_crops (user_id, crop_id) VALUES (?, ?)", (user_id, crop[0]))
-
-            # Commit transaction
-            cursor.execute('COMMIT')
-            cursor.close()
-            conn.close()
-            return jsonify({'message': 'Crop added to library successfully!'}), 200
+            # Insert the crop unless it is already in the user's library
+            run(cursor, 'add_user_crop', (user_id, crop[0]))
+            return 'added' if cursor.rowcount else 'exists'
 
+        try:
+            outcome = execute_write(add_crop)
         except Exception as e:
-            # Rollback transaction on error
-            cursor.execute('ROLLBACK')
-            cursor.close()
-            conn.close()
             print(f"Database error in add_to_library: {str(e)}")
             return jsonify({'error': 'Database error occurred'}), 500
+
+        if outcome == 'crop_not_found':
+            return jsonify({'error': f'Crop "{crop_name}" not found in the database'}), 404
+        if outcome == 'user_not_found':
+            return jsonify({'error': f'User with id "{user_id}" not found'}), 404
+        if outcome == 'exists':
+            return jsonify({'message': 'Crop is already in your library!'}), 200
+        return jsonify({'message': 'Crop added to library successfully!'}), 200
     except Exception as e:
         print(f"Error in add_to_library: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -724,26 +933,25 @@ def get_user_crops():
         user_id = auth_header.split(' ')[1]  # Extract user_id from the token
 
         # Connect to the database
-        conn = get_db()
+        conn = get_db(readonly=True)
         cursor = get_cursor(conn)
 
         # Fetch the crops added by the user
-        cursor.execute(
-            "SELECT crops.name FROM user_crops JOIN crops ON user_crops.crop_id = crops.id WHERE user_crops.user_id = ?",
-            (user_id,)
-        )
-        crops = cursor.fetchall()
+        crop_list = read_user_crop_names(cursor, user_id)
 
         cursor.close()
         conn.close()
 
-        # Format the response
-        crop_list = [crop[0] for crop in crops]
         return jsonify(crop_list), 200
     except Exception as e:
         print(f"Database error: {e}")
         return jsonify({'error': 'Database error occurred'}), 500
 
+def read_user_crop_names(cursor, user_id):
+    """Names of the crops in the user's library."""
+    run(cursor, 'user_crop_names', (user_id,))
+    return [crop[0] for crop in cursor.fetchall()]
+
 
 
 @app.route('/signup', methods=['POST'])
@@ -790,11 +998,11 @@ def signup():
         # Check if email already exists
         conn = get_db()
         cursor = get_cursor(conn)
-        cursor.execute("SELECT id FROM users WHERE email = ?", (email,))
+        run(cursor, 'user_id_by_email', (email,))
         existing_user = cursor.fetchone()
+        cursor.close()
+        conn.close()
         if existing_user:
-            cursor.close()
-            conn.close()
             return jsonify({'error': 'Email already registered'}), 409
         
         # Hash the password
@@ -847,26 +1055,21 @@ def signup():
             latitude = 9.9312
             longitude = 76.2673
 
-        # Insert the user into the database with email_verified set to 0 (false)
-        cursor.execute(
-            "INSERT INTO users (name, email, password, phone, location_city, location_state, location_country, location_latitude, location_longitude, email_verified) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0)",
-            (name, email, hashed_password, phone, city, state, country, latitude, longitude)
-        )
-        user_id = cursor.lastrowid
-        
         # Generate verification token
         verification_token = str(uuid.uuid4())
         expires_at = (datetime.now() + timedelta(hours=24)).strftime('%Y-%m-%d %H:%M:%S')
-        
-        # Save token to database
-        cursor.execute(
-            "INSERT INTO verification_tokens (user_id, token, expires_at) VALUES (?, ?, ?)",
-            (user_id, verification_token, expires_at)
-        )
-        
-        cursor.close()
-        conn.commit()
-        conn.close()
+
+        def create_user(cursor):
+            # Insert the user into the database with email_verified set to 0 (false)
+            new_id = insert_returning_id(
+                cursor, 'insert_user',
+                (name, email, hashed_password, phone, city, state, country, latitude, longitude)
+            )
+            # Save token to database
+            run(cursor, 'insert_verification_token', (new_id, verification_token, expires_at))
+            return new_id
+
+        user_id = execute_write(create_user)
         
         # Send verification email
         email_sent = send_verification_email(email, verification_token, user_id)
@@ -913,7 +1116,7 @@ def login():
         # Fetch the user from the database
         conn = get_db()
         cursor = get_cursor(conn)
-        cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
+        run(cursor, 'user_by_email', (email,))
         user = cursor.fetchone()
         cursor.close()
         conn.close()
@@ -922,7 +1125,7 @@ def login():
             return jsonify({'error': 'User not found'}), 404
 
         # Verify the password
-        hashed_password = user[3]  # Password is stored in the 4th column
+        hashed_password = as_bytes(user[3])  # Password is stored in the 4th column
         if not bcrypt.checkpw(password.encode('utf-8'), hashed_password):
             return jsonify({'error': 'Invalid password'}), 401
             
@@ -981,20 +1184,11 @@ def get_weather():
             return jsonify({'error': 'Location is required'}), 400
 
         # Fetch weather data from OpenWeatherMap API
-        weather_data = get_weather_data(location)
+        weather_data = cached_weather_data(location)
         if not weather_data:
             return jsonify({'error': 'Failed to fetch weather data'}), 500
 
-        # Extract relevant weather information
-        weather_info = {
-            'temp': weather_data['main']['temp'],
-            'condition': weather_data['weather'][0]['main'],
-            'humidity': weather_data['main']['humidity'],
-            'wind_speed': weather_data['wind']['speed'],
-            'icon': weather_data['weather'][0]['icon'],  # Weather icon code
-        }
-
-        return jsonify(weather_info), 200
+        return jsonify(summarize_weather(weather_data)), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1008,23 +1202,19 @@ def remove_from_garden():
         if not user_id or not crop_name:
             return jsonify({'error': 'Missing required fields: user_id or crop_name'}), 400
 
-        # Connect to the database
-        conn = get_db()
-        cursor = get_cursor(conn)
+        def remove_crop(cursor):
+            # Fetch the crop ID
+            run(cursor, 'crop_id_by_name', (crop_name,))
+            crop = cursor.fetchone()
+            if not crop:
+                return False
 
-        # Fetch the crop ID
-        cursor.execute("SELECT id FROM crops WHERE name = ?", (crop_name,))
-        crop = cursor.fetchone()
-        if not crop:
-            cursor.close()
-            conn.close()
-            return jsonify({'error': f'Crop "{crop_name}" not found in the database'}), 404
+            # Delete the crop from the user's garden
+            run(cursor, 'remove_user_crop', (user_id, crop[0]))
+            return True
 
-        # Delete the crop from the user's garden
-        cursor.execute("DELETE FROM user_crops WHERE user_id = ? AND crop_id = ?", (user_id, crop[0]))
-        cursor.close()
-        conn.commit()
-        conn.close()
+        if not execute_write(remove_crop):
+            return jsonify({'error': f'Crop "{crop_name}" not found in the database'}), 404
 
         return jsonify({'message': 'Crop removed from garden successfully!'}), 200
     except Exception as e:
@@ -1035,15 +1225,97 @@ def remove_from_garden():
         return jsonify({'error': str(e)}), 500   
     
 
+LIBRARY_BULK_MAX_ITEMS = 100
+
+@app.route('/library/bulk', methods=['POST'])
+def bulk_update_library():
+    """Add and remove several crops in one request and one transaction.
+
+    Body: {"user_id": 1, "add": ["Tomato", ...], "remove": ["Okra", ...]}.
+    Names are resolved case-insensitively against the crop catalog. Repeating
+    a request changes nothing: each item reports what happened to it (added,
+    exists, removed, not_in_library or not_found).
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+
+    user_id = data.get('user_id')
+    add_names = data.get('add') or []
+    remove_names = data.get('remove') or []
+    if not user_id:
+        return jsonify({'error': 'Missing required field: user_id'}), 400
+    if not isinstance(add_names, list) or not isinstance(remove_names, list) \
+            or not all(isinstance(name, str) for name in add_names + remove_names):
+        return jsonify({'error': 'add and remove must be lists of crop names'}), 400
+    if not add_names and not remove_names:
+        return jsonify({'error': 'Nothing to do: add and remove are both empty'}), 400
+    if len(add_names) + len(remove_names) > LIBRARY_BULK_MAX_ITEMS:
+        return jsonify({'error': f'At most {LIBRARY_BULK_MAX_ITEMS} crops per request'}), 400
+
+    catalog = get_catalog()
+    items = [('add', name, catalog.get(name.strip())) for name in add_names]
+    items += [('remove', name, catalog.get(name.strip())) for name in remove_names]
+
+    add_ids = {crop['id'] for action, _, crop in items if crop and action == 'add'}
+    remove_ids = {crop['id'] for action, _, crop in items if crop and action == 'remove'}
+    if add_ids & remove_ids:
+        conflicts = sorted(crop['name'] for _, _, crop in items if crop and crop['id'] in add_ids & remove_ids)
+        return jsonify({'error': f'Crops both added and removed: {", ".join(sorted(set(conflicts)))}'}), 400
+
+    def apply_changes(cursor):
+        run(cursor, 'user_id_by_id', (user_id,))
+        if not cursor.fetchone():
+            return None
+
+        run(cursor, 'user_crop_ids', (user_id,))
+        existing = {row[0] for row in cursor.fetchall()}
+
+        # ON CONFLICT DO NOTHING keeps a concurrent add of the same crop harmless
+        to_add = sorted(add_ids - existing)
+        to_remove = sorted(remove_ids & existing)
+        if to_add:
+            run(cursor, 'add_user_crops', (user_id, json.dumps(to_add)))
+        if to_remove:
+            run(cursor, 'remove_user_crops', (user_id, json.dumps(to_remove)))
+        return existing
+
+    try:
+        existing = execute_write(apply_changes)
+    except Exception as e:
+        print(f"Database error in bulk_update_library: {str(e)}")
+        return jsonify({'error': 'Database error occurred'}), 500
+
+    if existing is None:
+        return jsonify({'error': f'User with id "{user_id}" not found'}), 404
+
+    results = []
+    for action, name, crop in items:
+        if crop is None:
+            outcome = 'not_found'
+        elif action == 'add':
+            outcome = 'exists' if crop['id'] in existing else 'added'
+        else:
+            outcome = 'removed' if crop['id'] in existing else 'not_in_library'
+        results.append({'crop_name': name, 'crop': crop['name'] if crop else None,
+                        'action': action, 'outcome': outcome})
+
+    return jsonify({
+        'results': results,
+        'added': len(add_ids - existing),
+        'removed': len(remove_ids & existing),
+    }), 200
+
+
 @app.route('/user_schedule/<int:user_id>', methods=['GET'])
 def get_user_schedules(user_id):
     try:
         print(f"Fetching schedules for user {user_id}")  # Debug log
-        conn = get_db()
+        conn = get_db(readonly=True)
         cursor = get_cursor(conn)
 
         # First check if the user exists
-        cursor.execute("SELECT id FROM users WHERE id = ?", (user_id,))
+        run(cursor, 'user_id_by_id', (user_id,))
         user = cursor.fetchone()
         if not user:
             print(f"User {user_id} not found")  # Debug log
@@ -1052,36 +1324,17 @@ def get_user_schedules(user_id):
             return jsonify({'error': f'User {user_id} not found'}), 404
 
         # Check if user has any schedules
-        cursor.execute('''
-            SELECT COUNT(*) FROM watering_schedules WHERE user_id = ?
-        ''', (user_id,))
+        run(cursor, 'count_user_schedules', (user_id,))
         schedule_count = cursor.fetchone()[0]
         print(f"Found {schedule_count} schedules for user {user_id}")  # Debug log
 
         # Fetch all schedules for the user with crop details
-        cursor.execute('''
-            SELECT 
-                c.name,
-                c.imageURL,
-                ws.last_watered,
-                ws.next_watering,
-                cs.growing_time,
-                cs.watering_frequency,
-                cs.fertilization_schedule,
-                ws.water_status
-            FROM watering_schedules ws
-            JOIN crops c ON ws.crop_id = c.id
-            JOIN crop_schedule cs ON c.name = cs.crop_name
-            WHERE ws.user_id = ?
-        ''', (user_id,))
-        schedules = cursor.fetchall()
-        print(f"Successfully fetched {len(schedules)} schedules")  # Debug log
+        schedule_list = read_user_schedules(cursor, user_id)
+        print(f"Successfully fetched {len(schedule_list)} schedules")  # Debug log
 
         cursor.close()
         conn.close()
 
-        # Format the response
-        schedule_list = [dict(schedule) for schedule in schedules]
         return jsonify(schedule_list), 200
     except Exception as e:
         print(f"Database error in get_user_schedules: {str(e)}")  # Debug log
@@ -1090,53 +1343,262 @@ def get_user_schedules(user_id):
         print(f"Error in get_user_schedules: {str(e)}")  # Debug log
         return jsonify({'error': str(e)}), 500
 
+def read_user_schedules(cursor, user_id):
+    """The user's watering schedules with crop details, as JSON-ready dicts."""
+    run(cursor, 'user_schedules', (user_id,))
+    return [{key: as_text(value) for key, value in dict(schedule).items()} for schedule in cursor.fetchall()]
+
+NOTIFICATIONS_PAGE_SIZE = int(os.getenv("NOTIFICATIONS_PAGE_SIZE", "50"))
+NOTIFICATIONS_MAX_PAGE_SIZE = int(os.getenv("NOTIFICATIONS_MAX_PAGE_SIZE", "200"))
+
+def encode_notification_cursor(timestamp, notification_id):
+    """Opaque cursor for the (timestamp, id) position of the last notification on a page."""
+    # Keep full precision; PostgreSQL timestamps carry microseconds
+    if isinstance(timestamp, datetime):
+        timestamp = timestamp.isoformat(sep=' ')
+    raw = json.dumps([timestamp, notification_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_notification_cursor(cursor):
+    """(timestamp, id) from a cursor, or ValueError if it isn't one of ours."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, notification_id = json.loads(raw)
+    except Exception:
+        raise ValueError('invalid cursor')
+    if not isinstance(timestamp, str) or not isinstance(notification_id, int):
+        raise ValueError('invalid cursor')
+    return timestamp, notification_id
+
 @app.route('/notifications/<int:user_id>', methods=['GET'])
 def get_user_notifications(user_id):
+    """Newest notifications first, one page at a time.
+
+    Query parameters: limit, before (the X-Next-Cursor of the previous page)
+    and unread_only=true. The body stays a plain list; X-Next-Cursor is only
+    set when there are older notifications.
+    """
     try:
-        print(f"Fetching notifications for user {user_id}")  # Debug log
-        conn = get_db()
+        limit = int(request.args.get('limit', NOTIFICATIONS_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    if not 1 <= limit <= NOTIFICATIONS_MAX_PAGE_SIZE:
+        return jsonify({'error': f'limit must be between 1 and {NOTIFICATIONS_MAX_PAGE_SIZE}'}), 400
+
+    before = request.args.get('before')
+    try:
+        position = decode_notification_cursor(before) if before else None
+    except ValueError:
+        return jsonify({'error': 'before must be a cursor from X-Next-Cursor'}), 400
+
+    unread_only = request.args.get('unread_only', 'false').lower() == 'true'
+
+    try:
+        conn = get_db(readonly=True)
         cursor = get_cursor(conn)
+        notifications, next_cursor = read_notification_page(cursor, user_id, limit, position, unread_only)
 
-        # Get notifications from the database
-        cursor.execute("""
-            SELECT id, message, timestamp, read_status 
-            FROM notifications 
-            WHERE user_id = ? 
-            ORDER BY timestamp DESC
-        """, (user_id,))
-        notifications = cursor.fetchall()
-        print(f"Found {len(notifications) if notifications else 0} notifications")  # Debug log
-
-        # Format notifications
-        formatted_notifications = [{
-            'id': notification[0],
-            'message': notification[1],
-            'timestamp': notification[2],
-            'read': bool(notification[3])  # Map read_status to read
-        } for notification in notifications]
-
-        print(f"Returning formatted notifications: {formatted_notifications}")  # Debug log
-        return jsonify(formatted_notifications)
+        response = jsonify(notifications)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
     except Exception as e:
         print(f"Error fetching notifications: {str(e)}")
         return jsonify({'error': 'Failed to fetch notifications'}), 500
 
+def read_notification_page(cursor, user_id, limit, position=None, unread_only=False):
+    """One page of notifications, newest first, and the cursor for the next page (or None)."""
+    statement = 'user_unread_notifications' if unread_only else 'user_notifications'
+
+    # One extra row tells us whether there is another page
+    if position:
+        run(cursor, statement + '_before', (user_id, position[0], position[1], limit + 1))
+    else:
+        run(cursor, statement, (user_id, limit + 1))
+    notifications = cursor.fetchall()
+
+    next_cursor = None
+    if len(notifications) > limit:
+        notifications = notifications[:limit]
+        last = notifications[-1]
+        next_cursor = encode_notification_cursor(last[2], last[0])
+
+    formatted_notifications = [{
+        'id': notification[0],
+        'message': notification[1],
+        'timestamp': as_text(notification[2]),
+        'read': bool(notification[3]),  # Map read_status to read
+        'count': notification[4]  # Identical reminders folded into this one
+    } for notification in notifications]
+    return formatted_notifications, next_cursor
+
+@app.route('/notifications/<int:user_id>/unread_count', methods=['GET'])
+def get_unread_notification_count(user_id):
+    """Number of unread notifications, read from the user's counter row."""
+    try:
+        conn = get_db(readonly=True)
+        cursor = get_cursor(conn)
+        return jsonify({'unread': read_unread_count(cursor, user_id)})
+    except Exception as e:
+        print(f"Error counting notifications: {str(e)}")
+        return jsonify({'error': 'Failed to count notifications'}), 500
+
+def read_unread_count(cursor, user_id):
+    """The user's unread notification counter (kept up to date by database triggers)."""
+    run(cursor, 'user_unread_counter', (user_id,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+def emit_unread_count(user_id, unread):
+    """Push a changed unread count to the user's Socket.IO room."""
+    socketio.emit('unread_count', {'user_id': user_id, 'unread': unread}, room=f'user_{user_id}')
+
+DASHBOARD_SECTIONS = ('crops', 'schedules', 'notifications', 'weather')
+# Keys fields= can pick per section; crops take crop payload fields (see crop_views)
+DASHBOARD_FIELDS = {
+    'schedules': ('name', 'imageURL', 'last_watered', 'next_watering', 'growing_time',
+                  'watering_frequency', 'fertilization_schedule', 'water_status'),
+    'notifications': ('id', 'message', 'timestamp', 'read', 'count'),
+    'weather': ('temp', 'condition', 'humidity', 'wind_speed', 'icon'),
+}
+DASHBOARD_WEATHER_TIMEOUT = float(os.getenv("DASHBOARD_WEATHER_TIMEOUT", "3"))  # seconds
+
+# /dashboard looks up the weather here while the request thread reads the database
+_dashboard_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='dashboard-weather')
+
+def select_fields(item, fields):
+    """Only the requested keys of a dict."""
+    return {key: value for key, value in item.items() if key in fields}
+
+@app.route('/dashboard/<int:user_id>', methods=['GET'])
+def get_dashboard(user_id):
+    """Everything the home screen loads, in one response.
+
+    Query parameters:
+    - sections: comma-separated subset of crops, schedules, notifications
+      and weather (default: all of them)
+    - fields: comma-separated section.field names such as
+      schedules.name,weather.temp; sections not named keep every field
+    - crop_view: summary or full to get crop payloads instead of names;
+      crops.<field> names in fields pick crop payload fields the same way
+    - limit: size of the notification page
+    - location: where to get the weather for (default: the user's city)
+
+    The database reads share one connection; the weather lookup runs at the
+    same time and is left out if it takes longer than DASHBOARD_WEATHER_TIMEOUT.
+    """
+    sections = [name.strip() for name in request.args.get('sections', ','.join(DASHBOARD_SECTIONS)).split(',') if name.strip()]
+    unknown = set(sections) - set(DASHBOARD_SECTIONS)
+    if unknown:
+        return jsonify({'error': f'Unknown sections: {", ".join(sorted(unknown))}'}), 400
+
+    fields = {}
+    for name in request.args.get('fields', '').split(','):
+        section, _, field = name.strip().partition('.')
+        if not section:
+            continue
+        if section not in DASHBOARD_SECTIONS or not field:
+            return jsonify({'error': 'fields must be section.field names, e.g. schedules.name'}), 400
+        fields.setdefault(section, []).append(field)
+
+    for section, wanted in fields.items():
+        unknown_fields = [field for field in wanted if section != 'crops' and field not in DASHBOARD_FIELDS[section]]
+        if unknown_fields:
+            return jsonify({'error': f"Unknown {section} fields: {', '.join(unknown_fields)}. "
+                                     f"Available: {', '.join(DASHBOARD_FIELDS[section])}"}), 400
+
+    # Crops are plain names unless crop payloads are asked for
+    crop_shape = None
+    if request.args.get('crop_view') or 'crops' in fields:
+        try:
+            crop_shape = parse_crop_shape(request.args.get('crop_view'), fields.pop('crops', None))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+    try:
+        limit = int(request.args.get('limit', NOTIFICATIONS_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    if not 1 <= limit <= NOTIFICATIONS_MAX_PAGE_SIZE:
+        return jsonify({'error': f'limit must be between 1 and {NOTIFICATIONS_MAX_PAGE_SIZE}'}), 400
+
+    dashboard = {'user_id': user_id}
+    weather_future = None
+    try:
+        conn = get_db(readonly=True)
+        cursor = get_cursor(conn)
+
+        run(cursor, 'user_location_by_id', (user_id,))
+        user = cursor.fetchone()
+        if not user:
+            cursor.close()
+            conn.close()
+            return jsonify({'error': f'User {user_id} not found'}), 404
+
+        # Start the weather lookup first so it overlaps with the queries below
+        if 'weather' in sections:
+            location = request.args.get('location') or user[1]
+            if location:
+                weather_future = _dashboard_executor.submit(cached_weather_data, location)
+
+        if 'crops' in sections:
+            dashboard['crops'] = read_user_crop_names(cursor, user_id)
+            if crop_shape is not None:
+                catalog = get_catalog()
+                crops = (crop_shape.build(catalog, name) for name in dashboard['crops'])
+                dashboard['crops'] = [crop for crop in crops if crop is not None]
+        if 'schedules' in sections:
+            dashboard['schedules'] = read_user_schedules(cursor, user_id)
+        if 'notifications' in sections:
+            notifications, next_cursor = read_notification_page(cursor, user_id, limit)
+            dashboard['notifications'] = {
+                'items': notifications,
+                'unread': read_unread_count(cursor, user_id),
+                'next_cursor': next_cursor,
+            }
+
+        cursor.close()
+        conn.close()
+    except Exception as e:
+        print(f"Error loading dashboard: {str(e)}")
+        return jsonify({'error': 'Failed to load dashboard'}), 500
+
+    if 'weather' in sections:
+        dashboard['weather'] = None
+        if weather_future is not None:
+            try:
+                weather_data = weather_future.result(timeout=DASHBOARD_WEATHER_TIMEOUT)
+                if weather_data:
+                    dashboard['weather'] = summarize_weather(weather_data)
+            except FutureTimeout:
+                # The lookup keeps going and fills the cache for the next load
+                print(f"Weather lookup for dashboard of user {user_id} timed out")
+            except Exception as e:
+                print(f"Error fetching weather for dashboard: {str(e)}")
+
+    for section, wanted in fields.items():
+        value = dashboard.get(section)
+        if section == 'notifications' and value:
+            value['items'] = [select_fields(item, wanted) for item in value['items']]
+        elif section == 'schedules' and value:
+            dashboard[section] = [select_fields(item, wanted) for item in value]
+        elif section == 'weather' and value:
+            dashboard[section] = select_fields(value, wanted)
+
+    return jsonify(dashboard), 200
+
 def create_notification(user_id, message):
     """Helper function to create a notification for a user."""
     max_retries = 3
     retry_delay = 1  # seconds
+
+    def insert(cursor):
+        run(cursor, 'insert_notification', (user_id, message))
+        return read_unread_count(cursor, user_id)
     
     for attempt in range(max_retries):
         try:
-            conn = get_db()
-            cursor = get_cursor(conn)
-            cursor.execute("""
-                INSERT INTO notifications (user_id, message)
-                VALUES (?, ?)
-            """, (user_id, message))
-            cursor.close()
-            conn.commit()
-            conn.close()
+            emit_unread_count(user_id, execute_write(insert))
             return
         except Exception as e:
             print(f"Error creating notification: {str(e)}")
@@ -1206,16 +1668,11 @@ def send_verification_email(to_email, verification_token, user_id):
 @app.route('/mark_notifications_read/<int:user_id>', methods=['POST'])
 def mark_notifications_read(user_id):
     try:
-        conn = get_db()
-        cursor = get_cursor(conn)
-        cursor.execute("""
-            UPDATE notifications 
-            SET read_status = 1 
-            WHERE user_id = ? AND read_status = 0
-        """, (user_id,))
-        cursor.close()
-        conn.commit()
-        conn.close()
+        def mark_read(cursor):
+            run(cursor, 'mark_notifications_read', (user_id,))
+            return read_unread_count(cursor, user_id)
+
+        emit_unread_count(user_id, execute_write(mark_read))
         return jsonify({'message': 'All notifications marked as read'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1223,12 +1680,9 @@ def mark_notifications_read(user_id):
 @app.route('/users', methods=['GET'])
 def get_users():
     try:
-        conn = get_db()
+        conn = get_db(readonly=True)
         cursor = get_cursor(conn)
-        cursor.execute("""
-            SELECT id, name, email, location_city, location_state, location_country 
-            FROM users
-        """)
+        run(cursor, 'users_list')
         users = cursor.fetchall()
         cursor.close()
         conn.close()
@@ -1244,6 +1698,95 @@ def get_users():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/export/users', methods=['GET'])
+def export_users():
+    """Every user, streamed as NDJSON (default) or CSV.
+
+    format=json returns one page instead: {"users": [...], "next_after": id},
+    continued with after=<next_after>. after also works with the streamed
+    formats to resume an interrupted download. Needs the export admin token.
+    """
+    denied = exports.export_denied(request.headers)
+    if denied:
+        return jsonify({'error': denied[0]}), denied[1]
+    try:
+        export_format, after, limit = exports.parse_export_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        conn = get_db(readonly=True)
+        if export_format == 'json':
+            users, next_after = exports.read_page(conn, 'export_users', exports.USER_COLUMNS, (after,), limit)
+            conn.close()
+            return jsonify({'users': users, 'next_after': next_after}), 200
+
+        if export_format == 'csv':
+            chunks = exports.csv_chunks(conn, 'export_users', exports.USER_COLUMNS, (after,))
+        else:
+            chunks = exports.ndjson_chunks(conn, [(None, 'export_users', exports.USER_COLUMNS, (after,))])
+        return exports.stream_response(conn, chunks, export_format, 'users')
+    except Exception as e:
+        print(f"Error exporting users: {str(e)}")
+        return jsonify({'error': 'Failed to export users'}), 500
+
+@app.route('/export/users/<int:user_id>', methods=['GET'])
+def export_user_data(user_id):
+    """A user's profile, crops, schedules and notifications (current and archived).
+
+    NDJSON (default) streams every section, or only `section`, one record per
+    line with its section as "type". CSV and format=json need a section; the
+    JSON form is paged with after/next_after like /export/users. Only the
+    user themselves (Bearer <user_id>) or the export admin token may ask.
+    """
+    denied = exports.export_denied(request.headers, user_id)
+    if denied:
+        return jsonify({'error': denied[0]}), denied[1]
+    try:
+        export_format, after, limit = exports.parse_export_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    section = request.args.get('section')
+    if section and section not in exports.USER_DATA_SECTIONS:
+        return jsonify({'error': f"section must be one of {', '.join(exports.USER_DATA_SECTIONS)}"}), 400
+    if export_format != 'ndjson' and not section:
+        return jsonify({'error': f'format={export_format} needs a section'}), 400
+    if after and not section:
+        # Ids are per table, so a position only means something within one section
+        return jsonify({'error': 'after needs a section'}), 400
+
+    try:
+        conn = get_db(readonly=True)
+        cursor = get_cursor(conn)
+        run(cursor, 'export_user_profile', (user_id,))
+        profile = cursor.fetchone()
+        cursor.close()
+        if not profile:
+            conn.close()
+            return jsonify({'error': f'User {user_id} not found'}), 404
+
+        if section:
+            statement, columns = exports.USER_DATA_SECTIONS[section]
+            if export_format == 'json':
+                records, next_after = exports.read_page(conn, statement, columns, (user_id, after), limit)
+                conn.close()
+                return jsonify({section: records, 'next_after': next_after}), 200
+            if export_format == 'csv':
+                chunks = exports.csv_chunks(conn, statement, columns, (user_id, after))
+                return exports.stream_response(conn, chunks, export_format, f'user_{user_id}_{section}')
+
+        if section:
+            sources = [(section, *exports.USER_DATA_SECTIONS[section], (user_id, after))]
+        else:
+            sources = [('user', 'export_user_profile', exports.USER_COLUMNS, (user_id,))]
+            sources += [(name, *exports.USER_DATA_SECTIONS[name], (user_id, 0)) for name in exports.USER_DATA_SECTIONS]
+        chunks = exports.ndjson_chunks(conn, sources)
+        return exports.stream_response(conn, chunks, export_format, f'user_{user_id}')
+    except Exception as e:
+        print(f"Error exporting data for user {user_id}: {str(e)}")
+        return jsonify({'error': 'Failed to export user data'}), 500
+
 @app.route('/verify-email', methods=['GET'])
 def verify_email():
     """Verify user's email address."""
@@ -1258,10 +1801,7 @@ def verify_email():
         cursor = get_cursor(conn)
         
         # Check if the token is valid
-        cursor.execute("""
-            SELECT * FROM verification_tokens 
-            WHERE user_id = ? AND token = ? AND expires_at > datetime('now')
-        """, (user_id, token))
+        run(cursor, 'valid_verification_token', (user_id, token))
         verification = cursor.fetchone()
         
         if not verification:
@@ -1270,17 +1810,10 @@ def verify_email():
             return jsonify({'error': 'Invalid or expired verification link'}), 400
             
         # Update user's verification status
-        cursor.execute("""
-            UPDATE users 
-            SET email_verified = 1 
-            WHERE id = ?
-        """, (user_id,))
+        run(cursor, 'mark_email_verified', (user_id,))
         
         # Delete used token
-        cursor.execute("""
-            DELETE FROM verification_tokens 
-            WHERE user_id = ? AND token = ?
-        """, (user_id, token))
+        run(cursor, 'delete_verification_token', (user_id, token))
         
         cursor.close()
         conn.commit()
@@ -1307,10 +1840,7 @@ def resend_verification():
         cursor = get_cursor(conn)
         
         # Check if user exists and is not already verified
-        cursor.execute("""
-            SELECT id, email_verified FROM users 
-            WHERE email = ?
-        """, (email,))
+        run(cursor, 'user_verification_by_email', (email,))
         user = cursor.fetchone()
         
         if not user:
@@ -1328,20 +1858,14 @@ def resend_verification():
             return jsonify({'message': 'Email is already verified'}), 200
             
         # Delete any existing tokens
-        cursor.execute("""
-            DELETE FROM verification_tokens 
-            WHERE user_id = ?
-        """, (user_id,))
+        run(cursor, 'delete_user_verification_tokens', (user_id,))
         
         # Generate new verification token
         verification_token = str(uuid.uuid4())
         expires_at = (datetime.now() + timedelta(hours=24)).strftime('%Y-%m-%d %H:%M:%S')
         
         # Save token to database
-        cursor.execute("""
-            INSERT INTO verification_tokens (user_id, token, expires_at)
-            VALUES (?, ?, ?)
-        """, (user_id, verification_token, expires_at))
+        run(cursor, 'insert_verification_token', (user_id, verification_token, expires_at))
         
         cursor.close()
         conn.commit()
@@ -1368,107 +1892,87 @@ def get_nurseries():
         # Get coordinates from either query parameters (GET) or request body (POST)
         if request.method == 'POST':
             data = request.get_json()
+            bbox = data.get('bbox', request.args.get('bbox'))
+            zoom = data.get('zoom', request.args.get('zoom'))
+            search_mode = data.get('search', request.args.get('search', 'radius'))
             lat = data.get('latitude')
             lon = data.get('longitude')
+            limit = data.get('limit', request.args.get('limit'))
+            max_distance = data.get('max_distance', request.args.get('max_distance'))
         else:
+            bbox = request.args.get('bbox')  # south,west,north,east
+            zoom = request.args.get('zoom')
+            search_mode = request.args.get('search', 'radius')  # 'radius' or 'adaptive'
             lat = request.args.get('lat')
             lon = request.args.get('lon')
+            limit = request.args.get('limit')
+            max_distance = request.args.get('max_distance')  # in km
         
         radius = request.args.get('radius', '50000')  # 50km radius
 
+        # Map views ask for pre-aggregated clusters instead of individual nurseries
+        if bbox is not None or zoom is not None:
+            return get_nursery_clusters(bbox, zoom)
+
         if not lat or not lon:
             return jsonify({'error': 'Latitude and longitude are required'}), 400
 
-        # Use Overpass API to fetch nurseries with expanded search criteria
-        overpass_url = "http://overpass-api.de/api/interpreter"
-        query = f"""
-        [out:json][timeout:25];
-        (
-          // Garden centers and nurseries
-          node["shop"="garden_centre"](around:{radius},{lat},{lon});
-          node["shop"="plant_nursery"](around:{radius},{lat},{lon});
-          node["shop"="agricultural_supplies"](around:{radius},{lat},{lon});
-          node["shop"="agrarian"](around:{radius},{lat},{lon});
-          node["shop"="farm"](around:{radius},{lat},{lon});
-          node["shop"="seeds"](around:{radius},{lat},{lon});
-          node["shop"="fertilizer"](around:{radius},{lat},{lon});
-          
-          // Plant-related amenities
-          node["amenity"="marketplace"]["plant"](around:{radius},{lat},{lon});
-          node["amenity"="garden_centre"](around:{radius},{lat},{lon});
-          node["amenity"="plant_school"](around:{radius},{lat},{lon});
-          node["amenity"="greenhouse"](around:{radius},{lat},{lon});
-          
-          // Additional plant-related businesses
-          node["shop"="florist"]["plant"](around:{radius},{lat},{lon});
-          node["shop"="garden_furniture"](around:{radius},{lat},{lon});
-          node["shop"="landscape"](around:{radius},{lat},{lon});
-        );
-        out body;
-        >;
-        out skel qt;
-        """
-        
-        response = requests.post(overpass_url, data=query)
-        response.raise_for_status()
-        data = response.json()
+        try:
+            limit = int(limit) if limit is not None else None
+            max_distance = float(max_distance) if max_distance is not None else None
+        except (TypeError, ValueError):
+            return jsonify({'error': 'limit must be an integer and max_distance a number'}), 400
+
+        if (limit is not None and limit < 1) or (max_distance is not None and max_distance < 0):
+            return jsonify({'error': 'limit must be positive and max_distance non-negative'}), 400
+
+        if search_mode not in ('radius', 'adaptive') or not str(radius).isdigit():
+            return jsonify({'error': "search must be 'radius' or 'adaptive' and radius a whole number of meters"}), 400
+
+        if search_mode == 'adaptive':
+            # Grow the search area from a small radius until `limit` nurseries are found
+            limit = limit or ADAPTIVE_DEFAULT_K
+            candidates, search_radius, expansions = adaptive_nursery_search(
+                lat, lon, k=limit, max_radius=int(radius), max_distance=max_distance
+            )
+            search_info = {'mode': 'adaptive', 'radius': search_radius, 'expansions': expansions}
+        else:
+            # Use Overpass API to fetch nurseries with expanded search criteria
+            candidates = fetch_nursery_elements(
+                f"around:{radius},{lat},{lon}", near=(lat, lon), limit=limit, max_distance=max_distance
+            )
+            search_info = {'mode': 'radius', 'radius': int(radius), 'expansions': 0}
 
-        # Format the response
         nurseries = []
-        for element in data.get('elements', []):
-            if 'tags' in element:
-                # Get coordinates from either node or way/relation
-                element_lat = element.get('lat') or element.get('center', {}).get('lat')
-                element_lon = element.get('lon') or element.get('center', {}).get('lon')
-                
-                if element_lat and element_lon:
-                    # Calculate distance using the Haversine formula
-                    R = 6371  # Earth's radius in kilometers
-                    lat1, lon1 = float(lat), float(lon)
-                    lat2, lon2 = float(element_lat), float(element_lon)
-                    
-                    dlat = math.radians(lat2 - lat1)
-                    dlon = math.radians(lon2 - lon1)
-                    a = math.sin(dlat/2) * math.sin(dlat/2) + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon/2) * math.sin(dlon/2)
-                    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-                    distance = R * c
-                    
-                    # Get the name from various possible tags
-                    name = (
-                        element.get('tags', {}).get('name') or
-                        element.get('tags', {}).get('name:en') or
-                        element.get('tags', {}).get('brand') or
-                        element.get('tags', {}).get('shop') or
-                        element.get('tags', {}).get('amenity') or
-                        'Unnamed Garden Center'
-                    )
-                    
-                    # Get basic details first
-                    tags = element.get('tags', {})
-                    phone = tags.get('phone', 'Phone not available')
-                    website = tags.get('website', '')
-                    opening_hours = tags.get('opening_hours', 'Hours not available')
-                    business_type = tags.get('shop') or tags.get('amenity') or 'garden_centre'
-                    
-                    # Initial response with basic address
-                    nursery = {
-                        'id': element.get('id'),
-                        'name': name,
-                        'address': 'Loading address...',  # Initial placeholder
-                        'lat': element_lat,
-                        'lon': element_lon,
-                        'phone': phone,
-                        'website': website,
-                        'opening_hours': opening_hours,
-                        'type': business_type,
-                        'distance': round(distance, 1),
-                        'address_loading': True  # Flag to indicate address is being loaded
-                    }
-                    nurseries.append(nursery)
-
-        # Sort nurseries by distance
-        nurseries.sort(key=lambda x: x['distance'])
-        
+        # Candidates come back nearest first, already limited and measured while parsing
+        for element, element_lat, element_lon, distance in candidates:
+            tags = element.get('tags', {})
+
+            # Get the name from various possible tags
+            name = nursery_name(tags)
+
+            # Get basic details first
+            phone = tags.get('phone', 'Phone not available')
+            website = tags.get('website', '')
+            opening_hours = tags.get('opening_hours', 'Hours not available')
+            business_type = tags.get('shop') or tags.get('amenity') or 'garden_centre'
+
+            # Initial response with basic address
+            nursery = {
+                'id': element.get('id'),
+                'name': name,
+                'address': 'Loading address...',  # Initial placeholder
+                'lat': element_lat,
+                'lon': element_lon,
+                'phone': phone,
+                'website': website,
+                'opening_hours': opening_hours,
+                'type': business_type,
+                'distance': round(distance, 1),
+                'address_loading': True  # Flag to indicate address is being loaded
+            }
+            nurseries.append(nursery)
+
         # Start background thread to update addresses
         def update_addresses():
             for nursery in nurseries:
@@ -1495,65 +1999,80 @@ def get_nurseries():
                     print(f"Error updating address for nursery {nursery['id']}: {str(e)}")
                     nursery['address'] = "Address not available"
                     nursery['address_loading'] = False
-                time.sleep(1)  # Rate limiting between requests
 
         # Start the background thread
         threading.Thread(target=update_addresses, daemon=True).start()
         
-        return jsonify({'nurseries': nurseries}), 200
+        return jsonify({'nurseries': nurseries, 'search': search_info}), 200
         
     except requests.exceptions.RequestException as e:
         return jsonify({'error': f'Failed to fetch nurseries: {str(e)}'}), 500
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def get_nursery_clusters(bbox, zoom):
+    """Return nursery clusters for a map bounding box and zoom level."""
+    try:
+        if isinstance(bbox, str):
+            bbox = bbox.split(',')
+        south, west, north, east = (float(value) for value in bbox)
+        zoom = int(zoom)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'bbox (south,west,north,east) and zoom are required'}), 400
+
+    if not (-90 <= south <= north <= 90 and -180 <= west <= east <= 180) or not 0 <= zoom <= 22:
+        return jsonify({'error': 'Invalid bbox or zoom'}), 400
+
+    # Tiles still loading are reported so the client can ask again shortly
+    clusters, missing_tiles = cluster_nurseries(south, west, north, east, zoom)
+    return jsonify({
+        'zoom': zoom,
+        'bbox': [south, west, north, east],
+        'clusters': clusters,
+        'missing_tiles': missing_tiles,
+    }), 200
+
 @app.route('/clear_notifications/<int:user_id>', methods=['POST'])
 def clear_notifications(user_id):
     try:
-        conn = get_db()
-        cursor = get_cursor(conn)
-        cursor.execute("DELETE FROM notifications WHERE user_id = ?", (user_id,))
-        cursor.close()
-        conn.commit()
-        conn.close()
+        def clear(cursor):
+            run(cursor, 'delete_user_notifications', (user_id,))
+            run(cursor, 'delete_user_archived_notifications', (user_id,))
+            return read_unread_count(cursor, user_id)
+
+        emit_unread_count(user_id, execute_write(clear))
         return jsonify({'message': 'All notifications cleared'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 def check_unwatered_crops():
     """Check for unwatered crops and send notifications."""
-    try:
-        conn = get_db()
-        cursor = get_cursor(conn)
-        
+    def notify_and_postpone(cursor):
         # Get all unwatered crops that are due for watering
-        cursor.execute('''
-            SELECT ws.id, ws.user_id, c.name, ws.next_watering
-            FROM watering_schedules ws
-            JOIN crops c ON ws.crop_id = c.id
-            WHERE ws.water_status = 0 
-            AND ws.next_watering <= date('now')
-        ''')
+        run(cursor, 'due_unwatered_crops')
         unwatered_crops = cursor.fetchall()
+        notified_users = set()
         
         for crop in unwatered_crops:
             schedule_id, user_id, crop_name, next_watering = crop
             
-            # Create notification for unwatered crop
-            notification_message = f"Your {crop_name} needs watering! It was due on {next_watering}."
-            create_notification(user_id, notification_message)
+            # Create notification for unwatered crop. It goes through this
+            # cursor so it commits with the schedule update below instead of
+            # waiting on the write lock this transaction already holds.
+            notification_message = f"Your {crop_name} needs watering! It was due on {as_text(next_watering)}."
+            run(cursor, 'insert_keyed_notification', (user_id, notification_message, f'watering:{crop_name}'))
+            notified_users.add(user_id)
             
             # Update next watering to 3 hours from now
             next_watering = (datetime.now() + timedelta(hours=3)).strftime('%Y-%m-%d %H:%M:%S')
-            cursor.execute('''
-                UPDATE watering_schedules
-                SET next_watering = ?
-                WHERE id = ?
-            ''', (next_watering, schedule_id))
-        
-        cursor.close()
-        conn.commit()
-        conn.close()
+            run(cursor, 'postpone_watering', (next_watering, schedule_id))
+
+        return {user_id: read_unread_count(cursor, user_id) for user_id in notified_users}
+
+    try:
+        # Counts are pushed only once the notifications have committed
+        for user_id, unread in execute_write(notify_and_postpone).items():
+            emit_unread_count(user_id, unread)
     except Exception as e:
         print(f"Error checking unwatered crops: {str(e)}")
 
@@ -1569,17 +2088,18 @@ def verify_database_schema():
         conn = get_db()
         cursor = get_cursor(conn)
         
-        # Check if users table exists
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='users'") if isinstance(conn, sqlite3.Connection) else cursor.execute("SELECT table_name FROM information_schema.tables WHERE table_name = 'users'")
-        
-        if cursor.fetchone() is None:
-            print("Database schema is invalid: users table not found")
-            return False
-            
-        # More schema verification can be added here
-        
-        cursor.close()
-        conn.close()
+        try:
+            # Check if users table exists
+            run(cursor, 'users_table_exists')
+
+            if cursor.fetchone() is None:
+                print("Database schema is invalid: users table not found")
+                return False
+
+            # More schema verification can be added here
+        finally:
+            cursor.close()
+            conn.close()
         return True
     except Exception as e:
         print(f"Database schema verification error: {str(e)}")
@@ -1603,7 +2123,7 @@ def google_auth():
         cursor = get_cursor(conn)
         
         # Check if user exists
-        cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
+        run(cursor, 'user_by_email', (email,))
         user = cursor.fetchone()
         
         if not user:
@@ -1618,22 +2138,20 @@ def google_auth():
             latitude = 9.9312
             longitude = 76.2673
             
-            cursor.execute(
-                "INSERT INTO users (name, email, password, location_city, location_state, location_country, location_latitude, location_longitude, email_verified) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1)",
-                (name, email, hashed_password, city, state, country, latitude, longitude)
-            )
+            run(cursor, 'insert_google_user',
+                (name, email, hashed_password, city, state, country, latitude, longitude))
             conn.commit()
             
             # Get the newly created user
-            cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
+            run(cursor, 'user_by_email', (email,))
             user = cursor.fetchone()
         elif user and len(user) > 10 and user[10] == 0:
             # If user exists but email not verified, mark as verified now
-            cursor.execute("UPDATE users SET email_verified = 1 WHERE id = ?", (user[0],))
+            run(cursor, 'mark_email_verified', (user[0],))
             conn.commit()
             
             # Refresh user data
-            cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
+            run(cursor, 'user_by_email', (email,))
             user = cursor.fetchone()
             
         cursor.close()
@@ -1673,33 +2191,30 @@ def delete_account():
         cursor = get_cursor(conn)
         
         try:
-            # Start transaction for atomicity
-            cursor.execute('BEGIN TRANSACTION')
-            
-            # Delete verification tokens
-            cursor.execute("DELETE FROM verification_tokens WHERE user_id = ?", (user_id,))
-            
-            # Delete notifications
-            cursor.execute("DELETE FROM notifications WHERE user_id = ?", (user_id,))
-            
-            # Delete watering schedules
-            cursor.execute("DELETE FROM watering_schedules WHERE user_id = ?", (user_id,))
-            
-            # Delete user crops
-            cursor.execute("DELETE FROM user_crops WHERE user_id = ?", (user_id,))
-            
-            # Delete user account
-            cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
-            
-            # Commit all changes
-            cursor.execute('COMMIT')
+            # One transaction for atomicity
+            with transaction(conn):
+                # Delete verification tokens
+                run(cursor, 'delete_user_verification_tokens', (user_id,))
+                
+                # Delete notifications
+                run(cursor, 'delete_user_notifications', (user_id,))
+                run(cursor, 'delete_user_archived_notifications', (user_id,))
+                run(cursor, 'delete_user_notification_counter', (user_id,))
+                
+                # Delete watering schedules
+                run(cursor, 'delete_user_schedules', (user_id,))
+                
+                # Delete user crops
+                run(cursor, 'delete_user_crops', (user_id,))
+                
+                # Delete user account
+                run(cursor, 'delete_user', (user_id,))
             
             logger.info(f"Account deleted for user ID: {user_id}")
             return jsonify({'message': 'Account and all associated data have been deleted successfully'}), 200
             
         except Exception as e:
-            # Rollback in case of error
-            cursor.execute('ROLLBACK')
+            # transaction() has already rolled back
             logger.error(f"Error during account deletion: {str(e)}")
             return jsonify({'error': f'Failed to delete account: {str(e)}'}), 500
         finally:
@@ -1722,6 +2237,9 @@ if __name__ == '__main__':
     # Start the background thread to fetch weather data
     threading.Thread(target=fetch_weather_alerts, daemon=True).start()
     
+    # Start the background thread that archives and coalesces old notifications
+    threading.Thread(target=start_retention_worker, args=(emit_unread_count,), daemon=True).start()
+    
     # Run the Flask app with SocketIO
     port = int(os.getenv("PORT", 5000))
     if is_production:
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+What admission control does for everyone else when a few clients hammer an
+expensive endpoint.
+
+A stand-in for /recommend burns a fixed amount of CPU, like the model and
+bcrypt do. It is registered under the 'recommend' endpoint so it gets that
+route's policy. Abusive clients call it in a tight loop while one well-behaved
+client polls a cheap endpoint. Each round runs with admission control off
+and then on. It reports the cheap endpoint's latency, how much of the worker
+the expensive calls used, and how they were answered.
+
+Usage: python benchmarks/bench_admission.py [abusers] [seconds] [work_ms]
+"""
+
+import collections
+import os
+import statistics
+import sys
+import threading
+import time
+
+# Add the Backend directory to the path so the app modules can be imported
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from flask import Flask, jsonify
+
+import admission
+
+
+def calibrate(work_seconds):
+    """Loop count that takes work_seconds of CPU on this machine when run alone."""
+    start = time.perf_counter()
+    for _ in range(200):
+        sum(range(1000))
+    return max(1, int(200 * work_seconds / (time.perf_counter() - start)))
+
+
+cpu_used = []
+
+
+def build_app(work_seconds):
+    app = Flask(__name__)
+    admission.init_app(app)
+    loops = calibrate(work_seconds)
+
+    @app.route('/recommend', methods=['POST'], endpoint='recommend')
+    def expensive():
+        # A fixed amount of work, so concurrent calls really compete for the GIL
+        start = time.thread_time()
+        total = 0
+        for _ in range(loops):
+            total += sum(range(1000))
+        cpu_used.append(time.thread_time() - start)
+        return jsonify({'ok': total > 0})
+
+    @app.route('/cheap', methods=['GET'])
+    def cheap():
+        return jsonify({'ok': True})
+
+    return app
+
+
+def run_round(app, abusers, seconds):
+    stop = time.monotonic() + seconds
+    answers = collections.Counter()
+    latencies = []
+
+    def abuse(i):
+        client = app.test_client()
+        while time.monotonic() < stop:
+            response = client.post('/recommend', json={'user_id': i},
+                                   environ_base={'REMOTE_ADDR': f'10.0.0.{i % 4}'})
+            answers[response.status_code] += 1
+            if response.status_code != 200:
+                # A polite client would honour Retry-After; abusers just back off a little
+                time.sleep(0.01)
+
+    def poll():
+        client = app.test_client()
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            client.get('/cheap')
+            latencies.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.02)
+
+    threads = [threading.Thread(target=abuse, args=(i,)) for i in range(abusers)]
+    threads.append(threading.Thread(target=poll))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return answers, statistics.median(latencies), latencies[int(len(latencies) * 0.95)]
+
+
+def main():
+    abusers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    work = (float(sys.argv[3]) if len(sys.argv) > 3 else 30) / 1000
+    app = build_app(work)
+
+    print(f"{abusers} abusive clients, {seconds:.0f} s per round, {work * 1000:.0f} ms CPU per expensive call\n")
+    print(f"{'admission':<10} {'cheap p50 ms':>13} {'cheap p95 ms':>13} {'worker busy':>12}  expensive calls by status")
+    for enabled in (False, True):
+        admission.ADMISSION_CONTROL = enabled
+        admission._buckets = admission.BucketTable()
+        cpu_used.clear()
+        answers, p50, p95 = run_round(app, abusers, seconds)
+        # CPU the expensive calls took, as a share of the round
+        busy = sum(cpu_used) / seconds
+        print(f"{'on' if enabled else 'off':<10} {p50:>13.2f} {p95:>13.2f} {busy:>11.0%}  {dict(sorted(answers.items()))}")
+    print(f"\n{admission.admission_stats()['routes']}")
+
+
+if __name__ == '__main__':
+    main()
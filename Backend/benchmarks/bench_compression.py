@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Measure bytes on the wire per endpoint with compression.py: the identity
+size, the gzip size at a few levels, and brotli when it is installed, plus
+the time each takes. Payloads are the ones from bench_json.py, encoded the
+way jsonify() does in production.
+
+Usage: python benchmarks/bench_compression.py [repeats]
+"""
+
+import gzip
+import os
+import random
+import sys
+import time
+
+# Add the Backend directory to the path so the app modules can be imported
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from flask import Flask
+
+import compression
+import json_provider
+from bench_json import nurseries_payload, notifications_payload, users_payload, recommend_payload
+
+
+def measure(compress, data, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        out = compress(data)
+    return len(out), (time.perf_counter() - start) * 1e6 / repeats
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    random.seed(3)
+    provider = json_provider.FastJSONProvider(Flask(__name__))
+
+    payloads = [
+        ('/nurseries', nurseries_payload()),
+        ('/notifications', notifications_payload(50)),
+        ('/users', users_payload()),
+        ('/recommend', recommend_payload()),
+    ]
+    codecs = [(f'gzip-{level}', lambda data, level=level: gzip.compress(data, compresslevel=level, mtime=0))
+              for level in (1, compression.COMPRESS_LEVEL, 9)]
+    if compression.brotli is not None:
+        codecs.append((f'br-{compression.BROTLI_QUALITY}', lambda data: compression.compress_body(data, 'br')))
+    else:
+        print("brotli is not installed; gzip only\n")
+
+    print(f"{'endpoint':<16} {'codec':<8} {'bytes':>9} {'ratio':>7} {'us':>9}")
+    for label, payload in payloads:
+        data = provider.dumps(payload, separators=(',', ':')).encode()
+        print(f"{label:<16} {'identity':<8} {len(data):>9} {1:>7.3f} {0:>9.1f}")
+        for name, compress in codecs:
+            size, micros = measure(compress, data, repeats)
+            print(f"{'':<16} {name:<8} {size:>9} {size / len(data):>7.3f} {micros:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
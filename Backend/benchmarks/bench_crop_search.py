@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Per-keystroke latency of crop_search.CropSearchIndex, with a linear
+difflib scan over the same fields as a baseline.
+
+Each query is typed one character at a time and every prefix is searched,
+the way the search box calls /crops/search. The index is built from
+cropdata.csv and the aliases in crop.csv, so no database is needed.
+
+Usage: python benchmarks/bench_crop_search.py [rounds]
+"""
+
+import csv
+import difflib
+import os
+import statistics
+import sys
+import time
+
+# Add the Backend directory to the path so the app modules can be imported
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from crop_search import CropSearchIndex, load_aliases
+
+QUERIES = ['okra (bhindi)', 'tomatoes', 'lemn', 'solanum', 'sweet potato', 'tulsi', 'curry leaf', 'cabage']
+
+
+def linear_scan(crops, query, limit=10):
+    query = query.casefold()
+    scored = []
+    for crop in crops:
+        score = max(
+            difflib.SequenceMatcher(None, query, crop['name'].casefold()).ratio(),
+            0.7 * difflib.SequenceMatcher(None, query, (crop['scientific_name'] or '').casefold()).ratio(),
+            0.5 * difflib.SequenceMatcher(None, query, (crop['description'] or '').casefold()).ratio(),
+        )
+        scored.append((score, crop['name']))
+    scored.sort(key=lambda hit: (-hit[0], hit[1]))
+    return scored[:limit]
+
+
+def keystrokes(search, rounds):
+    timings = []
+    for _ in range(rounds):
+        for query in QUERIES:
+            for end in range(1, len(query) + 1):
+                start = time.perf_counter()
+                search(query[:end])
+                timings.append((time.perf_counter() - start) * 1e6)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99)], timings[-1]
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    with open(os.path.join(backend_dir, 'cropdata.csv'), newline='', encoding='utf-8') as f:
+        crops = list(csv.DictReader(f))
+
+    start = time.perf_counter()
+    index = CropSearchIndex(crops, load_aliases())
+    print(f"indexed {len(index)} crops in {(time.perf_counter() - start) * 1000:.1f} ms\n")
+
+    print(f"{'method':<14} {'p50 us':>9} {'p99 us':>9} {'max us':>9}")
+    for label, search in (('index', index.search), ('linear difflib', lambda q: linear_scan(crops, q))):
+        p50, p99, worst = keystrokes(search, rounds if label == 'index' else max(1, rounds // 10))
+        print(f"{label:<14} {p50:>9.1f} {p99:>9.1f} {worst:>9.1f}")
+
+    print()
+    for query in QUERIES:
+        print(f"{query!r:<16} {[name for _, name, _ in index.search(query, 3)]}")
+
+
+if __name__ == '__main__':
+    main()
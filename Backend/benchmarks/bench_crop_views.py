@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Payload size and build + serialize time of a /recommend-shaped response
+for each crop view: full (the default), summary, and an explicit field list.
+
+The catalog is built from cropdata.csv and every crop is "recommended", with
+the recommendation attributes /recommend adds, so no database or model is
+needed.
+
+Usage: python benchmarks/bench_crop_views.py [repeats]
+"""
+
+import csv
+import os
+import sys
+import time
+
+# Add the Backend directory to the path so the app modules can be imported
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from flask import Flask
+
+import json_provider
+from crop_catalog import CROP_FIELDS, CropCatalog
+from crop_views import parse_crop_shape
+
+ATTRIBUTES = ('sunlight', 'water_needs', 'soil_type', 'potted', 'avg_area')
+
+
+def load_catalog():
+    with open(os.path.join(backend_dir, 'cropdata.csv'), newline='', encoding='utf-8') as f:
+        rows = [(i, *(row[field] for field in CROP_FIELDS[1:])) for i, row in enumerate(csv.DictReader(f), 1)]
+    return CropCatalog(rows, [], 1)
+
+
+def recommendations(catalog):
+    crops = []
+    for name in catalog.names():
+        info = {'Crop': name, 'Avg Area': 3, 'Drainage': 'Well-drained', 'Companion Crop 1': 'Basil',
+                'Companion Crop 2': 'Carrot', 'Soil Type': 'Loamy', 'Potted': 'Yes', 'Sunlight': 'Full',
+                'Water Needs': 'Medium'}
+        crops.append((name, {'recommended_info': info, 'sunlight': 'Full', 'water_needs': 'Medium',
+                             'soil_type': 'Loamy', 'potted': 'Yes', 'avg_area': 3}))
+    return crops
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    catalog = load_catalog()
+    crops = recommendations(catalog)
+    provider = json_provider.FastJSONProvider(Flask(__name__))
+    extra_fields = ('recommended_info',) + ATTRIBUTES
+
+    shapes = [
+        ('full', parse_crop_shape('full', None, extra_fields, {'summary': ATTRIBUTES, 'full': ('recommended_info',)})),
+        ('summary', parse_crop_shape('summary', None, extra_fields, {'summary': ATTRIBUTES, 'full': ('recommended_info',)})),
+        ('fields=name,imageURL,sunlight', parse_crop_shape(None, 'name,imageURL,sunlight', extra_fields)),
+    ]
+
+    print(f"{len(crops)} crops, encoder {json_provider.encoder_name()}, {repeats} repeats\n")
+    print(f"{'view':<32} {'bytes':>8} {'share':>7} {'us':>9}")
+    baseline = None
+    for label, shape in shapes:
+        start = time.perf_counter()
+        for _ in range(repeats):
+            body = provider.dumps([shape.build(catalog, name, extras) for name, extras in crops],
+                                  separators=(',', ':'))
+        micros = (time.perf_counter() - start) * 1e6 / repeats
+        size = len(body.encode())
+        baseline = baseline or size
+        print(f"{label:<32} {size:>8} {size / baseline:>7.2f} {micros:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Compare the home screen's startup fan-out (/get_user_crops,
+/user_schedule/<id>, /notifications/<id> and /weather, one after the
+other) with a single /dashboard/<id> call.
+
+Runs the app in-process against a copy of the database. OpenWeatherMap is
+replaced by a stub that sleeps for the given latency, so the numbers show
+what overlapping the weather lookup with the queries buys. The weather
+cache is cleared before every round to measure a cold start; pass --warm
+to keep it.
+
+Usage: python benchmarks/bench_dashboard.py [db_path] [weather_latency_ms] [repeats] [--warm]
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+# Add the Backend directory to the path so the app modules can be imported
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+WEATHER = {
+    'main': {'temp': 29.4, 'humidity': 84},
+    'weather': [{'main': 'Rain', 'icon': '10d'}],
+    'wind': {'speed': 5.2},
+}
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    warm = '--warm' in sys.argv
+    source = args[0] if args else os.path.join(backend_dir, 'PocketFarm.db')
+    latency = (float(args[1]) if len(args) > 1 else 150) / 1000
+    repeats = int(args[2]) if len(args) > 2 else 20
+
+    # app.py migrates DATABASE_URL on import, so point it at a scratch copy
+    workdir = tempfile.mkdtemp()
+    db_path = os.path.join(workdir, 'PocketFarm.db')
+    shutil.copy(source, db_path)
+    os.environ['DATABASE_URL'] = db_path
+    import app as backend
+
+    def stub_weather(location):
+        time.sleep(latency)
+        return WEATHER
+    backend.get_weather_data = stub_weather
+
+    user_id = sqlite3.connect(db_path).execute(
+        "SELECT user_id FROM watering_schedules GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT 1"
+    ).fetchone()[0]
+    client = backend.app.test_client()
+
+    def fan_out():
+        client.get('/get_user_crops', headers={'Authorization': f'Bearer {user_id}'})
+        client.get(f'/user_schedule/{user_id}')
+        client.get(f'/notifications/{user_id}')
+        client.post('/weather', json={'location': 'Kochi'})
+
+    def dashboard():
+        client.get(f'/dashboard/{user_id}?location=Kochi')
+
+    try:
+        print(f"user {user_id}, weather latency {latency * 1000:.0f} ms, {'warm' if warm else 'cold'} weather cache\n")
+        for label, load in (('fan-out (4 requests)', fan_out), ('/dashboard', dashboard)):
+            total = 0.0
+            for _ in range(repeats):
+                if not warm:
+                    backend._weather_cache.clear()
+                start = time.perf_counter()
+                load()
+                total += time.perf_counter() - start
+            print(f"{label:<22} {total * 1000 / repeats:>8.1f} ms per load")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Peak memory and time of listing every user with /users (fetchall + jsonify)
+versus streaming them with /export/users as NDJSON and CSV.
+
+Runs the app in-process against a scratch copy of the database, padded with
+synthetic users so the difference shows. Peak memory is what tracemalloc
+sees while the whole response body is read, chunk by chunk for the streams.
+
+Usage: python benchmarks/bench_exports.py [db_path] [users]
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Add the Backend directory to the path so the app modules can be imported
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+
+def add_users(db_path, count):
+    db = sqlite3.connect(db_path)
+    db.executemany(
+        "INSERT INTO users (name, email, password, phone, location_city, location_state, location_country) "
+        "VALUES (?, ?, 'x', ?, 'Pune', 'Maharashtra', 'India')",
+        ((f'Bench User {i}', f'bench{i}@example.com', f'+91{i:010d}') for i in range(count)))
+    db.commit()
+    db.close()
+
+
+def measure(client, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(path, buffered=False, headers={'Authorization': 'Bearer bench-admin'})
+    size = sum(len(chunk) for chunk in response.response)
+    response.close()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size, elapsed, peak
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else os.path.join(backend_dir, 'PocketFarm.db')
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+
+    # app.py migrates DATABASE_URL on import, so point it at a scratch copy
+    workdir = tempfile.mkdtemp()
+    db_path = os.path.join(workdir, 'PocketFarm.db')
+    shutil.copy(source, db_path)
+    os.environ['DATABASE_URL'] = db_path
+    os.environ['ADMISSION_CONTROL'] = 'false'
+    os.environ['EXPORT_ADMIN_TOKEN'] = 'bench-admin'
+    import app as backend
+
+    try:
+        add_users(db_path, count)
+        client = backend.app.test_client()
+        print(f"{count} synthetic users, batches of {backend.exports.EXPORT_BATCH_SIZE}\n")
+        print(f"{'endpoint':<28} {'bytes':>11} {'ms':>9} {'peak MiB':>9}")
+        for path in ('/users', '/export/users', '/export/users?format=csv'):
+            size, elapsed, peak = measure(client, path)
+            print(f"{path:<28} {size:>11} {elapsed * 1000:>9.1f} {peak / 2**20:>9.2f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Time the hot queries against a large synthetic SQLite database with and
+without the hot-path indexes (migrations 3 and 7), and show the query plan
+each ends up with. The statements come from queries.py, so they are the ones
+the app runs. "Before" is the latest schema with those indexes dropped and
+the baseline water_status index put back.
+
+Usage: python benchmarks/bench_indexes.py [user_count] [notifications_per_user]
+"""
+
+import itertools
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Add the Backend directory to the path so the app modules can be imported
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from migrations import migrate
+from queries import render
+
+# Indexes added by the hot-path index migrations
+HOT_INDEXES = [
+    'idx_notifications_user_timestamp_id',
+    'idx_notifications_user_unread',
+    'idx_verification_tokens_user_token',
+    'idx_watering_schedules_due',
+    'idx_notification_preferences_user_id',
+]
+BASELINE_INDEX = 'CREATE INDEX idx_watering_schedules_water_status ON watering_schedules(water_status)'
+REPEATS = 200
+
+
+def populate(conn, user_count, notifications_per_user):
+    """Fill the tables the hot queries touch with realistic-looking rows."""
+    random.seed(42)
+    now = datetime.now()
+
+    conn.executemany(
+        "INSERT INTO users (id, name, email, password, location_latitude, location_longitude) VALUES (?, ?, ?, ?, ?, ?)",
+        ((i, f'User {i}', f'user{i}@example.com', 'x', 9.9, 76.2) for i in range(1, user_count + 1))
+    )
+    conn.executemany(
+        "INSERT INTO notification_preferences (user_id, weather_alerts) VALUES (?, 1)",
+        ((i,) for i in range(1, user_count + 1))
+    )
+    conn.executemany(
+        "INSERT INTO crops (id, name) VALUES (?, ?)",
+        ((i, f'Crop {i}') for i in range(1, 76))
+    )
+
+    messages = [
+        'Heavy rain expected! Ensure proper drainage.',
+        'High temperature alert! Provide shade for your plants.',
+        'Strong winds expected! Secure your plants.',
+        'Your Tomato needs watering!',
+    ]
+
+    def notifications():
+        for user_id in range(1, user_count + 1):
+            for _ in range(notifications_per_user):
+                stamp = now - timedelta(minutes=random.randint(0, 60 * 24 * 365))
+                yield (user_id, random.choice(messages), stamp.strftime('%Y-%m-%d %H:%M:%S'), random.random() < 0.8)
+
+    conn.executemany(
+        "INSERT INTO notifications (user_id, message, timestamp, read_status) VALUES (?, ?, ?, ?)",
+        notifications()
+    )
+
+    def tokens():
+        for user_id in range(1, user_count + 1):
+            for _ in range(3):
+                yield (user_id, f'{user_id}-{random.getrandbits(64):x}', '2099-01-01 00:00:00')
+
+    conn.executemany(
+        "INSERT INTO verification_tokens (user_id, token, expires_at) VALUES (?, ?, ?)",
+        tokens()
+    )
+
+    def schedules():
+        for user_id in range(1, user_count + 1):
+            for crop_id in random.sample(range(1, 76), 10):
+                due = (now + timedelta(days=random.randint(-3, 14))).strftime('%Y-%m-%d')
+                # Most crops have been watered; only a few are waiting
+                yield (user_id, crop_id, (now - timedelta(days=7)).strftime('%Y-%m-%d'), due, random.random() < 0.95)
+
+    conn.executemany(
+        "INSERT INTO watering_schedules (user_id, crop_id, last_watered, next_watering, water_status) VALUES (?, ?, ?, ?, ?)",
+        schedules()
+    )
+    conn.commit()
+
+
+def hot_queries(conn, user_count):
+    """(label, statement name, params factory, is_write) for every hot query."""
+    token_rows = conn.execute("SELECT user_id, token FROM verification_tokens ORDER BY random() LIMIT ?", (REPEATS,)).fetchall()
+
+    def user():
+        return (random.randint(1, user_count),)
+
+    # A cursor half a year back, as if the user had paged through recent notifications
+    middle = (datetime.now() - timedelta(days=182)).strftime('%Y-%m-%d %H:%M:%S')
+
+    tokens = itertools.cycle([tuple(row) for row in token_rows])
+
+    def token():
+        return next(tokens)
+
+    return [
+        ('GET /notifications', 'user_notifications', lambda: user() + (50,), False),
+        ('GET /notifications?before=', 'user_notifications_before', lambda: user() + (middle, 2 ** 62, 50), False),
+        ('alert cooldown lookup', 'last_matching_notification', lambda: ('%Strong winds expected!%',) + user(), False),
+        ('mark_notifications_read', 'mark_notifications_read', user, True),
+        ('clear_notifications', 'delete_user_notifications', user, True),
+        ('verify-email token check', 'valid_verification_token', token, False),
+        ('weather alert preference', 'weather_alerts_enabled', user, False),
+        ('check_unwatered_crops', 'due_unwatered_crops', lambda: (), False),
+    ]
+
+
+def time_query(conn, name, params, is_write, repeats):
+    sql = render(name, 'sqlite')
+    start = time.perf_counter()
+    for _ in range(repeats):
+        conn.execute(sql, params()).fetchall()
+        if is_write:
+            # Leave the data as it was so every run sees the same rows
+            conn.rollback()
+    return (time.perf_counter() - start) * 1000 / repeats
+
+
+def query_plan(conn, name, params):
+    rows = conn.execute('EXPLAIN QUERY PLAN ' + render(name, 'sqlite'), params()).fetchall()
+    return '; '.join(row[-1] for row in rows)
+
+
+def run_pass(conn, queries):
+    results = {}
+    for label, name, params, is_write in queries:
+        # The full-table due-crops scan is slow without an index; fewer repeats keep the run short
+        repeats = 5 if name == 'due_unwatered_crops' else REPEATS
+        random.seed(7)
+        results[label] = (time_query(conn, name, params, is_write, repeats), query_plan(conn, name, params))
+    return results
+
+
+def main():
+    user_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    per_user = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, 'bench.db'))
+        migrate(conn)
+        hot_index_sql = [
+            sql for (sql,) in conn.execute(
+                f"SELECT sql FROM sqlite_master WHERE type = 'index' AND name IN ({', '.join('?' * len(HOT_INDEXES))})",
+                HOT_INDEXES
+            )
+        ]
+        for name in HOT_INDEXES:
+            conn.execute(f"DROP INDEX {name}")
+        conn.execute(BASELINE_INDEX)
+
+        print(f"Populating {user_count} users, {user_count * per_user} notifications...")
+        start = time.perf_counter()
+        populate(conn, user_count, per_user)
+        print(f"  done in {time.perf_counter() - start:.1f}s\n")
+
+        queries = hot_queries(conn, user_count)
+        before = run_pass(conn, queries)
+
+        start = time.perf_counter()
+        conn.execute('DROP INDEX idx_watering_schedules_water_status')
+        for sql in hot_index_sql:
+            conn.execute(sql)
+        conn.commit()
+        print(f"Building the hot-path indexes took {time.perf_counter() - start:.1f}s\n")
+        after = run_pass(conn, queries)
+        conn.close()
+
+    print(f"{'query':<28} {'before ms':>10} {'after ms':>10} {'speedup':>9}")
+    for label, _, _, _ in queries:
+        b, a = before[label][0], after[label][0]
+        print(f"{label:<28} {b:>10.3f} {a:>10.3f} {b / a:>8.1f}x")
+
+    print("\nQuery plans after migration:")
+    for label, _, _, _ in queries:
+        print(f"  {label}: {after[label][1]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Compare Flask's default JSON provider with json_provider.FastJSONProvider
+on payloads shaped like the app's largest responses:
+
+- /nurseries: a few hundred nurseries with addresses
+- /notifications: a full page
+- /users: the whole user list
+- /recommend: crops with their full text from cropdata.csv
+- weather_update: the OpenWeatherMap dict relayed over Socket.IO
+
+Usage: python benchmarks/bench_json.py [repeats]
+"""
+
+import csv
+import os
+import random
+import sys
+import time
+
+# Add the Backend directory to the path so the app modules can be imported
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import json_provider
+from crop_catalog import CROP_FIELDS
+
+
+def nurseries_payload(count=400):
+    return {
+        'nurseries': [{
+            'id': 1000000 + i,
+            'name': f'Green Leaf Nursery {i}',
+            'lat': 9.9 + random.random() / 10,
+            'lon': 76.2 + random.random() / 10,
+            'distance': round(random.random() * 20, 2),
+            'address': f'{i} Market Road, Ernakulam, Kerala, 682001, India',
+            'phone': '+91 484 000 0000' if i % 3 else None,
+            'website': f'https://nursery{i}.example.com' if i % 4 == 0 else None,
+            'opening_hours': 'Mo-Sa 09:00-19:00',
+            'type': 'garden_centre',
+        } for i in range(count)],
+        'search': {'mode': 'adaptive', 'radius': 12800, 'expansions': 3},
+    }
+
+
+def notifications_payload(count=200):
+    return [{
+        'id': 500000 - i,
+        'message': f'Your Tomato needs watering! It was due on 2025-05-{i % 28 + 1:02d}.',
+        'timestamp': f'2025-05-{i % 28 + 1:02d} 10:{i % 60:02d}:00',
+        'read': i % 3 == 0,
+        'count': 1 + i % 4,
+    } for i in range(count)]
+
+
+def users_payload(count=5000):
+    return [{
+        'id': i,
+        'name': f'User {i}',
+        'email': f'user{i}@example.com',
+        'location': {'city': 'Kochi', 'state': 'Kerala', 'country': 'India'},
+    } for i in range(1, count + 1)]
+
+
+def recommend_payload():
+    with open(os.path.join(backend_dir, 'cropdata.csv'), newline='', encoding='utf-8') as f:
+        crops = [{field: row.get(field) for field in CROP_FIELDS if field != 'id'} for row in csv.DictReader(f)]
+    for crop in crops:
+        crop.update({'growing_time': 90, 'watering_frequency': 2, 'fertilization_schedule': 14})
+    return {'recommended_crops': crops, 'month': 'May', 'weather': {'temp': 31.2, 'humidity': 78}}
+
+
+def weather_payload():
+    return {
+        'weather_data': {
+            'coord': {'lon': 76.26, 'lat': 9.93},
+            'weather': [{'id': 501, 'main': 'Rain', 'description': 'moderate rain', 'icon': '10d'}],
+            'base': 'stations',
+            'main': {'temp': 29.4, 'feels_like': 34.1, 'temp_min': 29.4, 'temp_max': 29.4,
+                     'pressure': 1008, 'humidity': 84, 'sea_level': 1008, 'grnd_level': 1007},
+            'visibility': 10000,
+            'wind': {'speed': 5.2, 'deg': 250, 'gust': 7.9},
+            'rain': {'1h': 2.3},
+            'clouds': {'all': 75},
+            'dt': 1746000000,
+            'sys': {'type': 1, 'id': 9211, 'country': 'IN', 'sunrise': 1745973000, 'sunset': 1746018000},
+            'timezone': 19800, 'id': 1273874, 'name': 'Kochi', 'cod': 200,
+        },
+        'alerts': [{'type': 'heavy_rain', 'message': 'Heavy rain alert! Consider protecting your plants.'}],
+        'user_id': 42,
+    }
+
+
+def time_dumps(dumps, payload, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        dumps(payload)
+    return (time.perf_counter() - start) * 1e6 / repeats
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    random.seed(3)
+    app = Flask(__name__)
+    stdlib = DefaultJSONProvider(app)
+    fast = json_provider.FastJSONProvider(app)
+    compact = {'separators': (',', ':')}
+
+    payloads = [
+        ('/nurseries', nurseries_payload(), True),
+        ('/notifications', notifications_payload(), True),
+        ('/users', users_payload(), True),
+        ('/recommend', recommend_payload(), True),
+        ('weather_update emit', weather_payload(), False),
+    ]
+
+    print(f"encoder: {json_provider.encoder_name()}, {repeats} repeats\n")
+    print(f"{'payload':<22} {'bytes':>9} {'stdlib us':>10} {'fast us':>10} {'speedup':>8}")
+    for label, payload, is_response in payloads:
+        if is_response:
+            # What jsonify() does in production (compact, sorted keys)
+            slow_dumps = lambda obj: stdlib.dumps(obj, **compact)
+            fast_dumps = lambda obj: fast.dumps(obj, **compact)
+        else:
+            # What the Socket.IO packet encoder does
+            slow_dumps = lambda obj: DefaultJSONProvider.dumps(stdlib, obj, sort_keys=False, **compact)
+            fast_dumps = lambda obj: json_provider.dumps(obj, **compact)
+        size = len(fast_dumps(payload).encode())
+        slow = time_dumps(slow_dumps, payload, repeats)
+        quick = time_dumps(fast_dumps, payload, repeats)
+        print(f"{label:<22} {size:>9} {slow:>10.1f} {quick:>10.1f} {slow / quick:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Adding crops to a library one /add_to_library call at a time versus a single
+/library/bulk call, then removing them the same two ways.
+
+Runs the app in-process against a scratch copy of the database, with a fresh
+user for every round so each add really inserts.
+
+Usage: python benchmarks/bench_library_bulk.py [db_path] [crops_per_round] [rounds]
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+# Add the Backend directory to the path so the app modules can be imported
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else os.path.join(backend_dir, 'PocketFarm.db')
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    rounds = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    # app.py migrates DATABASE_URL on import, so point it at a scratch copy
+    workdir = tempfile.mkdtemp()
+    db_path = os.path.join(workdir, 'PocketFarm.db')
+    shutil.copy(source, db_path)
+    os.environ['DATABASE_URL'] = db_path
+    import app as backend
+
+    client = backend.app.test_client()
+    names = backend.get_catalog().names()[:count]
+    db = sqlite3.connect(db_path)
+
+    def new_user(i):
+        cursor = db.execute("INSERT INTO users (name, email, password) VALUES (?, ?, ?)",
+                            (f'Bench {i}', f'bench{i}-{time.time_ns()}@example.com', 'x'))
+        db.commit()
+        return cursor.lastrowid
+
+    def single(user_id):
+        for name in names:
+            client.post('/add_to_library', json={'user_id': user_id, 'crop_name': name})
+        for name in names:
+            client.post('/remove_from_garden', json={'user_id': user_id, 'crop_name': name})
+
+    def bulk(user_id):
+        client.post('/library/bulk', json={'user_id': user_id, 'add': names})
+        client.post('/library/bulk', json={'user_id': user_id, 'remove': names})
+
+    try:
+        print(f"{count} crops added then removed, {rounds} rounds\n")
+        for label, change, requests in (('one at a time', single, 2 * count), ('/library/bulk', bulk, 2)):
+            users = [new_user(i) for i in range(rounds)]
+            start = time.perf_counter()
+            for user_id in users:
+                change(user_id)
+            elapsed = (time.perf_counter() - start) * 1000 / rounds
+            print(f"{label:<14} {requests:>3} requests, {requests:>3} commits  {elapsed:>8.1f} ms per round")
+    finally:
+        db.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Compare peak memory and time of parsing an Overpass nursery response the old
+way (read the whole body, json.loads, walk data['elements']) against the
+streaming parser used by nurseries.fetch_nursery_elements, both keeping every
+element and keeping only the 20 nearest.
+
+Usage: python benchmarks/bench_overpass_parse.py [element_count]
+"""
+
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+# Add the Backend directory to the path so the app modules can be imported
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from nurseries import parse_nursery_elements, OVERPASS_CHUNK_SIZE, ADAPTIVE_DEFAULT_K
+
+
+def make_payload(element_count):
+    """Build an Overpass-shaped response body with tagged nodes and skeleton nodes."""
+    random.seed(42)
+    elements = []
+    for i in range(element_count):
+        elements.append({
+            'type': 'node',
+            'id': 1000000 + i,
+            'lat': 9.93 + random.uniform(-0.45, 0.45),
+            'lon': 76.26 + random.uniform(-0.45, 0.45),
+            'tags': {
+                'shop': random.choice(['garden_centre', 'plant_nursery', 'seeds', 'farm']),
+                'name': f'Green Leaf Nursery {i}',
+                'opening_hours': 'Mo-Sa 09:00-19:00',
+                'phone': '+91 484 000 0000',
+                'website': f'https://example.com/nursery/{i}',
+                'addr:street': 'MG Road',
+                'addr:city': 'Kochi',
+            },
+        })
+        # `>; out skel qt;` adds untagged skeleton elements
+        elements.append({'type': 'node', 'id': 2000000 + i, 'lat': 9.9, 'lon': 76.2})
+    return json.dumps({
+        'version': 0.6,
+        'generator': 'Overpass API',
+        'osm3s': {'timestamp_osm_base': '2024-01-01T00:00:00Z'},
+        'elements': elements,
+    }).encode('utf-8')
+
+
+def chunked(payload):
+    for start in range(0, len(payload), OVERPASS_CHUNK_SIZE):
+        yield payload[start:start + OVERPASS_CHUNK_SIZE]
+
+
+def usable(element):
+    return 'tags' in element and element.get('lat') and element.get('lon')
+
+
+def parse_whole(payload):
+    # requests materialises response.content before response.json() runs
+    body = b''.join(chunked(payload))
+    data = json.loads(body)
+    return [element for element in data.get('elements', []) if usable(element)]
+
+
+def parse_streaming(payload):
+    return parse_nursery_elements(chunked(payload))
+
+
+def parse_streaming_nearest(payload):
+    # What radius searches with a limit do: a bounded heap of the closest elements
+    return parse_nursery_elements(chunked(payload), near=(9.93, 76.26), limit=ADAPTIVE_DEFAULT_K)
+
+
+def measure(parse, payload):
+    # Time without tracemalloc (best of three), then measure the peak separately
+    timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        result = parse(payload)
+        timings.append(time.perf_counter() - start)
+        del result
+
+    tracemalloc.start()
+    result = parse(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(result), min(timings), peak
+
+
+def main():
+    element_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    payload = make_payload(element_count)
+    print(f"Payload: {len(payload) / 1e6:.1f} MB, {element_count} tagged + {element_count} skeleton elements")
+
+    runs = (
+        ('json.loads (before)', parse_whole),
+        ('streaming', parse_streaming),
+        (f'streaming, {ADAPTIVE_DEFAULT_K} nearest', parse_streaming_nearest),
+    )
+    for label, parse in runs:
+        kept, elapsed, peak = measure(parse, payload)
+        print(f"{label:24} kept={kept:6d}  time={elapsed * 1000:7.1f} ms  peak={peak / 1e6:6.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
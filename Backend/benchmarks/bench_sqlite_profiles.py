@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Replay the app's read/write mix against a PocketFarm.db-shaped synthetic
+database once per SQLite storage profile (durable, balanced, fast) and
+report operations per second.
+
+The mix uses the statements from queries.py with roughly the weights the
+app sees: notification and schedule reads dominate, with a steady trickle
+of notification inserts, read-marking, library changes and schedule
+updates, each committed on its own like a request would.
+
+Usage: python benchmarks/bench_sqlite_profiles.py [threads] [seconds_per_profile] [users]
+"""
+
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+# Add the Backend directory to the path so the app modules can be imported
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from database_config import SQLITE_PROFILES, SQLitePool
+from migrations import migrate
+from queries import run
+
+CROP_COUNT = 75
+
+# (operation, weight, is_write)
+MIX = [
+    ('list_notifications', 30, False),
+    ('user_schedule', 20, False),
+    ('user_crops', 15, False),
+    ('insert_notification', 12, True),
+    ('mark_read', 8, True),
+    ('add_crop', 5, True),
+    ('remove_crop', 4, True),
+    ('postpone_watering', 6, True),
+]
+
+
+def build_database(path, users):
+    """Users, crops, schedules and notifications in the same proportions as PocketFarm.db."""
+    random.seed(1)
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    conn.executemany(
+        "INSERT INTO users (id, name, email, password, location_latitude, location_longitude) VALUES (?, ?, ?, ?, 9.93, 76.26)",
+        ((i, f'User {i}', f'user{i}@example.com', 'x') for i in range(1, users + 1))
+    )
+    conn.executemany(
+        "INSERT INTO crops (id, name, imageURL, description) VALUES (?, ?, ?, ?)",
+        ((i, f'Crop {i}', f'https://example.com/{i}.jpg', 'A crop. ' * 40) for i in range(1, CROP_COUNT + 1))
+    )
+    conn.executemany(
+        "INSERT INTO crop_schedule (crop_name, growing_time, watering_frequency, fertilization_schedule) VALUES (?, 90, 2, 14)",
+        ((f'Crop {i}',) for i in range(1, CROP_COUNT + 1))
+    )
+    library = [(u, c) for u in range(1, users + 1) for c in random.sample(range(1, CROP_COUNT + 1), 8)]
+    conn.executemany("INSERT INTO user_crops (user_id, crop_id) VALUES (?, ?)", library)
+    conn.executemany(
+        "INSERT INTO watering_schedules (user_id, crop_id, last_watered, next_watering, water_status) VALUES (?, ?, '2025-05-01', '2025-05-03', 1)",
+        library
+    )
+    conn.executemany(
+        "INSERT INTO notifications (user_id, message, read_status) VALUES (?, ?, ?)",
+        ((u, f'Your Crop {random.randint(1, CROP_COUNT)} needs watering!', random.random() < 0.7)
+         for u in range(1, users + 1) for _ in range(40))
+    )
+    conn.commit()
+    conn.close()
+
+
+def do_operation(conn, op, users, rng):
+    cursor = conn.cursor()
+    user_id = rng.randint(1, users)
+    if op == 'list_notifications':
+        run(cursor, 'user_notifications', (user_id, 50)).fetchall()
+    elif op == 'user_schedule':
+        run(cursor, 'user_schedules', (user_id,)).fetchall()
+    elif op == 'user_crops':
+        run(cursor, 'user_crop_names', (user_id,)).fetchall()
+    elif op == 'insert_notification':
+        run(cursor, 'insert_notification', (user_id, 'Heavy rain expected! Ensure proper drainage.'))
+    elif op == 'mark_read':
+        run(cursor, 'mark_notifications_read', (user_id,))
+    elif op == 'add_crop':
+        run(cursor, 'add_user_crop', (user_id, rng.randint(1, CROP_COUNT)))
+    elif op == 'remove_crop':
+        run(cursor, 'remove_user_crop', (user_id, rng.randint(1, CROP_COUNT)))
+    elif op == 'postpone_watering':
+        run(cursor, 'postpone_watering', ('2025-06-01 10:00:00', rng.randint(1, users * 8)))
+    cursor.close()
+    if conn.in_transaction:
+        conn.commit()
+
+
+def replay(path, profile, threads, seconds, users):
+    pool = SQLitePool(path, profile=profile)
+    ops = [op for op, _, _ in MIX]
+    weights = [weight for _, weight, _ in MIX]
+    writes = {op for op, _, is_write in MIX if is_write}
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(seed):
+        rng = random.Random(seed)
+        local = {'reads': 0, 'writes': 0, 'errors': 0}
+        while time.perf_counter() < deadline:
+            op = rng.choices(ops, weights)[0]
+            conn = pool.acquire()
+            try:
+                do_operation(conn, op, users, rng)
+                local['writes' if op in writes else 'reads'] += 1
+            except sqlite3.Error:
+                local['errors'] += 1
+            finally:
+                pool.release(conn)
+        with lock:
+            for key, value in local.items():
+                counts[key] += value
+
+    workers = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return counts
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    users = int(sys.argv[3]) if len(sys.argv) > 3 else 5000
+
+    tmp = tempfile.mkdtemp()
+    try:
+        template = os.path.join(tmp, 'template.db')
+        print(f"Building a {users}-user database...")
+        build_database(template, users)
+        print(f"Replaying the request mix with {threads} threads for {seconds:.0f}s per profile\n")
+
+        print(f"{'profile':<10} {'ops/s':>9} {'reads/s':>9} {'writes/s':>9} {'errors':>7}")
+        for profile in SQLITE_PROFILES:
+            # Every profile starts from an identical copy
+            path = os.path.join(tmp, f'{profile}.db')
+            shutil.copy(template, path)
+            counts = replay(path, profile, threads, seconds, users)
+            total = counts['reads'] + counts['writes']
+            print(f"{profile:<10} {total / seconds:>9.0f} {counts['reads'] / seconds:>9.0f} "
+                  f"{counts['writes'] / seconds:>9.0f} {counts['errors']:>7}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
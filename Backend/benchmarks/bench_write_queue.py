@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Compare SQLite write throughput and latency with each request committing on
+its own pooled connection (the default) against the single writer thread
+with group commit (SQLITE_WRITE_QUEUE=true).
+
+Every worker thread performs the same small write the app does most often:
+insert a notification and bump a watering schedule.
+
+Usage: python benchmarks/bench_write_queue.py [threads] [writes_per_thread]
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+# Add the Backend directory to the path so the app modules can be imported
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+tmp_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = os.path.join(tmp_dir, 'bench.db')
+os.environ.pop('ENVIRONMENT', None)
+
+import write_queue
+from migrations import migrate
+from queries import run
+
+
+def prepare(path):
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    conn.execute("INSERT INTO users (id, name, email, password) VALUES (1, 'Bench', 'bench@example.com', 'x')")
+    conn.execute("INSERT INTO crops (id, name) VALUES (1, 'Tomato')")
+    conn.executemany(
+        "INSERT INTO watering_schedules (id, user_id, crop_id, last_watered, next_watering) VALUES (?, 1, 1, '2025-01-01', '2025-01-02')",
+        [(i,) for i in range(1, 101)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def make_work(thread_id, i):
+    def work(cursor):
+        run(cursor, 'insert_notification', (1, f'Your Tomato needs watering! ({thread_id}/{i})'))
+        run(cursor, 'postpone_watering', (f'2025-02-{i % 28 + 1:02d}', (thread_id * 7 + i) % 100 + 1))
+    return work
+
+
+def run_model(label, write, threads, per_thread):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    start_gate = threading.Barrier(threads)
+
+    def worker(thread_id):
+        local = []
+        start_gate.wait()
+        for i in range(per_thread):
+            t0 = time.perf_counter()
+            try:
+                write(make_work(thread_id, i))
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            local.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else float('nan')
+
+    print(f"{label:<24} {len(latencies) / elapsed:>10.0f} {pct(0.50):>9.2f} {pct(0.99):>9.2f} {latencies[-1] * 1000 if latencies else 0:>9.2f} {len(errors):>7}")
+    if errors:
+        print(f"  first error: {errors[0]}")
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    per_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+    path = os.environ['DATABASE_URL']
+    prepare(path)
+
+    print(f"{threads} threads x {per_thread} writes, database {path}\n")
+    print(f"{'model':<24} {'writes/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9} {'errors':>7}")
+
+    # Default path: execute_write commits on the caller's pooled connection
+    write_queue.SQLITE_WRITE_QUEUE = False
+    run_model('per-request commit', write_queue.execute_write, threads, per_thread)
+
+    queue = write_queue.WriteQueue(path)
+    run_model('writer queue + group', lambda work: queue.submit(work).result(), threads, per_thread)
+    stats = queue.stats.as_dict()
+    print(f"\nwriter queue: {stats['batches']} commits, avg batch {stats['avg_batch_size']}, max batch {stats['max_batch_size']}")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -0,0 +1,168 @@
+"""
+Response compression and conditional GET handling.
+
+Registered as an after_request hook by init_app(). For every response it:
+
+- sets Cache-Control from CACHE_POLICIES when the view didn't set one
+- gives cacheable GET responses an ETag (a hash of the body) and answers a
+  matching If-None-Match with 304 Not Modified
+- compresses text bodies of at least COMPRESS_MIN_SIZE bytes with brotli
+  (when installed) or gzip, whichever the client prefers
+
+A compressed response's ETag gets an encoding suffix ("<tag>-gzip") so
+caches never mix up encodings; the suffix is ignored when comparing
+If-None-Match. Streamed responses are passed through untouched.
+
+Bytes before and after compression are counted per endpoint and reported
+by compression_stats().
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))  # bytes
+COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))  # gzip 1-9
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))  # brotli 0-11
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/javascript', 'application/x-ndjson',
+    'text/html', 'text/plain', 'text/csv', 'text/css',
+}
+
+# Cache-Control per endpoint (the view function name). Per-user data is
+# revalidated on every request, which is cheap once it has an ETag.
+CACHE_POLICIES = {
+    'get_user_crops': 'private, no-cache',
+    'get_user_schedules': 'private, no-cache',
+    'get_user_notifications': 'private, no-cache',
+    'get_unread_notification_count': 'private, no-cache',
+    'get_users': 'private, no-cache',
+    'get_dashboard': 'private, no-cache',
+    'get_nurseries': 'public, max-age=300',
+    'search_crops': 'public, max-age=60',
+    'get_metrics': 'no-store',
+}
+
+ENCODING_SUFFIXES = ('-br', '-gzip')
+
+_lock = threading.Lock()
+_stats = {}
+
+
+def _count(endpoint, identity_bytes, sent_bytes, compressed=False, not_modified=False):
+    with _lock:
+        entry = _stats.setdefault(endpoint or 'unknown', {
+            'responses': 0, 'compressed': 0, 'not_modified': 0,
+            'identity_bytes': 0, 'sent_bytes': 0,
+        })
+        entry['responses'] += 1
+        entry['compressed'] += compressed
+        entry['not_modified'] += not_modified
+        entry['identity_bytes'] += identity_bytes
+        entry['sent_bytes'] += sent_bytes
+
+
+def compression_stats():
+    """Per-endpoint response counts and bytes, with the share of bytes saved."""
+    with _lock:
+        stats = {endpoint: dict(entry) for endpoint, entry in _stats.items()}
+    for entry in stats.values():
+        identity = entry['identity_bytes']
+        entry['saved_ratio'] = round(1 - entry['sent_bytes'] / identity, 3) if identity else 0.0
+    return {'brotli': brotli is not None, 'min_size': COMPRESS_MIN_SIZE, 'endpoints': stats}
+
+
+def choose_encoding(accept_encodings):
+    """Best of br/gzip the client accepts, or None."""
+    offers = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return accept_encodings.best_match(offers)
+
+
+def compress_body(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    # mtime=0 keeps the output identical for identical input
+    return gzip.compress(data, compresslevel=COMPRESS_LEVEL, mtime=0)
+
+
+def _strip_suffix(tag):
+    for suffix in ENCODING_SUFFIXES:
+        if tag.endswith(suffix):
+            return tag[:-len(suffix)]
+    return tag
+
+
+def _not_modified(request, etag):
+    if not etag or not request.if_none_match:
+        return False
+    if request.if_none_match.star_tag:
+        return True
+    return any(_strip_suffix(tag) == etag for tag in request.if_none_match.as_set(include_weak=True))
+
+
+def _add_vary(response, value):
+    vary = response.vary
+    if value not in vary:
+        vary.add(value)
+
+
+def init_app(app):
+    from flask import request
+
+    @app.after_request
+    def compress_response(response):
+        endpoint = request.endpoint
+        if response.is_streamed or response.direct_passthrough:
+            return response
+
+        if request.method == 'GET' and 'Cache-Control' not in response.headers and endpoint in CACHE_POLICIES:
+            response.headers['Cache-Control'] = CACHE_POLICIES[endpoint]
+
+        cacheable = (request.method == 'GET' and response.status_code == 200
+                     and 'no-store' not in response.headers.get('Cache-Control', 'no-store'))
+        etag, weak = response.get_etag()
+        if cacheable and not etag:
+            etag = hashlib.blake2b(response.get_data(), digest_size=16).hexdigest()
+            response.set_etag(etag)
+            weak = False
+
+        compressible = (response.mimetype in COMPRESSIBLE_TYPES
+                        and 'Content-Encoding' not in response.headers)
+        if compressible:
+            _add_vary(response, 'Accept-Encoding')
+
+        # Views like /crop may already have answered 304 themselves
+        if response.status_code == 304:
+            _count(endpoint, 0, 0, not_modified=True)
+            return response
+
+        data = response.get_data()
+        encoding = None
+        if compressible and len(data) >= COMPRESS_MIN_SIZE and response.status_code >= 200:
+            encoding = choose_encoding(request.accept_encodings)
+        if etag and encoding:
+            response.set_etag(f'{etag}-{encoding}', weak=weak)
+
+        if cacheable and _not_modified(request, etag):
+            response.status_code = 304
+            response.set_data(b'')
+            for header in ('Content-Length', 'Content-Type'):
+                response.headers.pop(header, None)
+            _count(endpoint, len(data), 0, not_modified=True)
+            return response
+
+        if not encoding:
+            _count(endpoint, len(data), len(data))
+            return response
+
+        compressed = compress_body(data, encoding)
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        _count(endpoint, len(data), len(compressed), compressed=True)
+        return response
@@ -0,0 +1,165 @@
+"""
+In-memory catalog of the crops and crop_schedule reference tables.
+
+The tables hold ~75 static rows, so they are loaded once into an immutable
+snapshot indexed by exact and case-folded name. Triggers on both tables bump
+reference_data_version (migration 4); the version is checked at most every
+CROP_CATALOG_REFRESH_SECONDS and a changed version builds a new snapshot,
+which replaces the old one in a single assignment. Readers always see one
+complete snapshot, never a half-built one.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from database_config import get_db, get_cursor
+from queries import run
+
+CROP_CATALOG_REFRESH_SECONDS = float(os.getenv("CROP_CATALOG_REFRESH_SECONDS", "60"))
+
+# Column order of the crops table and of the /crop/<name> response
+CROP_FIELDS = (
+    'id', 'name', 'imageURL', 'scientific_name', 'description', 'origin',
+    'growing_conditions', 'planting_info', 'care_instructions', 'storage_info',
+    'nutritional_info', 'culinary_info',
+)
+SCHEDULE_FIELDS = ('growing_time', 'watering_frequency', 'fertilization_schedule')
+
+# Named subsets of CROP_FIELDS; each is precomputed for every crop in a snapshot
+CROP_VIEWS = {
+    'summary': ('id', 'name', 'imageURL', 'scientific_name'),
+    'full': CROP_FIELDS,
+}
+
+
+def strong_etag(value):
+    """Hash of the canonical JSON form; equal content always gives the same tag."""
+    canonical = json.dumps(value, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:32]
+
+
+class CropCatalog:
+    """One immutable snapshot of the crop reference data."""
+
+    def __init__(self, crop_rows, schedule_rows, version):
+        self.version = version
+
+        by_name = {}
+        by_folded = {}
+        for row in crop_rows:
+            crop = dict(zip(CROP_FIELDS, row))
+            # Keep the first row for a duplicated name, like SELECT ... fetchone() did
+            by_name.setdefault(crop['name'], crop)
+            by_folded.setdefault(crop['name'].casefold(), crop)
+        self._by_name = by_name
+        self._by_folded = by_folded
+        self._etags = {name: strong_etag(crop) for name, crop in by_name.items()}
+        self._views = {
+            view: {name: {field: crop[field] for field in fields} for name, crop in by_name.items()}
+            for view, fields in CROP_VIEWS.items()
+        }
+
+        self._schedules = {
+            row[0]: dict(zip(SCHEDULE_FIELDS, row[1:])) for row in schedule_rows
+        }
+
+    def __len__(self):
+        return len(self._by_name)
+
+    def _find(self, name):
+        if not name:
+            return None
+        return self._by_name.get(name) or self._by_folded.get(name.casefold())
+
+    def get(self, name):
+        """Crop details by exact or case-insensitive name, or None. Returns a copy."""
+        crop = self._find(name)
+        return dict(crop) if crop else None
+
+    def view(self, name, view):
+        """Crop details limited to the fields of a CROP_VIEWS entry, or None. Returns a copy."""
+        crop = self._find(name)
+        return dict(self._views[view][crop['name']]) if crop else None
+
+    def etag(self, name):
+        crop = self._find(name)
+        return self._etags[crop['name']] if crop else None
+
+    def schedule(self, name):
+        schedule = self._schedules.get(name)
+        return dict(schedule) if schedule else None
+
+    def names(self):
+        return list(self._by_name)
+
+
+_catalog = None
+_last_check = 0.0
+_rebuild_lock = threading.Lock()
+
+
+def _read_version(cursor):
+    run(cursor, 'crop_catalog_version')
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def load_catalog():
+    """Build a new snapshot from the database and make it current."""
+    global _catalog, _last_check
+    conn = get_db(readonly=True)
+    try:
+        cursor = get_cursor(conn)
+        version = _read_version(cursor)
+        run(cursor, 'catalog_crops')
+        crop_rows = [tuple(row) for row in cursor.fetchall()]
+        run(cursor, 'catalog_schedules')
+        schedule_rows = [tuple(row) for row in cursor.fetchall()]
+        cursor.close()
+    finally:
+        conn.close()
+
+    _catalog = CropCatalog(crop_rows, schedule_rows, version)
+    _last_check = time.monotonic()
+    return _catalog
+
+
+def _refresh_if_changed():
+    global _last_check
+    # Checked or not, wait a full interval before asking again
+    _last_check = time.monotonic()
+    try:
+        conn = get_db(readonly=True)
+        try:
+            cursor = get_cursor(conn)
+            version = _read_version(cursor)
+            cursor.close()
+        finally:
+            conn.close()
+
+        if version != _catalog.version:
+            print(f"Crop catalog changed (version {_catalog.version} -> {version}), reloading")
+            load_catalog()
+    except Exception as e:
+        # Keep serving the snapshot we have
+        print(f"Error refreshing crop catalog: {str(e)}")
+
+
+def get_catalog():
+    """The current snapshot, loading it on first use and reloading it after the tables change."""
+    if _catalog is not None and time.monotonic() - _last_check < CROP_CATALOG_REFRESH_SECONDS:
+        return _catalog
+
+    # One thread checks or rebuilds while the others keep serving the old snapshot
+    if _rebuild_lock.acquire(blocking=_catalog is None):
+        try:
+            if _catalog is None:
+                load_catalog()
+            elif time.monotonic() - _last_check >= CROP_CATALOG_REFRESH_SECONDS:
+                _refresh_if_changed()
+        finally:
+            _rebuild_lock.release()
+    return _catalog
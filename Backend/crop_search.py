@@ -0,0 +1,226 @@
+"""
+Search over the crop catalog for /crops/search.
+
+The index is built in memory from the current crop catalog snapshot plus
+the local names in crop.csv ("Okra (Bhindi)" makes "bhindi" find Okra), and
+rebuilt whenever the catalog reloads. Queries are scored by:
+
+- exact name or alias (plurals folded, so "tomatoes" finds Tomato)
+- prefix of a name or alias, looked up in a trie, for search-as-you-type
+- trigram similarity with the name or alias, for typos ("lemn")
+- trigram word similarity with the scientific name and description,
+  weighted lower
+
+Results are ranked by score, then name.
+"""
+
+import csv
+import os
+import re
+import threading
+
+from crop_catalog import get_catalog
+
+CROP_ALIASES_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'crop.csv')
+SEARCH_MIN_SCORE = float(os.getenv("CROP_SEARCH_MIN_SCORE", "0.3"))
+
+# Score for each way of matching; trigram scores are scaled by these too
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.9
+WORD_PREFIX_SCORE = 0.8
+SCIENTIFIC_NAME_WEIGHT = 0.7
+DESCRIPTION_WEIGHT = 0.5
+
+_WORD = re.compile(r'[a-z0-9]+')
+_ALIAS = re.compile(r'^\s*(.*?)\s*\((.*)\)\s*$')
+
+
+def stem(word):
+    """Fold simple English plurals: tomatoes -> tomato, berries -> berry, beans -> bean."""
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith('oes'):
+        return word[:-2]
+    if len(word) > 4 and word.endswith(('ches', 'shes', 'xes', 'sses')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+
+def words(text):
+    return [stem(word) for word in _WORD.findall(text.casefold())]
+
+
+def normalize(text):
+    return ' '.join(words(text))
+
+
+def trigrams(text):
+    """pg_trgm-style trigrams: each word padded with two spaces in front and one behind."""
+    grams = set()
+    for word in words(text):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def load_aliases(path=CROP_ALIASES_CSV):
+    """{casefolded crop name: [alias, ...]} from "Name (Alias)" entries in crop.csv."""
+    aliases = {}
+    try:
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                match = _ALIAS.match(row.get('Crop') or '')
+                if match:
+                    name, alias = match.groups()
+                    # The full "Okra (Bhindi)" form counts as an exact match too
+                    entry = aliases.setdefault(name.casefold(), [row['Crop'].strip()])
+                    entry.extend(part.strip() for part in alias.split('/') if part.strip())
+    except OSError as e:
+        print(f"Could not read crop aliases from {path}: {str(e)}")
+    return aliases
+
+
+class _Trie:
+    """Prefix tree whose nodes carry every crop reachable below them."""
+
+    __slots__ = ('children', 'names')
+
+    def __init__(self):
+        self.children = {}
+        self.names = set()
+
+    def insert(self, term, name):
+        node = self
+        node.names.add(name)
+        for char in term:
+            node = node.children.setdefault(char, _Trie())
+            node.names.add(name)
+
+    def with_prefix(self, prefix):
+        node = self
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return set()
+        return node.names
+
+
+class CropSearchIndex:
+    """Search structures for one catalog snapshot; never modified after construction."""
+
+    def __init__(self, crops, aliases=None):
+        aliases = aliases or {}
+        self._crops = {}
+        self._exact = {}            # normalized name or alias -> crop names
+        self._terms = {}            # crop name -> [(normalized term, trigrams)]
+        self._scientific = {}       # crop name -> trigrams
+        self._description = {}      # crop name -> trigrams
+        self._trigram_index = {}    # trigram -> crop names
+        self._term_trie = _Trie()   # whole names and aliases
+        self._word_trie = _Trie()   # individual words of names and aliases
+
+        for crop in crops:
+            name = crop['name']
+            self._crops[name] = crop
+            terms = [name] + aliases.get(name.casefold(), [])
+            self._terms[name] = []
+            for term in terms:
+                normalized = normalize(term)
+                if not normalized:
+                    continue
+                grams = trigrams(term)
+                self._terms[name].append((normalized, grams))
+                self._exact.setdefault(normalized, set()).add(name)
+                self._term_trie.insert(normalized, name)
+                for word in normalized.split():
+                    self._word_trie.insert(word, name)
+                self._add_trigrams(grams, name)
+
+            self._scientific[name] = trigrams(crop.get('scientific_name') or '')
+            self._description[name] = trigrams(crop.get('description') or '')
+            self._add_trigrams(self._scientific[name], name)
+            self._add_trigrams(self._description[name], name)
+
+    def __len__(self):
+        return len(self._crops)
+
+    def _add_trigrams(self, grams, name):
+        for gram in grams:
+            self._trigram_index.setdefault(gram, set()).add(name)
+
+    def _word_prefix_matches(self, query_words):
+        """Crops where every query word starts some word of a name or alias."""
+        matches = None
+        for word in query_words:
+            found = self._word_trie.with_prefix(word)
+            matches = set(found) if matches is None else matches & found
+            if not matches:
+                return set()
+        return matches or set()
+
+    def search(self, query, limit=10):
+        """[(score, crop name, matched field)] best first, at most `limit` long."""
+        normalized = normalize(query)
+        if not normalized:
+            return []
+        query_words = normalized.split()
+        # The word being typed may still be a plural-looking fragment ("pea" vs "peas")
+        raw_last = _WORD.findall(query.casefold())[-1]
+
+        best = {}
+
+        def offer(name, score, field):
+            if score > best.get(name, (0.0, None))[0]:
+                best[name] = (score, field)
+
+        for name in self._exact.get(normalized, ()):
+            offer(name, EXACT_SCORE, 'name')
+        for prefix in {normalized, ' '.join(query_words[:-1] + [raw_last])}:
+            for name in self._term_trie.with_prefix(prefix):
+                offer(name, PREFIX_SCORE, 'name')
+        for name in self._word_prefix_matches(query_words[:-1] + [raw_last]):
+            offer(name, WORD_PREFIX_SCORE, 'name')
+
+        query_grams = trigrams(query)
+        candidates = set()
+        for gram in query_grams:
+            candidates |= self._trigram_index.get(gram, set())
+        for name in candidates:
+            for _, grams in self._terms[name]:
+                # Jaccard similarity, as pg_trgm's similarity()
+                offer(name, len(query_grams & grams) / len(query_grams | grams), 'name')
+            # Share of the query's trigrams found in the field, as pg_trgm's word_similarity()
+            offer(name, SCIENTIFIC_NAME_WEIGHT * len(query_grams & self._scientific[name]) / len(query_grams),
+                  'scientific_name')
+            offer(name, DESCRIPTION_WEIGHT * len(query_grams & self._description[name]) / len(query_grams),
+                  'description')
+
+        ranked = sorted(
+            ((score, name, field) for name, (score, field) in best.items() if score >= SEARCH_MIN_SCORE),
+            key=lambda hit: (-hit[0], hit[1]),
+        )
+        return ranked[:limit]
+
+    def crop(self, name):
+        return self._crops[name]
+
+
+_index = None
+_index_catalog = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """The search index for the current catalog snapshot, rebuilt when the catalog reloads."""
+    global _index, _index_catalog
+    catalog = get_catalog()
+    if _index_catalog is catalog:
+        return _index
+    with _index_lock:
+        if _index_catalog is not catalog:
+            crops = [catalog.get(name) for name in catalog.names()]
+            _index = CropSearchIndex(crops, load_aliases())
+            _index_catalog = catalog
+    return _index
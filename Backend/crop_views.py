@@ -0,0 +1,90 @@
+"""
+Field selection for crop payloads on /recommend, /crop/<name> and /crops/search.
+
+Clients either name a view (view=summary or view=full, see CROP_VIEWS) or
+list the fields they want (fields=name,imageURL). Besides the catalog
+columns, each endpoint has its own extra fields (e.g. score on search
+results), and says which of them each view includes.
+
+Named views are served from the dicts the catalog precomputes for every
+crop; a field list is turned into an itemgetter-based projection once and
+reused for every later request with the same list.
+"""
+
+import functools
+from operator import itemgetter
+
+from crop_catalog import CROP_FIELDS, CROP_VIEWS
+
+DEFAULT_VIEW = 'full'
+
+
+@functools.lru_cache(maxsize=256)
+def compile_projection(fields):
+    """A function that picks `fields` (a tuple) out of a crop dict."""
+    if not fields:
+        return lambda crop: {}
+    if len(fields) == 1:
+        field = fields[0]
+        return lambda crop: {field: crop[field]}
+    getter = itemgetter(*fields)
+    return lambda crop: dict(zip(fields, getter(crop)))
+
+
+class CropShape:
+    """The catalog columns and endpoint extras one response includes."""
+
+    def __init__(self, view, catalog_fields, extras):
+        self.view = view  # a CROP_VIEWS name, or None for an explicit field list
+        self.catalog_fields = catalog_fields
+        self.extras = extras
+        self._extra_order = tuple(sorted(extras))
+        self._project = None if view else compile_projection(catalog_fields)
+
+    @property
+    def is_default(self):
+        return self.view == DEFAULT_VIEW
+
+    def wants(self, field):
+        return field in self.extras
+
+    def build(self, catalog, name, extras=None):
+        """The payload for one crop, or None if the catalog doesn't have it."""
+        if self.view:
+            crop = catalog.view(name, self.view)
+        else:
+            crop = catalog.get(name)
+            crop = self._project(crop) if crop else None
+        if crop is not None and extras:
+            for key in self._extra_order:
+                if key in extras:
+                    crop[key] = extras[key]
+        return crop
+
+
+def parse_crop_shape(view=None, fields=None, extra_fields=(), view_extras=None):
+    """The CropShape for a request's view/fields values.
+
+    `extra_fields` are the endpoint's own fields that may be asked for by
+    name; `view_extras` maps a view name to the ones it includes (by default
+    the full view includes all of them and the summary view none). Raises
+    ValueError with a message for the client on bad input.
+    """
+    if fields:
+        requested = fields if isinstance(fields, (list, tuple)) else str(fields).split(',')
+        requested = [str(field).strip() for field in requested if str(field).strip()]
+        allowed = set(CROP_FIELDS) | set(extra_fields)
+        unknown = [field for field in requested if field not in allowed]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}. "
+                             f"Available: {', '.join(CROP_FIELDS + tuple(extra_fields))}")
+        # Keep column order and drop repeats so equal requests share a projection
+        catalog_fields = tuple(field for field in CROP_FIELDS if field in requested)
+        return CropShape(None, catalog_fields, set(requested) & set(extra_fields))
+
+    view = view or DEFAULT_VIEW
+    if view not in CROP_VIEWS:
+        raise ValueError(f"Unknown view: {view}. Available: {', '.join(CROP_VIEWS)}")
+    view_extras = view_extras or {}
+    extras = view_extras.get(view, extra_fields if view == 'full' else ())
+    return CropShape(view, CROP_VIEWS[view], set(extras))
@@ -1,10 +1,15 @@
 import os
-import pandas as pd
+import csv
+import sqlite3
+import sys
+import time
 from datetime import datetime, timedelta
 import psycopg2
 from psycopg2.extras import DictCursor
 from urllib.parse import urlparse
 from dotenv import load_dotenv
+from migrations import migrate
+from queries import dialect_of, transaction
 
 # Load environment variables
 load_dotenv()
@@ -49,183 +54,122 @@ def check_column_exists(table, column, conn):
     finally:
         cursor.close()
 
-def initialize_database():
-    """Initialize the database with tables and sample data"""
-    conn = get_db()
+# Reference data loaded from CSV: (table, file, key column). The first row
+# for a key wins, matching how the crop catalog reads duplicates.
+SEED_FILES = [
+    ('crops', 'cropdata.csv', 'name'),
+    ('crop_schedule', 'crop_schedule_numerical.csv', 'crop_name'),
+]
+
+WEATHER_INSTRUCTIONS = [
+    ("Rain", "Ensure proper drainage in your garden. Cover sensitive plants."),
+    ("Frost", "Cover plants with cloth or bring them indoors. Water them well."),
+    ("Heatwave", "Provide shade for plants and ensure they are well-watered."),
+    ("Flood", "Move potted plants to higher ground and ensure drainage."),
+    ("Strong Wind", "Secure plants and structures to prevent damage."),
+    ("Storm", "Bring potted plants indoors and secure garden structures."),
+]
+
+SEED_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _upsert_sql(table, columns, key, source, dialect):
+    """INSERT ... ON CONFLICT that only rewrites rows whose values changed."""
+    cols = ', '.join(columns)
+    updates = [c for c in columns if c != key]
+    changed = 'IS NOT' if dialect == 'sqlite' else 'IS DISTINCT FROM'
+    return (
+        f"INSERT INTO {table} ({cols}) {source} "
+        f"ON CONFLICT ({key}) DO UPDATE SET "
+        + ', '.join(f"{c} = excluded.{c}" for c in updates)
+        + f" WHERE ({', '.join(f'{table}.{c}' for c in updates)}) {changed} "
+        f"({', '.join(f'excluded.{c}' for c in updates)})"
+    )
+
+
+def _seed_sqlite(cursor, table, path, key):
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        columns = next(reader)
+        key_index = columns.index(key)
+        seen = set()
+
+        def rows():
+            for row in reader:
+                if row[key_index] in seen:
+                    continue
+                seen.add(row[key_index])
+                # Empty CSV fields are NULLs, as pandas used to read them
+                yield [value if value != '' else None for value in row]
+
+        placeholders = ', '.join('?' * len(columns))
+        cursor.executemany(_upsert_sql(table, columns, key, f"VALUES ({placeholders})", 'sqlite'), rows())
+    return len(seen)
+
+
+def _seed_postgres(cursor, table, path, key):
+    with open(path, newline='', encoding='utf-8') as f:
+        columns = next(csv.reader([f.readline()]))
+        cols = ', '.join(columns)
+        # Stage the file with COPY, then upsert it in one statement
+        cursor.execute(f"CREATE TEMP TABLE seed_{table} ON COMMIT DROP AS SELECT {cols} FROM {table} WITH NO DATA")
+        cursor.execute(f"ALTER TABLE seed_{table} ADD COLUMN seed_line SERIAL")
+        cursor.copy_expert(f"COPY seed_{table} ({cols}) FROM STDIN WITH (FORMAT csv)", f)
+    cursor.execute(_upsert_sql(
+        table, columns, key,
+        f"SELECT DISTINCT ON ({key}) {cols} FROM seed_{table} ORDER BY {key}, seed_line",
+        'postgres'
+    ))
+    cursor.execute(f"SELECT COUNT(DISTINCT {key}) FROM seed_{table}")
+    return cursor.fetchone()[0]
+
+
+def seed_reference_data(conn):
+    """Load crops, crop schedules and weather instructions; safe to run repeatedly."""
+    dialect = dialect_of(conn)
     cursor = conn.cursor()
-    
+    start = time.perf_counter()
     try:
-        # Create users table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id SERIAL PRIMARY KEY,
-            name TEXT NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            password BYTEA NOT NULL,
-            phone TEXT,
-            location_city TEXT,
-            location_state TEXT,
-            location_country TEXT,
-            location_latitude REAL,
-            location_longitude REAL,
-            last_login TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-            google_id TEXT
-        )
-        ''')
-
-        # Create crops table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS crops (
-            id SERIAL PRIMARY KEY,
-            name TEXT UNIQUE NOT NULL,
-            imageURL TEXT,
-            scientific_name TEXT,
-            description TEXT,
-            origin TEXT,
-            growing_conditions TEXT,
-            planting_info TEXT,
-            care_instructions TEXT,
-            storage_info TEXT,
-            nutritional_info TEXT,
-            culinary_info TEXT
-        )
-        ''')
-
-        # Create weather_instructions table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS weather_instructions (
-            id SERIAL PRIMARY KEY,
-            alert_type TEXT NOT NULL UNIQUE,
-            instructions TEXT NOT NULL
-        )
-        ''')
-
-        # Create watering_schedules table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS watering_schedules (
-            id SERIAL PRIMARY KEY,
-            user_id INTEGER NOT NULL,
-            crop_id INTEGER NOT NULL,
-            last_watered DATE NULL,
-            next_watering DATE,
-            watering_frequency INTEGER,  
-            fertilization_schedule INTEGER,
-            water_status BOOLEAN DEFAULT FALSE,
-            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-            FOREIGN KEY (crop_id) REFERENCES crops(id) ON DELETE CASCADE,
-            UNIQUE(user_id, crop_id)
-        )
-        ''')
-
-        # Create user_crops table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS user_crops (
-            id SERIAL PRIMARY KEY,
-            user_id INTEGER NOT NULL,
-            crop_id INTEGER NOT NULL,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-            FOREIGN KEY (crop_id) REFERENCES crops(id) ON DELETE CASCADE,
-            UNIQUE(user_id, crop_id)
-        )
-        ''')
-
-        # Create notification_preferences table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS notification_preferences (
-            id SERIAL PRIMARY KEY,
-            user_id INTEGER NOT NULL,
-            watering_reminders BOOLEAN DEFAULT TRUE,
-            weather_alerts BOOLEAN DEFAULT TRUE,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-        ''')
-
-        # Create weather_alerts table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS weather_alerts (
-            id SERIAL PRIMARY KEY,
-            user_id INTEGER NOT NULL,
-            alert_type TEXT NOT NULL,
-            alert_message TEXT NOT NULL,
-            alert_date DATE NOT NULL,
-            alert_status TEXT DEFAULT 'pending',
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-        ''')
-
-        # Create crop_schedule table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS crop_schedule (
-            crop_name TEXT PRIMARY KEY,
-            growing_time INTEGER,
-            watering_frequency INTEGER,
-            fertilization_schedule INTEGER
-        )
-        ''')
-
-        # Create indexes
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_watering_schedules_user_id ON watering_schedules(user_id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_watering_schedules_crop_id ON watering_schedules(crop_id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_watering_schedules_next_watering ON watering_schedules(next_watering)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_watering_schedules_water_status ON watering_schedules(water_status)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_crops_user_id ON user_crops(user_id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_crops_crop_id ON user_crops(crop_id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_crops_name ON crops(name)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_crop_schedule_crop_name ON crop_schedule(crop_name)')
-
-        # Check if crops table is empty and initialize
-        cursor.execute("SELECT COUNT(*) FROM crops")
-        if cursor.fetchone()[0] == 0:
-            print("Initializing crops data...")
-            df_crops = pd.read_csv('cropdata.csv')
-            # Convert DataFrame to list of tuples for executemany
-            records = df_crops.to_records(index=False).tolist()
-            cols = ','.join(df_crops.columns)
-            placeholders = ','.join(['%s'] * len(df_crops.columns))
+        with transaction(conn):
+            for table, filename, key in SEED_FILES:
+                table_start = time.perf_counter()
+                seed = _seed_sqlite if dialect == 'sqlite' else _seed_postgres
+                count = seed(cursor, table, os.path.join(SEED_DIR, filename), key)
+                print(f"Seeded {count} {table} rows in {(time.perf_counter() - table_start) * 1000:.1f} ms")
+
+            placeholders = '?, ?' if dialect == 'sqlite' else '%s, %s'
             cursor.executemany(
-                f"INSERT INTO crops ({cols}) VALUES ({placeholders})",
-                records
+                _upsert_sql('weather_instructions', ['alert_type', 'instructions'], 'alert_type',
+                            f"VALUES ({placeholders})", dialect),
+                WEATHER_INSTRUCTIONS
             )
+    finally:
+        cursor.close()
+    elapsed = time.perf_counter() - start
+    print(f"Reference data seeded in {elapsed * 1000:.1f} ms")
+    return elapsed
 
-        # Check if crop_schedule table is empty and initialize
-        cursor.execute("SELECT COUNT(*) FROM crop_schedule")
-        if cursor.fetchone()[0] == 0:
-            print("Initializing crop schedule data...")
-            df_schedule = pd.read_csv('crop_schedule_numerical.csv')
-            records = df_schedule.to_records(index=False).tolist()
-            cols = ','.join(df_schedule.columns)
-            placeholders = ','.join(['%s'] * len(df_schedule.columns))
-            cursor.executemany(
-                f"INSERT INTO crop_schedule ({cols}) VALUES ({placeholders})",
-                records
-            )
 
-        # Check if weather_instructions table is empty and initialize
-        cursor.execute("SELECT COUNT(*) FROM weather_instructions")
-        if cursor.fetchone()[0] == 0:
-            print("Initializing weather instructions...")
-            weather_instructions = [
-                ("Rain", "Ensure proper drainage in your garden. Cover sensitive plants."),
-                ("Frost", "Cover plants with cloth or bring them indoors. Water them well."),
-                ("Heatwave", "Provide shade for plants and ensure they are well-watered."),
-                ("Flood", "Move potted plants to higher ground and ensure drainage."),
-                ("Strong Wind", "Secure plants and structures to prevent damage."),
-                ("Storm", "Bring potted plants indoors and secure garden structures."),
-            ]
-            cursor.executemany(
-                "INSERT INTO weather_instructions (alert_type, instructions) VALUES (%s, %s)",
-                weather_instructions
-            )
+def initialize_database(conn=None):
+    """Initialize the database with tables and reference data"""
+    conn = conn or get_db()
+
+    try:
+        # Create or upgrade tables and indexes
+        migrate(conn)
+
+        # The seed commits as one transaction, so turn off autocommit for it
+        if dialect_of(conn) == 'postgres':
+            conn.autocommit = False
+        seed_reference_data(conn)
 
         print("Database initialized successfully!")
     except Exception as e:
         print(f"Error initializing database: {e}")
         raise
     finally:
-        cursor.close()
         conn.close()
 
 if __name__ == "__main__":
-    initialize_database()
+    # python database.py [sqlite_path] seeds a SQLite file instead of PostgreSQL
+    initialize_database(sqlite3.connect(sys.argv[1]) if len(sys.argv) > 1 else None)
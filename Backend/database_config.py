@@ -0,0 +1,507 @@
+"""
+Database connections for PocketFarm.
+
+SQLite is used in development and PostgreSQL in production (on Render).
+Connections are pooled: get_db() borrows one and conn.close() hands it back
+instead of closing it. Connections borrowed while handling a request are
+returned by a Flask teardown hook even if the handler forgets to close them.
+
+get_db(readonly=True) borrows from a separate reader pool: read-only
+(mode=ro) connections on SQLite, which never wait on the writer under WAL,
+and DATABASE_REPLICA_URL on PostgreSQL. Reads go back to the primary when
+the replica is unreachable or more than DB_REPLICA_MAX_LAG seconds behind.
+"""
+
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import quote
+
+import psycopg2
+from psycopg2 import pool as pg_pool
+from dotenv import load_dotenv
+from flask import g, has_app_context
+
+# Load environment variables
+load_dotenv()
+
+# Pool configuration
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # seconds to wait for a free connection
+SQLITE_IDLE_PER_THREAD = int(os.getenv("SQLITE_IDLE_PER_THREAD", "2"))
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "durable")
+
+# Read routing
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))  # seconds
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "5"))  # seconds between lag checks
+
+# PRAGMAs applied to every new SQLite connection, on top of WAL and busy_timeout.
+# durable:  SQLite's defaults; every commit is fsynced.
+# balanced: WAL with synchronous=NORMAL can lose the last commits on power
+#           loss but never corrupts the database; bigger cache, mmap reads.
+# fast:     no fsync at all; an OS crash can corrupt the file. Only for
+#           scratch databases and bulk loads.
+SQLITE_PROFILES = {
+    'durable': {
+        'synchronous': 'FULL',
+        'cache_size': -2000,        # KiB when negative (SQLite default, ~2 MB)
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+    },
+    'balanced': {
+        'synchronous': 'NORMAL',
+        'cache_size': -16000,
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    },
+    'fast': {
+        'synchronous': 'OFF',
+        'cache_size': -64000,
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    },
+}
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection became free within DB_POOL_TIMEOUT."""
+
+
+class PoolStats:
+    """Counters shared by both pool implementations."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.in_use = 0
+        self.created = 0
+        self.timeouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def checked_out(self, waited):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.wait_time_total += waited
+            self.wait_time_max = max(self.wait_time_max, waited)
+
+    def checked_in(self):
+        with self._lock:
+            self.in_use -= 1
+
+    def connection_created(self):
+        with self._lock:
+            self.created += 1
+
+    def timed_out(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'in_use': self.in_use,
+                'connections_created': self.created,
+                'timeouts': self.timeouts,
+                'wait_time_total_ms': round(self.wait_time_total * 1000, 3),
+                'wait_time_avg_ms': round(self.wait_time_total * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                'wait_time_max_ms': round(self.wait_time_max * 1000, 3),
+            }
+
+
+def configure_sqlite(conn, profile=None, readonly=False):
+    """Apply WAL, the busy timeout and a storage profile to a new SQLite connection."""
+    profile = profile or SQLITE_PROFILE
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLITE_PROFILE '{profile}'; expected one of {', '.join(SQLITE_PROFILES)}")
+
+    if not readonly:
+        # Enable WAL mode for better concurrency (read-only connections can't change it)
+        conn.execute('PRAGMA journal_mode=WAL')
+    # Set busy timeout
+    conn.execute('PRAGMA busy_timeout=30000')
+    for pragma, value in SQLITE_PROFILES[profile].items():
+        conn.execute(f'PRAGMA {pragma}={value}')
+    return conn
+
+
+class SQLitePool:
+    """
+    Reusable SQLite connections kept per thread (per greenlet under eventlet).
+    A thread that borrows a second connection while still holding one gets
+    its own, so nested helpers never share a transaction.
+    """
+
+    kind = 'sqlite'
+
+    def __init__(self, db_path, profile=None, readonly=False):
+        self.db_path = db_path
+        self.profile = profile or SQLITE_PROFILE
+        self.readonly = readonly
+        self.stats = PoolStats()
+        self._local = threading.local()
+
+    def _connect(self):
+        if self.readonly:
+            # The database refuses writes on these, so a misrouted write fails loudly
+            uri = f"file:{quote(os.path.abspath(self.db_path))}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, timeout=30, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        configure_sqlite(conn, self.profile, readonly=self.readonly)
+        self.stats.connection_created()
+        return conn
+
+    def _idle(self):
+        idle = getattr(self._local, 'idle', None)
+        if idle is None:
+            idle = self._local.idle = []
+        return idle
+
+    def acquire(self):
+        idle = self._idle()
+        conn = idle.pop() if idle else self._connect()
+        self.stats.checked_out(0.0)
+        return conn
+
+    def release(self, conn):
+        self.stats.checked_in()
+        try:
+            # Never hand out a connection with someone else's open transaction
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            return
+
+        idle = self._idle()
+        if len(idle) < SQLITE_IDLE_PER_THREAD:
+            idle.append(conn)
+        else:
+            conn.close()
+
+    def as_dict(self):
+        stats = self.stats.as_dict()
+        stats.update({
+            'backend': self.kind,
+            'profile': self.profile,
+            'readonly': self.readonly,
+            'idle_per_thread_max': SQLITE_IDLE_PER_THREAD,
+        })
+        return stats
+
+
+class PostgresPool:
+    """Bounded psycopg2 pool; callers wait up to DB_POOL_TIMEOUT for a free connection."""
+
+    kind = 'postgres'
+
+    def __init__(self, dsn, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX):
+        self.dsn = dsn
+        self.maxconn = maxconn
+        self.stats = PoolStats()
+        self._pool = pg_pool.ThreadedConnectionPool(minconn, maxconn, dsn)
+        # psycopg2 raises instead of waiting when the pool is exhausted
+        self._slots = threading.BoundedSemaphore(maxconn)
+        # psycopg2 hands the same connection to repeated getconn() calls with the
+        # same key (the thread id by default), so every checkout gets its own key
+        self._keys = itertools.count()
+
+    def acquire(self):
+        start = time.monotonic()
+        if not self._slots.acquire(timeout=DB_POOL_TIMEOUT):
+            self.stats.timed_out()
+            raise PoolTimeout(f"No database connection available after {DB_POOL_TIMEOUT}s")
+
+        try:
+            conn = self._pool.getconn(key=next(self._keys))
+            if conn.closed:
+                # Drop connections the server closed while they sat in the pool
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn(key=next(self._keys))
+            conn.autocommit = False
+        except Exception:
+            self._slots.release()
+            raise
+
+        self.stats.checked_out(time.monotonic() - start)
+        return conn
+
+    def release(self, conn):
+        self.stats.checked_in()
+        try:
+            broken = bool(conn.closed)
+            if not broken:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    broken = True
+            self._pool.putconn(conn, close=broken)
+        finally:
+            self._slots.release()
+
+    def as_dict(self):
+        stats = self.stats.as_dict()
+        # psycopg2 opens connections lazily; report what the pool holds right now
+        stats.pop('connections_created')
+        stats.update({
+            'backend': self.kind,
+            'max_size': self.maxconn,
+            'open_connections': len(self._pool._pool) + len(self._pool._used),
+            'idle_connections': len(self._pool._pool),
+        })
+        return stats
+
+
+class ReplicaMonitor:
+    """
+    Decides whether reads may go to the PostgreSQL replica. Replication lag is
+    measured at most every DB_REPLICA_CHECK_INTERVAL seconds; in between the
+    last answer is reused.
+    """
+
+    # A replica that has replayed everything it received counts as current,
+    # however long ago the last write on the primary was
+    LAG_QUERY = '''
+        SELECT CASE
+            WHEN NOT pg_is_in_recovery() THEN 0
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+        END
+    '''
+
+    def __init__(self, pool, max_lag=DB_REPLICA_MAX_LAG, interval=DB_REPLICA_CHECK_INTERVAL):
+        self.pool = pool
+        self.max_lag = max_lag
+        self.interval = interval
+        self.lag = None
+        self.usable = False
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def _measure(self):
+        conn = self.pool.acquire()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self.LAG_QUERY)
+            lag = float(cursor.fetchone()[0])
+            cursor.close()
+            return lag
+        finally:
+            self.pool.release(conn)
+
+    def replica_usable(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.interval:
+            return self.usable
+
+        # One caller measures; the rest use the previous answer meanwhile
+        if not self._lock.acquire(blocking=False):
+            return self.usable
+        try:
+            try:
+                self.lag = self._measure()
+                self.usable = self.lag <= self.max_lag
+                if not self.usable:
+                    print(f"Replica is {self.lag:.1f}s behind; reading from the primary")
+            except Exception as e:
+                print(f"Replica lag check failed, reading from the primary: {str(e)}")
+                self.lag = None
+                self.usable = False
+            self._checked_at = time.monotonic()
+        finally:
+            self._lock.release()
+        return self.usable
+
+    def as_dict(self):
+        return {
+            'usable': self.usable,
+            'lag_seconds': round(self.lag, 3) if self.lag is not None else None,
+            'max_lag_seconds': self.max_lag,
+        }
+
+
+class ReadRouting:
+    """Counts where read-only checkouts ended up."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reader = 0
+        self.primary_fallback = 0
+
+    def routed(self, to_reader):
+        with self._lock:
+            if to_reader:
+                self.reader += 1
+            else:
+                self.primary_fallback += 1
+
+    def as_dict(self):
+        with self._lock:
+            return {'reads_to_reader_pool': self.reader, 'reads_fallen_back_to_primary': self.primary_fallback}
+
+
+class PooledConnection:
+    """
+    A borrowed connection. Everything is delegated to the real connection
+    except close(), which rolls back uncommitted work and returns it to the pool.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+        self._released = False
+
+    @property
+    def raw(self):
+        return self._conn
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._pool.release(self._conn)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._conn.__exit__(exc_type, exc, tb)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_read_pool = None
+_replica_monitor = None
+_read_pool_ready = False
+_read_routing = ReadRouting()
+
+
+def use_postgres():
+    """PostgreSQL is used in production when DATABASE_URL points at it."""
+    is_production = os.getenv("ENVIRONMENT", "development") == "production"
+    db_url = os.getenv("DATABASE_URL")
+    return bool(is_production and db_url and db_url.startswith('postgres'))
+
+
+def get_pool():
+    """Create the connection pool on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                if use_postgres():
+                    _pool = PostgresPool(os.getenv("DATABASE_URL"))
+                else:
+                    _pool = SQLitePool(os.getenv("DATABASE_URL", "PocketFarm.db"))
+    return _pool
+
+
+def get_read_pool():
+    """
+    Create the reader pool on first use. Returns None when reads have nowhere
+    else to go (PostgreSQL without DATABASE_REPLICA_URL).
+    """
+    global _read_pool, _replica_monitor, _read_pool_ready
+    if not _read_pool_ready:
+        with _pool_lock:
+            if not _read_pool_ready:
+                if use_postgres():
+                    replica_url = os.getenv("DATABASE_REPLICA_URL")
+                    if replica_url:
+                        _read_pool = PostgresPool(replica_url)
+                        _replica_monitor = ReplicaMonitor(_read_pool)
+                else:
+                    _read_pool = SQLitePool(os.getenv("DATABASE_URL", "PocketFarm.db"), readonly=True)
+                _read_pool_ready = True
+    return _read_pool
+
+
+def _pool_for(readonly):
+    if not readonly:
+        return get_pool()
+
+    try:
+        read_pool = get_read_pool()
+    except psycopg2.Error as e:
+        print(f"Replica connection error, reading from the primary: {str(e)}")
+        read_pool = None
+    if read_pool is None:
+        return get_pool()
+
+    to_reader = _replica_monitor is None or _replica_monitor.replica_usable()
+    _read_routing.routed(to_reader)
+    return read_pool if to_reader else get_pool()
+
+
+def get_db(readonly=False):
+    """
+    Borrow a database connection from the pool. conn.close() returns it.
+    Pass readonly=True for handlers that only read; they may get a reader
+    connection that rejects writes.
+    """
+    pool = _pool_for(readonly)
+    try:
+        conn = PooledConnection(pool, pool.acquire())
+    except (sqlite3.Error, psycopg2.Error) as e:
+        if pool is get_pool():
+            print(f"Database connection error: {str(e)}")
+            raise
+        # A reader that can't connect shouldn't fail the request; the primary can serve it
+        print(f"Reader connection error, reading from the primary: {str(e)}")
+        return get_db()
+
+    if has_app_context():
+        # Remember it so the teardown hook can return it if the handler doesn't
+        g.setdefault('_pooled_connections', []).append(conn)
+    return conn
+
+
+def release_request_connections(exception=None):
+    """Flask teardown hook: return every connection borrowed during the request."""
+    for conn in g.pop('_pooled_connections', []):
+        conn.close()
+
+
+def init_app(app):
+    """Register the teardown hook that returns pooled connections."""
+    app.teardown_appcontext(release_request_connections)
+
+
+def pool_stats():
+    """Pool size, wait time and checkout counters for the metrics endpoint."""
+    stats = get_pool().as_dict()
+    read_pool = _read_pool if _read_pool_ready else None
+    if read_pool is not None:
+        stats['read_pool'] = read_pool.as_dict()
+        if _replica_monitor is not None:
+            stats['read_pool']['replica'] = _replica_monitor.as_dict()
+    stats['read_routing'] = _read_routing.as_dict()
+    return stats
+
+
+def raw_connection(conn):
+    """Return the driver connection behind a pooled connection."""
+    return conn.raw if isinstance(conn, PooledConnection) else conn
+
+
+def is_sqlite(conn):
+    return isinstance(raw_connection(conn), sqlite3.Connection)
+
+
+def get_cursor(conn):
+    """Get an appropriate cursor based on connection type."""
+    if isinstance(raw_connection(conn), psycopg2.extensions.connection):
+        # DictCursor rows allow row[0] and row['name'], like sqlite3.Row
+        from psycopg2.extras import DictCursor
+        return conn.cursor(cursor_factory=DictCursor)
+    return conn.cursor()
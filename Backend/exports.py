@@ -0,0 +1,134 @@
+"""
+Streaming exports of the users table and of one user's data.
+
+Rows are read EXPORT_BATCH_SIZE at a time with queries.iter_batches (a
+server-side cursor on PostgreSQL) and written out by a generator one batch
+per chunk, as NDJSON or CSV, so memory use doesn't grow with the table.
+Every export is in id order. The JSON form returns one page instead, with
+`next_after` to pass as `after` for the next one (keyset pagination).
+
+A user may export their own data, authenticated like /get_user_crops with
+their id as the Bearer token. Everything else, including the users table,
+needs EXPORT_ADMIN_TOKEN; without it set, only self-exports work.
+"""
+
+import csv
+import hmac
+import io
+import os
+
+from flask import Response, stream_with_context
+
+import json_provider
+from queries import iter_batches, as_text
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+EXPORT_PAGE_SIZE = 500
+EXPORT_MAX_PAGE_SIZE = 5000
+EXPORT_FORMATS = ('ndjson', 'csv', 'json')
+EXPORT_ADMIN_TOKEN = os.getenv("EXPORT_ADMIN_TOKEN")
+
+USER_COLUMNS = (
+    'id', 'name', 'email', 'location_city', 'location_state', 'location_country',
+    'created_at', 'email_verified',
+)
+
+# Section name -> (statement taking user_id and after, columns)
+USER_DATA_SECTIONS = {
+    'crops': ('export_user_crops', ('id', 'crop_name')),
+    'schedules': ('export_user_schedules', (
+        'id', 'crop_name', 'last_watered', 'next_watering', 'watering_frequency',
+        'fertilization_schedule', 'water_status',
+    )),
+    'notifications': ('export_user_notifications', ('id', 'message', 'timestamp', 'read', 'count')),
+    'archived_notifications': ('export_user_archived_notifications', (
+        'id', 'message', 'timestamp', 'read', 'count', 'archived_at',
+    )),
+}
+
+
+def export_denied(headers, user_id=None):
+    """None if the caller may export `user_id`'s data (or everyone's, when None), else (error, status)."""
+    auth_header = headers.get('Authorization', '')
+    if not auth_header.startswith('Bearer '):
+        return 'Authorization header is missing or invalid', 401
+    token = auth_header.split(' ', 1)[1]
+    if EXPORT_ADMIN_TOKEN and hmac.compare_digest(token.encode(), EXPORT_ADMIN_TOKEN.encode()):
+        return None
+    if user_id is not None and token == str(user_id):
+        return None
+    return 'Not allowed to export this data', 403
+
+
+def to_record(columns, row):
+    return {column: as_text(value) for column, value in zip(columns, row)}
+
+
+def read_page(conn, statement, columns, params, limit):
+    """(records, next_after): up to `limit` rows and the id to continue after, or None."""
+    batches = iter_batches(conn, statement, params, limit + 1)
+    try:
+        rows = next(batches, [])
+    finally:
+        batches.close()
+    records = [to_record(columns, row) for row in rows[:limit]]
+    next_after = records[-1]['id'] if len(rows) > limit else None
+    return records, next_after
+
+
+def ndjson_chunks(conn, sources, batch_size=EXPORT_BATCH_SIZE):
+    """One chunk of lines per batch; sources are (type or None, statement, columns, params)."""
+    for record_type, statement, columns, params in sources:
+        for rows in iter_batches(conn, statement, params, batch_size):
+            lines = []
+            for row in rows:
+                record = to_record(columns, row)
+                if record_type:
+                    record = {'type': record_type, **record}
+                lines.append(json_provider.dumps(record, separators=(',', ':')))
+            yield '\n'.join(lines) + '\n'
+
+
+def csv_chunks(conn, statement, columns, params, batch_size=EXPORT_BATCH_SIZE):
+    """A header row, then one chunk of rows per batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for rows in iter_batches(conn, statement, params, batch_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([as_text(value) for value in row] for row in rows)
+        yield buffer.getvalue()
+
+
+def stream_response(conn, chunks, export_format, filename):
+    """A streamed download; the connection is closed when the stream ends or is abandoned."""
+    def generate():
+        try:
+            yield from chunks
+        finally:
+            chunks.close()
+            conn.close()
+
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    extension = 'csv' if export_format == 'csv' else 'ndjson'
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}.{extension}"'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+def parse_export_args(args):
+    """(format, after, limit) from the query string, or ValueError with a message for the client."""
+    export_format = args.get('format', 'ndjson').lower()
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    try:
+        after = int(args.get('after', 0))
+        limit = int(args.get('limit', EXPORT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError('after and limit must be integers')
+    if not 1 <= limit <= EXPORT_MAX_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {EXPORT_MAX_PAGE_SIZE}')
+    return export_format, after, limit
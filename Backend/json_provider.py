@@ -0,0 +1,84 @@
+"""
+JSON encoding for Flask responses and Socket.IO packets.
+
+orjson is used when it is installed, and the standard library otherwise;
+set JSON_ENCODER=stdlib to force the fallback. Output matches Flask's
+default provider: keys are sorted, and dates, UUIDs, decimals and
+dataclasses go through Flask's own conversions. The differences are that
+non-ASCII text is written as UTF-8 instead of \\u escapes, and NaN becomes
+null rather than the invalid bare NaN. Anything orjson can't encode falls
+back to the standard library.
+
+The module itself can be passed as the `json` argument to SocketIO, which
+only needs dumps() and loads().
+"""
+
+import json
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+JSON_ENCODER = os.getenv("JSON_ENCODER", "auto").lower()  # auto, orjson or stdlib
+
+_orjson = None
+if JSON_ENCODER != "stdlib":
+    try:
+        import orjson as _orjson
+    except ImportError:
+        if JSON_ENCODER == "orjson":
+            print("JSON_ENCODER=orjson but orjson is not installed; using the standard library")
+
+# Dates are passed through to Flask's default() so they keep its HTTP date format
+_ORJSON_OPTIONS = 0
+if _orjson is not None:
+    _ORJSON_OPTIONS = _orjson.OPT_SERIALIZE_NUMPY | _orjson.OPT_NON_STR_KEYS | _orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def encoder_name():
+    return 'orjson' if _orjson is not None else 'stdlib'
+
+
+def dumps(obj, **kwargs):
+    """json.dumps-compatible; used for Socket.IO packets, where key order doesn't matter."""
+    if _orjson is not None and not kwargs.keys() - {'separators'}:
+        try:
+            return _orjson.dumps(obj, default=DefaultJSONProvider.default, option=_ORJSON_OPTIONS).decode()
+        except TypeError:
+            pass
+    kwargs.setdefault('default', DefaultJSONProvider.default)
+    return json.dumps(obj, **kwargs)
+
+
+def loads(s, **kwargs):
+    if _orjson is not None and not kwargs:
+        return _orjson.loads(s)
+    return json.loads(s, **kwargs)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes with orjson when it can."""
+
+    def dumps(self, obj, **kwargs):
+        # jsonify() passes compact separators, or indent=2 in debug mode
+        if _orjson is not None and not kwargs.keys() - {'separators', 'indent'} and kwargs.get('indent') in (None, 2):
+            option = _ORJSON_OPTIONS
+            if self.sort_keys:
+                option |= _orjson.OPT_SORT_KEYS
+            if kwargs.get('indent') == 2:
+                option |= _orjson.OPT_INDENT_2
+            try:
+                return _orjson.dumps(obj, default=self.default, option=option).decode()
+            except TypeError:
+                # e.g. integers wider than 64 bits
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if _orjson is not None and not kwargs:
+            return _orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+
+def init_app(app):
+    """Use FastJSONProvider for jsonify() and request.get_json()."""
+    app.json = FastJSONProvider(app)
@@ -0,0 +1,649 @@
+"""
+Versioned schema migrations for PocketFarm.
+
+Every migration has a number, a description and the SQL to run on SQLite
+and PostgreSQL. Applied versions are recorded in the schema_migrations
+table, so running migrate() again only applies what is new. Each migration
+runs in its own transaction under a database lock, so two processes
+starting at once can't apply the same migration twice.
+
+Usage: python migrations.py [target_version]
+"""
+
+import sys
+
+from database_config import get_db
+from queries import dialect_of
+
+# (version, description, {'sqlite': [...], 'postgres': [...]}); a plain list runs on both
+MIGRATIONS = [
+    (1, 'Baseline schema', {
+        'sqlite': [
+            '''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                email TEXT NOT NULL UNIQUE,
+                password TEXT NOT NULL,
+                phone TEXT,
+                location_city TEXT,
+                location_state TEXT,
+                location_country TEXT,
+                location_latitude REAL,
+                location_longitude REAL,
+                notification_enabled BOOLEAN DEFAULT 1,
+                last_alert_check TIMESTAMP,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                email_verified INTEGER DEFAULT 0
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS crops (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                imageURL TEXT,
+                scientific_name TEXT,
+                description TEXT,
+                origin TEXT,
+                growing_conditions TEXT,
+                planting_info TEXT,
+                care_instructions TEXT,
+                storage_info TEXT,
+                nutritional_info TEXT,
+                culinary_info TEXT
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS weather_instructions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                alert_type TEXT NOT NULL UNIQUE,
+                instructions TEXT NOT NULL
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS watering_schedules (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                crop_id INTEGER NOT NULL,
+                last_watered TEXT NOT NULL,
+                next_watering TEXT NOT NULL,
+                watering_frequency INTEGER,
+                fertilization_schedule INTEGER,
+                water_status BOOLEAN DEFAULT 0,
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+                FOREIGN KEY (crop_id) REFERENCES crops(id) ON DELETE CASCADE
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS user_crops (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                crop_id INTEGER NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+                FOREIGN KEY (crop_id) REFERENCES crops(id) ON DELETE CASCADE,
+                UNIQUE(user_id, crop_id)
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS crop_schedule (
+                crop_name TEXT PRIMARY KEY,
+                growing_time INTEGER,
+                watering_frequency INTEGER,
+                fertilization_schedule INTEGER
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS notification_preferences (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                watering_reminders BOOLEAN DEFAULT 1,
+                weather_alerts BOOLEAN DEFAULT 1,
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS weather_alerts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                alert_type TEXT NOT NULL,
+                alert_message TEXT NOT NULL,
+                alert_date DATE NOT NULL,
+                alert_status TEXT DEFAULT 'pending',
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS notifications (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                message TEXT NOT NULL,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                read_status BOOLEAN DEFAULT 0,
+                FOREIGN KEY (user_id) REFERENCES users(id)
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS verification_tokens (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                token TEXT NOT NULL,
+                expires_at DATETIME NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES users(id)
+            )
+            ''',
+            'CREATE INDEX IF NOT EXISTS idx_watering_schedules_user_id ON watering_schedules(user_id)',
+            'CREATE INDEX IF NOT EXISTS idx_watering_schedules_crop_id ON watering_schedules(crop_id)',
+            'CREATE INDEX IF NOT EXISTS idx_watering_schedules_next_watering ON watering_schedules(next_watering)',
+            'CREATE INDEX IF NOT EXISTS idx_watering_schedules_water_status ON watering_schedules(water_status)',
+            'CREATE INDEX IF NOT EXISTS idx_user_crops_user_id ON user_crops(user_id)',
+            'CREATE INDEX IF NOT EXISTS idx_user_crops_crop_id ON user_crops(crop_id)',
+            'CREATE INDEX IF NOT EXISTS idx_crops_name ON crops(name)',
+            'CREATE INDEX IF NOT EXISTS idx_crop_schedule_crop_name ON crop_schedule(crop_name)',
+        ],
+        'postgres': [
+            '''
+            CREATE TABLE IF NOT EXISTS users (
+                id SERIAL PRIMARY KEY,
+                name TEXT NOT NULL,
+                email TEXT UNIQUE NOT NULL,
+                password BYTEA NOT NULL,
+                phone TEXT,
+                location_city TEXT,
+                location_state TEXT,
+                location_country TEXT,
+                location_latitude REAL,
+                location_longitude REAL,
+                last_login TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                google_id TEXT
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS crops (
+                id SERIAL PRIMARY KEY,
+                name TEXT UNIQUE NOT NULL,
+                imageURL TEXT,
+                scientific_name TEXT,
+                description TEXT,
+                origin TEXT,
+                growing_conditions TEXT,
+                planting_info TEXT,
+                care_instructions TEXT,
+                storage_info TEXT,
+                nutritional_info TEXT,
+                culinary_info TEXT
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS weather_instructions (
+                id SERIAL PRIMARY KEY,
+                alert_type TEXT NOT NULL UNIQUE,
+                instructions TEXT NOT NULL
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS watering_schedules (
+                id SERIAL PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                crop_id INTEGER NOT NULL,
+                last_watered DATE NULL,
+                next_watering DATE,
+                watering_frequency INTEGER,
+                fertilization_schedule INTEGER,
+                water_status BOOLEAN DEFAULT FALSE,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+                FOREIGN KEY (crop_id) REFERENCES crops(id) ON DELETE CASCADE,
+                UNIQUE(user_id, crop_id)
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS user_crops (
+                id SERIAL PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                crop_id INTEGER NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+                FOREIGN KEY (crop_id) REFERENCES crops(id) ON DELETE CASCADE,
+                UNIQUE(user_id, crop_id)
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS crop_schedule (
+                crop_name TEXT PRIMARY KEY,
+                growing_time INTEGER,
+                watering_frequency INTEGER,
+                fertilization_schedule INTEGER
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS notification_preferences (
+                id SERIAL PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                watering_reminders BOOLEAN DEFAULT TRUE,
+                weather_alerts BOOLEAN DEFAULT TRUE,
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS weather_alerts (
+                id SERIAL PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                alert_type TEXT NOT NULL,
+                alert_message TEXT NOT NULL,
+                alert_date DATE NOT NULL,
+                alert_status TEXT DEFAULT 'pending',
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS notifications (
+                id SERIAL PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                message TEXT NOT NULL,
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                read_status BOOLEAN DEFAULT FALSE,
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS verification_tokens (
+                id SERIAL PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                token TEXT NOT NULL,
+                expires_at TIMESTAMP NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+            ''',
+            'CREATE INDEX IF NOT EXISTS idx_watering_schedules_user_id ON watering_schedules(user_id)',
+            'CREATE INDEX IF NOT EXISTS idx_watering_schedules_crop_id ON watering_schedules(crop_id)',
+            'CREATE INDEX IF NOT EXISTS idx_watering_schedules_next_watering ON watering_schedules(next_watering)',
+            'CREATE INDEX IF NOT EXISTS idx_watering_schedules_water_status ON watering_schedules(water_status)',
+            'CREATE INDEX IF NOT EXISTS idx_user_crops_user_id ON user_crops(user_id)',
+            'CREATE INDEX IF NOT EXISTS idx_user_crops_crop_id ON user_crops(crop_id)',
+            'CREATE INDEX IF NOT EXISTS idx_crops_name ON crops(name)',
+            'CREATE INDEX IF NOT EXISTS idx_crop_schedule_crop_name ON crop_schedule(crop_name)',
+        ],
+    }),
+    (2, 'Add email_verified to PostgreSQL users', {
+        # SQLite databases already got this column from a manual ALTER
+        'sqlite': [],
+        'postgres': [
+            'ALTER TABLE users ADD COLUMN IF NOT EXISTS email_verified BOOLEAN DEFAULT FALSE',
+        ],
+    }),
+    (3, 'Indexes for hot notification, token and watering queries', [
+        # /notifications, alert cooldown lookup and clear_notifications
+        'CREATE INDEX IF NOT EXISTS idx_notifications_user_timestamp ON notifications(user_id, timestamp)',
+        # mark_notifications_read
+        'CREATE INDEX IF NOT EXISTS idx_notifications_user_read ON notifications(user_id, read_status)',
+        # /verify-email and token cleanup
+        'CREATE INDEX IF NOT EXISTS idx_verification_tokens_user_token ON verification_tokens(user_id, token)',
+        # check_unwatered_crops; replaces the single-column water_status index
+        'CREATE INDEX IF NOT EXISTS idx_watering_schedules_due ON watering_schedules(water_status, next_watering)',
+        'DROP INDEX IF EXISTS idx_watering_schedules_water_status',
+        # Weather alert preference lookups
+        'CREATE INDEX IF NOT EXISTS idx_notification_preferences_user_id ON notification_preferences(user_id)',
+    ]),
+    (4, 'Version counter for the in-memory crop catalog', {
+        'sqlite': [
+            '''
+            CREATE TABLE IF NOT EXISTS reference_data_version (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            )
+            ''',
+            "INSERT OR IGNORE INTO reference_data_version (name, version) VALUES ('crops', 0)",
+            # SQLite only has row triggers; the catalog just needs the number to change
+            '''
+            CREATE TRIGGER IF NOT EXISTS crops_catalog_insert AFTER INSERT ON crops
+            BEGIN
+                UPDATE reference_data_version SET version = version + 1 WHERE name = 'crops';
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS crops_catalog_update AFTER UPDATE ON crops
+            BEGIN
+                UPDATE reference_data_version SET version = version + 1 WHERE name = 'crops';
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS crops_catalog_delete AFTER DELETE ON crops
+            BEGIN
+                UPDATE reference_data_version SET version = version + 1 WHERE name = 'crops';
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS crop_schedule_catalog_insert AFTER INSERT ON crop_schedule
+            BEGIN
+                UPDATE reference_data_version SET version = version + 1 WHERE name = 'crops';
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS crop_schedule_catalog_update AFTER UPDATE ON crop_schedule
+            BEGIN
+                UPDATE reference_data_version SET version = version + 1 WHERE name = 'crops';
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS crop_schedule_catalog_delete AFTER DELETE ON crop_schedule
+            BEGIN
+                UPDATE reference_data_version SET version = version + 1 WHERE name = 'crops';
+            END
+            ''',
+        ],
+        'postgres': [
+            '''
+            CREATE TABLE IF NOT EXISTS reference_data_version (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            )
+            ''',
+            "INSERT INTO reference_data_version (name, version) VALUES ('crops', 0) ON CONFLICT DO NOTHING",
+            '''
+            CREATE OR REPLACE FUNCTION bump_crop_catalog_version() RETURNS trigger AS $$
+            BEGIN
+                UPDATE reference_data_version SET version = version + 1 WHERE name = 'crops';
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+            ''',
+            'DROP TRIGGER IF EXISTS crops_catalog_version ON crops',
+            '''
+            CREATE TRIGGER crops_catalog_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON crops
+            FOR EACH STATEMENT EXECUTE PROCEDURE bump_crop_catalog_version()
+            ''',
+            'DROP TRIGGER IF EXISTS crop_schedule_catalog_version ON crop_schedule',
+            '''
+            CREATE TRIGGER crop_schedule_catalog_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON crop_schedule
+            FOR EACH STATEMENT EXECUTE PROCEDURE bump_crop_catalog_version()
+            ''',
+        ],
+    }),
+    (5, 'Notification repeat counts and archive table', {
+        'sqlite': [
+            'ALTER TABLE notifications ADD COLUMN repeat_count INTEGER NOT NULL DEFAULT 1',
+            '''
+            CREATE TABLE IF NOT EXISTS notifications_archive (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                message TEXT NOT NULL,
+                timestamp DATETIME,
+                read_status BOOLEAN,
+                repeat_count INTEGER NOT NULL DEFAULT 1,
+                archived_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+            ''',
+            'CREATE INDEX IF NOT EXISTS idx_notifications_archive_user_timestamp ON notifications_archive(user_id, timestamp)',
+        ],
+        'postgres': [
+            'ALTER TABLE notifications ADD COLUMN IF NOT EXISTS repeat_count INTEGER NOT NULL DEFAULT 1',
+            '''
+            CREATE TABLE IF NOT EXISTS notifications_archive (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                message TEXT NOT NULL,
+                timestamp TIMESTAMP,
+                read_status BOOLEAN,
+                repeat_count INTEGER NOT NULL DEFAULT 1,
+                archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            ''',
+            'CREATE INDEX IF NOT EXISTS idx_notifications_archive_user_timestamp ON notifications_archive(user_id, timestamp)',
+        ],
+    }),
+    (6, 'Unique crop names so the seed can upsert', {
+        # PostgreSQL crops.name is already UNIQUE. On SQLite, point references
+        # at the first row for each name and drop the later duplicates.
+        'sqlite': [
+            '''
+            UPDATE OR IGNORE user_crops
+            SET crop_id = (SELECT MIN(c2.id) FROM crops c1 JOIN crops c2 ON c1.name = c2.name WHERE c1.id = user_crops.crop_id)
+            WHERE crop_id NOT IN (SELECT MIN(id) FROM crops GROUP BY name)
+            ''',
+            'DELETE FROM user_crops WHERE crop_id NOT IN (SELECT MIN(id) FROM crops GROUP BY name)',
+            '''
+            UPDATE OR IGNORE watering_schedules
+            SET crop_id = (SELECT MIN(c2.id) FROM crops c1 JOIN crops c2 ON c1.name = c2.name WHERE c1.id = watering_schedules.crop_id)
+            WHERE crop_id NOT IN (SELECT MIN(id) FROM crops GROUP BY name)
+            ''',
+            'DELETE FROM watering_schedules WHERE crop_id NOT IN (SELECT MIN(id) FROM crops GROUP BY name)',
+            'DELETE FROM crops WHERE id NOT IN (SELECT MIN(id) FROM crops GROUP BY name)',
+            'DROP INDEX IF EXISTS idx_crops_name',
+            'CREATE UNIQUE INDEX IF NOT EXISTS idx_crops_name ON crops(name)',
+        ],
+        'postgres': [],
+    }),
+    (7, 'Indexes for keyset-paginated notifications', [
+        # /notifications pages and the alert cooldown lookup; id breaks timestamp ties
+        'CREATE INDEX IF NOT EXISTS idx_notifications_user_timestamp_id ON notifications(user_id, timestamp, id)',
+        'DROP INDEX IF EXISTS idx_notifications_user_timestamp',
+        # unread_only pages, the unread count (index-only) and mark_notifications_read
+        'CREATE INDEX IF NOT EXISTS idx_notifications_user_unread ON notifications(user_id, read_status, timestamp, id)',
+        'DROP INDEX IF EXISTS idx_notifications_user_read',
+    ]),
+    (8, 'Per-user unread notification counters', {
+        'sqlite': [
+            '''
+            CREATE TABLE IF NOT EXISTS notification_counters (
+                user_id INTEGER PRIMARY KEY,
+                unread INTEGER NOT NULL DEFAULT 0
+            )
+            ''',
+            '''
+            INSERT OR REPLACE INTO notification_counters (user_id, unread)
+            SELECT user_id, COUNT(*) FROM notifications WHERE read_status = 0 GROUP BY user_id
+            ''',
+            # Triggers keep the counters right for every writer, including retention
+            '''
+            CREATE TRIGGER IF NOT EXISTS notification_counter_insert AFTER INSERT ON notifications
+            WHEN NEW.read_status = 0
+            BEGIN
+                INSERT INTO notification_counters (user_id, unread) VALUES (NEW.user_id, 1)
+                ON CONFLICT (user_id) DO UPDATE SET unread = unread + 1;
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS notification_counter_delete AFTER DELETE ON notifications
+            WHEN OLD.read_status = 0
+            BEGIN
+                UPDATE notification_counters SET unread = unread - 1 WHERE user_id = OLD.user_id;
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS notification_counter_update AFTER UPDATE OF read_status, user_id ON notifications
+            WHEN (OLD.read_status = 0) IS NOT (NEW.read_status = 0) OR OLD.user_id IS NOT NEW.user_id
+            BEGIN
+                UPDATE notification_counters SET unread = unread - 1
+                WHERE user_id = OLD.user_id AND OLD.read_status = 0;
+                INSERT INTO notification_counters (user_id, unread)
+                SELECT NEW.user_id, 1 WHERE NEW.read_status = 0
+                ON CONFLICT (user_id) DO UPDATE SET unread = unread + 1;
+            END
+            ''',
+        ],
+        'postgres': [
+            '''
+            CREATE TABLE IF NOT EXISTS notification_counters (
+                user_id INTEGER PRIMARY KEY,
+                unread INTEGER NOT NULL DEFAULT 0
+            )
+            ''',
+            '''
+            INSERT INTO notification_counters (user_id, unread)
+            SELECT user_id, COUNT(*) FROM notifications WHERE read_status = FALSE GROUP BY user_id
+            ON CONFLICT (user_id) DO UPDATE SET unread = excluded.unread
+            ''',
+            '''
+            CREATE OR REPLACE FUNCTION maintain_notification_counter() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP <> 'INSERT' THEN
+                    IF OLD.read_status = FALSE THEN
+                        UPDATE notification_counters SET unread = unread - 1 WHERE user_id = OLD.user_id;
+                    END IF;
+                END IF;
+                IF TG_OP <> 'DELETE' THEN
+                    IF NEW.read_status = FALSE THEN
+                        INSERT INTO notification_counters (user_id, unread) VALUES (NEW.user_id, 1)
+                        ON CONFLICT (user_id) DO UPDATE SET unread = notification_counters.unread + 1;
+                    END IF;
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+            ''',
+            'DROP TRIGGER IF EXISTS notification_counter_insert_delete ON notifications',
+            '''
+            CREATE TRIGGER notification_counter_insert_delete
+            AFTER INSERT OR DELETE ON notifications
+            FOR EACH ROW EXECUTE PROCEDURE maintain_notification_counter()
+            ''',
+            'DROP TRIGGER IF EXISTS notification_counter_update ON notifications',
+            '''
+            CREATE TRIGGER notification_counter_update
+            AFTER UPDATE OF read_status, user_id ON notifications
+            FOR EACH ROW
+            WHEN (OLD.read_status IS DISTINCT FROM NEW.read_status OR OLD.user_id IS DISTINCT FROM NEW.user_id)
+            EXECUTE PROCEDURE maintain_notification_counter()
+            ''',
+        ],
+    }),
+    (9, 'Notification coalesce keys, retention marks and expiry index', {
+        # Reminders whose text changes every time (e.g. the due date) share a
+        # coalesce_key; rows without one are coalesced on their message
+        'sqlite': [
+            'ALTER TABLE notifications ADD COLUMN coalesce_key TEXT',
+            '''
+            UPDATE notifications
+            SET coalesce_key = 'watering:' || substr(message, 6, instr(message, ' needs watering!') - 6)
+            WHERE message LIKE 'Your % needs watering!%'
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS retention_marks (
+                job TEXT PRIMARY KEY,
+                last_id INTEGER NOT NULL DEFAULT 0
+            )
+            ''',
+            'CREATE INDEX IF NOT EXISTS idx_notifications_read_timestamp ON notifications(read_status, timestamp)',
+        ],
+        'postgres': [
+            'ALTER TABLE notifications ADD COLUMN IF NOT EXISTS coalesce_key TEXT',
+            '''
+            UPDATE notifications
+            SET coalesce_key = 'watering:' || substring(message from 6 for position(' needs watering!' in message) - 6)
+            WHERE message LIKE 'Your % needs watering!%'
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS retention_marks (
+                job TEXT PRIMARY KEY,
+                last_id INTEGER NOT NULL DEFAULT 0
+            )
+            ''',
+            'CREATE INDEX IF NOT EXISTS idx_notifications_read_timestamp ON notifications(read_status, timestamp)',
+        ],
+    }),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+CREATE_VERSION_TABLE = '''
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+# Arbitrary key for pg_advisory_xact_lock so concurrent runners queue up
+PG_MIGRATION_LOCK = 7305921
+
+
+def _statements(steps, dialect):
+    return steps[dialect] if isinstance(steps, dict) else steps
+
+
+def _placeholder(dialect):
+    return '?' if dialect == 'sqlite' else '%s'
+
+
+def current_version(conn):
+    """Highest applied migration, or 0 for a database the runner hasn't touched."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(CREATE_VERSION_TABLE)
+        cursor.execute('SELECT MAX(version) FROM schema_migrations')
+        version = cursor.fetchone()[0]
+    finally:
+        cursor.close()
+    conn.commit()
+    return version or 0
+
+
+def _apply(conn, dialect, version, description, steps):
+    """Apply one migration in its own transaction; returns False if another process beat us to it."""
+    cursor = conn.cursor()
+    try:
+        if dialect == 'sqlite':
+            # Take the write lock up front so the version check below can't go stale
+            cursor.execute('BEGIN IMMEDIATE')
+        else:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', (PG_MIGRATION_LOCK,))
+
+        cursor.execute(f'SELECT 1 FROM schema_migrations WHERE version = {_placeholder(dialect)}', (version,))
+        if cursor.fetchone():
+            conn.rollback()
+            return False
+
+        for sql in _statements(steps, dialect):
+            cursor.execute(sql)
+        cursor.execute(
+            f'INSERT INTO schema_migrations (version, description) VALUES ({_placeholder(dialect)}, {_placeholder(dialect)})',
+            (version, description)
+        )
+        conn.commit()
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def migrate(conn=None, target=None):
+    """Apply pending migrations up to target (default: all). Returns the versions applied."""
+    own_connection = conn is None
+    if own_connection:
+        conn = get_db()
+
+    dialect = dialect_of(conn)
+    autocommit = getattr(conn, 'autocommit', None)
+    if dialect == 'postgres' and autocommit:
+        # Each migration must commit or roll back as a unit
+        conn.autocommit = False
+
+    applied = []
+    try:
+        done = current_version(conn)
+        for version, description, steps in MIGRATIONS:
+            if version <= done or (target is not None and version > target):
+                continue
+            if _apply(conn, dialect, version, description, steps):
+                print(f"Applied migration {version}: {description}")
+                applied.append(version)
+    finally:
+        if dialect == 'postgres' and autocommit:
+            conn.autocommit = True
+        if own_connection:
+            conn.close()
+    return applied
+
+
+if __name__ == '__main__':
+    target = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    applied = migrate(target=target)
+    conn = get_db()
+    try:
+        print(f"Schema at version {current_version(conn)} (latest {LATEST_VERSION}); applied {len(applied)} migration(s)")
+    finally:
+        conn.close()
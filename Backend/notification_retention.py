@@ -0,0 +1,218 @@
+"""
+Retention for the notifications table.
+
+Each pass does three things:
+
+1. Coalesce: notifications for the same user with the same coalesce_key (or,
+   without one, the same message) and read state are folded into the newest
+   one, whose repeat_count says how many there were.
+2. Age limit: read notifications older than NOTIFICATION_MAX_AGE_DAYS move to
+   notifications_archive.
+3. Per-user cap: read notifications beyond a user's newest
+   NOTIFICATION_MAX_PER_USER move to notifications_archive.
+
+Unread notifications are never archived. Coalescing does fold unread
+repeats, which lowers the user's unread count, so the worker takes an
+on_unread_change(user_id, unread) callback to push the new counts after each
+batch.
+
+Coalescing and the cap only look at rows added since the last pass: each
+keeps a high-water mark (the last id it handled) in retention_marks. The age limit walks the (read_status,
+timestamp) index. Work goes in batches of NOTIFICATION_RETENTION_BATCH rows,
+each through execute_write in its own short transaction, with a pause in
+between so request writes never queue behind the job for long.
+
+Usage: python notification_retention.py
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from queries import run
+from write_queue import execute_write
+
+NOTIFICATION_MAX_PER_USER = int(os.getenv("NOTIFICATION_MAX_PER_USER", "200"))
+NOTIFICATION_MAX_AGE_DAYS = int(os.getenv("NOTIFICATION_MAX_AGE_DAYS", "90"))
+NOTIFICATION_RETENTION_BATCH = int(os.getenv("NOTIFICATION_RETENTION_BATCH", "500"))
+NOTIFICATION_RETENTION_PAUSE = float(os.getenv("NOTIFICATION_RETENTION_PAUSE", "0.05"))  # seconds between batches
+NOTIFICATION_RETENTION_INTERVAL = int(os.getenv("NOTIFICATION_RETENTION_INTERVAL", "3600"))  # seconds between passes
+
+_stats_lock = threading.Lock()
+_stats = {
+    'passes': 0,
+    'coalesced': 0,
+    'archived_expired': 0,
+    'archived_over_cap': 0,
+    'last_run': None,
+    'last_duration_ms': None,
+}
+
+
+def _batches(step, committed=None):
+    """
+    Call execute_write(step) until a batch comes back short; return the total it reports.
+    committed() is called after each batch's transaction.
+    """
+    total = 0
+    while True:
+        done, full = execute_write(step)
+        if committed is not None:
+            committed()
+        total += done
+        if not full:
+            return total
+        time.sleep(NOTIFICATION_RETENTION_PAUSE)
+
+
+def _mark(cursor, job):
+    run(cursor, 'retention_mark', (job,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def coalesce_duplicates(on_unread_change=None):
+    """
+    Fold repeats of each new notification into its newest row.
+    on_unread_change(user_id, unread) is called for every user whose unread
+    count went down.
+    """
+    unread = {}  # user_id -> unread count after the last batch
+
+    def step(cursor):
+        # A batch the write queue retries starts over
+        unread.clear()
+        mark = _mark(cursor, 'coalesce')
+        run(cursor, 'new_notifications_batch_end', (mark, NOTIFICATION_RETENTION_BATCH))
+        end, batch_rows = cursor.fetchone()
+        if end is None:
+            return 0, False
+
+        run(cursor, 'new_notification_groups', (mark, end))
+        removed = 0
+        for user_id, key, read_status, keep_id in cursor.fetchall():
+            # Earlier repeats may sit below the mark; rows above `end` wait for the next batch
+            run(cursor, 'coalesce_group_total', (user_id, read_status, key, keep_id))
+            rows, repeat_total = cursor.fetchone()
+            if rows > 1:
+                run(cursor, 'delete_coalesced_duplicates', (user_id, read_status, key, keep_id))
+                removed += cursor.rowcount
+                run(cursor, 'set_notification_repeat_count', (repeat_total, keep_id))
+                if not read_status:
+                    unread[user_id] = None
+        # The notification_counters triggers have already taken the deleted rows off
+        for user_id in unread:
+            run(cursor, 'user_unread_counter', (user_id,))
+            row = cursor.fetchone()
+            unread[user_id] = row[0] if row else 0
+        run(cursor, 'set_retention_mark', ('coalesce', end))
+        return removed, batch_rows == NOTIFICATION_RETENTION_BATCH
+
+    def notify():
+        if on_unread_change is not None:
+            for user_id, count in unread.items():
+                on_unread_change(user_id, count)
+
+    return _batches(step, notify)
+
+
+def archive_expired(max_age_days=NOTIFICATION_MAX_AGE_DAYS):
+    """Move read notifications older than max_age_days to the archive."""
+    # Notification timestamps are stored in UTC
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=max_age_days)).strftime('%Y-%m-%d %H:%M:%S')
+
+    def step(cursor):
+        run(cursor, 'expired_batch_end', (cutoff, NOTIFICATION_RETENTION_BATCH))
+        batch_end, batch_rows = cursor.fetchone()
+        if batch_end is None:
+            return 0, False
+        run(cursor, 'archive_expired', (cutoff, batch_end))
+        run(cursor, 'delete_expired', (cutoff, batch_end))
+        return cursor.rowcount, batch_rows == NOTIFICATION_RETENTION_BATCH
+
+    return _batches(step)
+
+
+def archive_over_cap(max_per_user=NOTIFICATION_MAX_PER_USER):
+    """Move read notifications beyond each user's newest max_per_user to the archive."""
+    # Users only go over the cap by getting new notifications; a new cap starts from the beginning
+    job = f'over_cap:{max_per_user}'
+
+    def users_with_new_rows(cursor):
+        mark = _mark(cursor, job)
+        run(cursor, 'last_notification_id')
+        end = cursor.fetchone()[0]
+        if end is None or end <= mark:
+            return [], None
+        run(cursor, 'users_with_new_notifications', (mark, end))
+        return [row[0] for row in cursor.fetchall()], end
+
+    user_ids, end = execute_write(users_with_new_rows)
+    archived = 0
+    for user_id in user_ids:
+        def step(cursor):
+            run(cursor, 'notification_cap_cutoff', (user_id, max_per_user))
+            row = cursor.fetchone()
+            if row is None:
+                return 0, False
+            run(cursor, 'over_cap_batch_end', (user_id, row[0], NOTIFICATION_RETENTION_BATCH))
+            last_id = cursor.fetchone()[0]
+            if last_id is None:
+                return 0, False
+            run(cursor, 'archive_over_cap', (user_id, last_id))
+            run(cursor, 'delete_over_cap', (user_id, last_id))
+            return cursor.rowcount, cursor.rowcount == NOTIFICATION_RETENTION_BATCH
+
+        archived += _batches(step)
+
+    if end is not None:
+        execute_write(lambda cursor: run(cursor, 'set_retention_mark', (job, end)))
+    return archived
+
+
+def run_retention(on_unread_change=None):
+    """One full retention pass; returns what it did."""
+    start = time.monotonic()
+    result = {
+        'coalesced': coalesce_duplicates(on_unread_change),
+        'archived_expired': archive_expired(),
+        'archived_over_cap': archive_over_cap(),
+    }
+    duration_ms = round((time.monotonic() - start) * 1000, 1)
+
+    with _stats_lock:
+        _stats['passes'] += 1
+        for key, value in result.items():
+            _stats[key] += value
+        _stats['last_run'] = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+        _stats['last_duration_ms'] = duration_ms
+
+    print(f"Notification retention: coalesced {result['coalesced']}, archived {result['archived_expired']} expired "
+          f"and {result['archived_over_cap']} over cap in {duration_ms} ms")
+    return result
+
+
+def start_retention_worker(on_unread_change=None):
+    while True:
+        try:
+            run_retention(on_unread_change)
+        except Exception as e:
+            print(f"Error in notification retention: {str(e)}")
+        time.sleep(NOTIFICATION_RETENTION_INTERVAL)
+
+
+def retention_stats():
+    """Running totals for the metrics endpoint."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats.update({
+        'max_per_user': NOTIFICATION_MAX_PER_USER,
+        'max_age_days': NOTIFICATION_MAX_AGE_DAYS,
+        'batch_size': NOTIFICATION_RETENTION_BATCH,
+    })
+    return stats
+
+
+if __name__ == '__main__':
+    run_retention()
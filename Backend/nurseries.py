@@ -0,0 +1,583 @@
+import codecs
+import heapq
+import json
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import closing
+
+import numpy as np
+import requests
+
+EARTH_RADIUS_KM = 6371  # Earth's radius in kilometers
+
+OVERPASS_URL = "http://overpass-api.de/api/interpreter"
+
+# Overpass responses are parsed as they stream in, never held in memory whole
+OVERPASS_CHUNK_SIZE = 64 * 1024  # bytes
+
+# Searches around a point measure elements in batches this size as they are parsed
+NEAREST_BATCH_SIZE = 256
+
+# The only tags the nursery endpoints read; everything else is dropped while parsing
+NURSERY_TAGS = ('name', 'name:en', 'brand', 'shop', 'amenity', 'phone', 'website', 'opening_hours')
+
+# Tag selectors for every kind of place we show as a nursery
+NURSERY_SELECTORS = [
+    # Garden centers and nurseries
+    '["shop"="garden_centre"]',
+    '["shop"="plant_nursery"]',
+    '["shop"="agricultural_supplies"]',
+    '["shop"="agrarian"]',
+    '["shop"="farm"]',
+    '["shop"="seeds"]',
+    '["shop"="fertilizer"]',
+
+    # Plant-related amenities
+    '["amenity"="marketplace"]["plant"]',
+    '["amenity"="garden_centre"]',
+    '["amenity"="plant_school"]',
+    '["amenity"="greenhouse"]',
+
+    # Additional plant-related businesses
+    '["shop"="florist"]["plant"]',
+    '["shop"="garden_furniture"]',
+    '["shop"="landscape"]',
+]
+
+# Adaptive search: start small and grow the radius until enough nurseries are found
+ADAPTIVE_START_RADIUS = 2000  # meters
+ADAPTIVE_GROWTH_FACTOR = 2
+ADAPTIVE_DEFAULT_K = 20
+
+# Clustering: nurseries are fetched and indexed per map tile at TILE_ZOOM,
+# and grouped into cells of CLUSTER_CELL_PX screen pixels at each zoom level.
+TILE_ZOOM = 7
+MAX_CLUSTER_ZOOM = 16  # finest level indexed; higher zooms reuse its cells, so close neighbours stay clustered
+CLUSTER_CELL_PX = 64
+CLUSTER_NAME_SAMPLES = 3
+TILE_CACHE_TTL = 3600  # seconds
+TILE_CACHE_SIZE = 1024
+
+# Missing tiles are fetched from Overpass on a small pool. A request waits
+# (up to TILE_FETCH_WAIT seconds) for the MAX_WAITED_TILES nearest its centre;
+# the rest load in the background, at most MAX_PENDING_TILES at a time, and
+# the response says how many tiles it is still missing. Views zoomed out past
+# MIN_FETCH_ZOOM only aggregate the tiles already cached.
+TILE_FETCH_WORKERS = 4
+MAX_WAITED_TILES = 8
+MAX_PENDING_TILES = 64
+TILE_FETCH_WAIT = 20  # seconds
+MIN_FETCH_ZOOM = 5
+
+# 256px tiles split into 256 / CLUSTER_CELL_PX cells per side
+_CELL_BITS = int(math.log2(256 // CLUSTER_CELL_PX))
+
+
+def build_overpass_query(area_filter, exclude_filter=None):
+    """
+    Build the Overpass query for all nursery selectors within an area filter.
+    With `exclude_filter`, nurseries inside that area are subtracted, which
+    lets an expanding search fetch only the new ring.
+    """
+    def union(area):
+        return "\n".join(f"  node{selector}({area});" for selector in NURSERY_SELECTORS)
+
+    if exclude_filter:
+        statements = f"""(
+{union(area_filter)}
+);
+- (
+{union(exclude_filter)}
+);"""
+    else:
+        statements = union(area_filter)
+
+    return f"""
+[out:json][timeout:25];
+(
+{statements}
+);
+out body;
+>;
+out skel qt;
+"""
+
+
+def iter_overpass_elements(chunks):
+    """
+    Yield the objects of the "elements" array of an Overpass JSON response
+    one at a time from an iterable of byte chunks. Only the element being
+    decoded and the current chunk are kept in memory.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    buffer = ''
+    pos = 0
+    eof = False
+    in_elements = False
+
+    def read_more():
+        nonlocal buffer, pos, eof
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+            buffer = buffer[pos:] + utf8.decode(b'', final=True)
+        else:
+            buffer = buffer[pos:] + utf8.decode(chunk)
+        pos = 0
+
+    while True:
+        if not in_elements:
+            # Skip everything up to the opening bracket of the elements array
+            key = buffer.find('"elements"', pos)
+            bracket = buffer.find('[', key) if key != -1 else -1
+            if bracket == -1:
+                if eof:
+                    return
+                # Keep a short tail in case the key is split across chunks
+                pos = max(pos, len(buffer) - 16)
+                read_more()
+                continue
+            pos = bracket + 1
+            in_elements = True
+
+        # Skip separators between elements
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        if pos >= len(buffer):
+            if eof:
+                raise ValueError('Overpass response ended inside the elements array')
+            read_more()
+            continue
+        if buffer[pos] == ']':
+            return
+
+        try:
+            element, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # The element is split across chunks
+            read_more()
+            continue
+        pos = end
+        yield element
+
+
+def _slim_element(element):
+    """Keep only what the nursery endpoints read from an Overpass element."""
+    tags = element['tags']
+    return {
+        'type': element.get('type'),
+        'id': element.get('id'),
+        'tags': {key: tags[key] for key in NURSERY_TAGS if key in tags},
+    }
+
+
+def _keep_nearest(nearest, batch, near, limit, max_distance):
+    """
+    Measure a batch of (element, lat, lon, seq) from `near` in one vectorized
+    pass and merge its closest elements into the `nearest` heap, which holds
+    (-distance, -seq, candidate) so the farthest kept element is on top.
+    """
+    distances = haversine_km(near[0], near[1], [item[1] for item in batch], [item[2] for item in batch])
+    for index in nearest_indices(distances, limit=limit, max_distance=max_distance):
+        distance = float(distances[index])
+        # The batch comes back sorted, so nothing after this can displace a kept element
+        if limit is not None and len(nearest) >= limit and -nearest[0][0] <= distance:
+            break
+        element, element_lat, element_lon, seq = batch[index]
+        entry = (-distance, -seq, (_slim_element(element), element_lat, element_lon, distance))
+        if limit is not None and len(nearest) >= limit:
+            heapq.heapreplace(nearest, entry)
+        else:
+            heapq.heappush(nearest, entry)
+
+
+def parse_nursery_elements(chunks, near=None, limit=None, max_distance=None):
+    """
+    Turn a streamed Overpass response into (element, lat, lon) tuples for the
+    elements that have tags and coordinates, keeping only NURSERY_TAGS.
+    The whole response is always read. With `near` (lat, lon), elements are
+    measured in batches of NEAREST_BATCH_SIZE; those farther than
+    `max_distance` km are dropped, only the `limit` closest are kept in a
+    bounded heap, and the result is sorted by distance with each tuple
+    carrying its distance in km as a fourth item.
+    """
+    candidates = []
+    nearest = []
+    batch = []
+    for seq, element in enumerate(iter_overpass_elements(chunks)):
+        # Skeleton elements from the recursion have no tags, drop them right away
+        if 'tags' not in element:
+            continue
+
+        # Get coordinates from either node or way/relation
+        element_lat = element.get('lat') or element.get('center', {}).get('lat')
+        element_lon = element.get('lon') or element.get('center', {}).get('lon')
+        if not (element_lat and element_lon):
+            continue
+
+        if near is None:
+            candidates.append((_slim_element(element), element_lat, element_lon))
+            continue
+
+        batch.append((element, element_lat, element_lon, seq))
+        if len(batch) >= NEAREST_BATCH_SIZE:
+            _keep_nearest(nearest, batch, near, limit, max_distance)
+            batch = []
+
+    if near is None:
+        return candidates
+    if batch:
+        _keep_nearest(nearest, batch, near, limit, max_distance)
+    return [entry[2] for entry in sorted(nearest, reverse=True)]
+
+
+def fetch_nursery_elements(area_filter, exclude_filter=None, near=None, limit=None, max_distance=None):
+    """
+    Fetch nursery elements from Overpass for an area filter, e.g.
+    "around:50000,9.93,76.26" or a "south,west,north,east" bounding box.
+    The response is parsed while it streams in; see parse_nursery_elements
+    for what is kept.
+    """
+    query = build_overpass_query(area_filter, exclude_filter)
+    with closing(requests.post(OVERPASS_URL, data=query, stream=True)) as response:
+        response.raise_for_status()
+        return parse_nursery_elements(response.iter_content(OVERPASS_CHUNK_SIZE), near, limit, max_distance)
+
+
+def adaptive_nursery_search(lat, lon, k=ADAPTIVE_DEFAULT_K, max_radius=50000,
+                            start_radius=ADAPTIVE_START_RADIUS, growth=ADAPTIVE_GROWTH_FACTOR,
+                            max_distance=None):
+    """
+    Search outwards from (lat, lon) until at least `k` nurseries are found or
+    `max_radius` (meters) is reached. Each expansion only asks Overpass for the
+    ring between the previous and the new radius; earlier rings are kept.
+    Returns (candidates, radius, expansions), with the `k` nearest candidates
+    as (element, lat, lon, distance) tuples sorted by distance.
+    """
+    found = {}
+    inner_radius = None
+    radius = min(start_radius, max_radius)
+    expansions = 0
+
+    while True:
+        exclude = f"around:{inner_radius},{lat},{lon}" if inner_radius else None
+        # The k nearest overall are among the k nearest of the rings
+        ring = fetch_nursery_elements(f"around:{radius},{lat},{lon}", exclude,
+                                      near=(lat, lon), limit=k, max_distance=max_distance)
+        for candidate in ring:
+            element = candidate[0]
+            found.setdefault((element.get('type'), element.get('id')), candidate)
+
+        # Everything within `radius` is known, so the k nearest are exact once we have k
+        if len(found) >= k or radius >= max_radius:
+            break
+
+        inner_radius = radius
+        radius = min(radius * growth, max_radius)
+        expansions += 1
+
+    return sorted(found.values(), key=lambda candidate: candidate[3])[:k], radius, expansions
+
+
+def nursery_name(tags):
+    """Get the display name from various possible tags."""
+    return (
+        tags.get('name') or
+        tags.get('name:en') or
+        tags.get('brand') or
+        tags.get('shop') or
+        tags.get('amenity') or
+        'Unnamed Garden Center'
+    )
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Distance in km from (lat, lon) to every point in the lats/lons arrays."""
+    lat1 = np.radians(float(lat))
+    lon1 = np.radians(float(lon))
+    lat2 = np.radians(np.asarray(lats, dtype=np.float64))
+    lon2 = np.radians(np.asarray(lons, dtype=np.float64))
+
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return EARTH_RADIUS_KM * c
+
+
+def nearest_indices(distances, limit=None, max_distance=None):
+    """
+    Return indices of the closest points, sorted by distance.
+    Only the `limit` closest points within `max_distance` km are kept, using a
+    partial selection so the full array never has to be sorted.
+    """
+    distances = np.asarray(distances, dtype=np.float64)
+    candidates = np.arange(distances.size)
+
+    if max_distance is not None:
+        candidates = candidates[distances <= max_distance]
+
+    if limit is not None and limit < candidates.size:
+        if limit <= 0:
+            return candidates[:0]
+        # argpartition puts the `limit` smallest distances first, in no particular order
+        partitioned = np.argpartition(distances[candidates], limit - 1)[:limit]
+        candidates = candidates[partitioned]
+
+    # Only the selected points get a full sort
+    return candidates[np.argsort(distances[candidates], kind='stable')]
+
+
+def mercator_unit(lats, lons):
+    """Project coordinates to Web Mercator, scaled to the unit square."""
+    lats = np.clip(np.asarray(lats, dtype=np.float64), -85.05112878, 85.05112878)
+    lons = np.asarray(lons, dtype=np.float64)
+    x = (lons + 180.0) / 360.0
+    sin_lat = np.sin(np.radians(lats))
+    y = 0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * np.pi)
+    return np.clip(x, 0.0, 1.0 - 1e-12), np.clip(y, 0.0, 1.0 - 1e-12)
+
+
+def tile_bounds(x, y, zoom):
+    """Return the (south, west, north, east) bounds of a slippy map tile."""
+    n = 2 ** zoom
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return south, west, north, east
+
+
+def tiles_for_bbox(south, west, north, east, zoom=TILE_ZOOM):
+    """List the (x, y) tiles at `zoom` that cover a bounding box."""
+    xs, ys = mercator_unit([north, south], [west, east])
+    n = 2 ** zoom
+    x_min, x_max = int(xs[0] * n), int(xs[1] * n)
+    y_min, y_max = int(ys[0] * n), int(ys[1] * n)
+    return [(x, y) for x in range(x_min, x_max + 1) for y in range(y_min, y_max + 1)]
+
+
+class ClusterIndex:
+    """
+    Hierarchical grid index over the nurseries of one tile.
+    Each zoom level stores one cluster per occupied grid cell; a cell at zoom z
+    is the parent of the four cells below it at z + 1, so every level is built
+    by merging the level under it instead of re-scanning all points.
+    """
+
+    def __init__(self, points):
+        # points: list of dicts with id, name, type, lat and lon
+        self.points = points
+        self.levels = {}
+        if not points:
+            return
+
+        xs, ys = mercator_unit([p['lat'] for p in points], [p['lon'] for p in points])
+        scale = 2 ** (MAX_CLUSTER_ZOOM + _CELL_BITS)
+        cell_xs = (xs * scale).astype(np.int64)
+        cell_ys = (ys * scale).astype(np.int64)
+
+        # Finest level: group points by their cell
+        cells = {}
+        for i, point in enumerate(points):
+            key = (int(cell_xs[i]), int(cell_ys[i]))
+            cluster = cells.get(key)
+            if cluster is None:
+                cells[key] = [1, point['lat'], point['lon'], [point['name']], i]
+            else:
+                cluster[0] += 1
+                cluster[1] += point['lat']
+                cluster[2] += point['lon']
+                if len(cluster[3]) < CLUSTER_NAME_SAMPLES:
+                    cluster[3].append(point['name'])
+        self.levels[MAX_CLUSTER_ZOOM] = cells
+
+        # Coarser levels: merge each 2x2 block of child cells into its parent
+        for zoom in range(MAX_CLUSTER_ZOOM - 1, -1, -1):
+            parents = {}
+            # Visit bigger clusters first so their names represent the parent
+            children = sorted(self.levels[zoom + 1].items(), key=lambda item: -item[1][0])
+            for (cx, cy), child in children:
+                key = (cx >> 1, cy >> 1)
+                parent = parents.get(key)
+                if parent is None:
+                    parents[key] = [child[0], child[1], child[2], list(child[3]), child[4]]
+                else:
+                    parent[0] += child[0]
+                    parent[1] += child[1]
+                    parent[2] += child[2]
+                    room = CLUSTER_NAME_SAMPLES - len(parent[3])
+                    if room > 0:
+                        parent[3].extend(child[3][:room])
+            self.levels[zoom] = parents
+
+    def cells(self, zoom):
+        """Return {cell: [count, lat_sum, lon_sum, names, first_point]} at a zoom level."""
+        return self.levels.get(min(zoom, MAX_CLUSTER_ZOOM), {})
+
+
+class TileCache:
+    """Small TTL cache of ClusterIndex objects keyed by tile."""
+
+    def __init__(self, ttl=TILE_CACHE_TTL, max_size=TILE_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.time() - entry[0] < self.ttl:
+                return entry[1]
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            if len(self._entries) >= self.max_size:
+                # Evict the oldest entry
+                oldest = min(self._entries, key=lambda k: self._entries[k][0])
+                del self._entries[oldest]
+            self._entries[key] = (time.time(), value)
+
+
+tile_cache = TileCache()
+
+
+def load_tile_index(x, y):
+    """Fetch one tile's nurseries from Overpass, index them and cache the index."""
+    south, west, north, east = tile_bounds(x, y, TILE_ZOOM)
+    points = []
+    for element, element_lat, element_lon in fetch_nursery_elements(f"{south},{west},{north},{east}"):
+        tags = element.get('tags', {})
+        points.append({
+            'id': element.get('id'),
+            'name': nursery_name(tags),
+            'type': tags.get('shop') or tags.get('amenity') or 'garden_centre',
+            'lat': float(element_lat),
+            'lon': float(element_lon),
+        })
+
+    index = ClusterIndex(points)
+    tile_cache.put((TILE_ZOOM, x, y), index)
+    return index
+
+
+_tile_fetcher = ThreadPoolExecutor(max_workers=TILE_FETCH_WORKERS, thread_name_prefix='nursery-tiles')
+_tile_fetches = {}  # (x, y) -> Future, while the fetch runs
+_tile_fetches_lock = threading.Lock()
+
+
+def _tile_fetched(tile, future):
+    with _tile_fetches_lock:
+        _tile_fetches.pop(tile, None)
+    if future.exception() is not None:
+        print(f"Error fetching nursery tile {tile}: {future.exception()}")
+
+
+def request_tile(x, y):
+    """Start fetching a tile unless it already is; returns its Future, or None if too many are pending."""
+    tile = (x, y)
+    with _tile_fetches_lock:
+        future = _tile_fetches.get(tile)
+        if future is not None:
+            return future
+        if len(_tile_fetches) >= MAX_PENDING_TILES:
+            return None
+        future = _tile_fetches[tile] = _tile_fetcher.submit(load_tile_index, x, y)
+    future.add_done_callback(lambda done: _tile_fetched(tile, done))
+    return future
+
+
+def get_tile_indexes(tiles, center, fetch=True):
+    """
+    ({tile: ClusterIndex}, missing) for the tiles that are cached or arrive in
+    time. Missing tiles are requested nearest `center` (a tile x, y) first.
+    """
+    indexes = {}
+    missing = []
+    for x, y in tiles:
+        index = tile_cache.get((TILE_ZOOM, x, y))
+        if index is not None:
+            indexes[(x, y)] = index
+        else:
+            missing.append((x, y))
+    if not missing or not fetch:
+        return indexes, len(missing)
+
+    cx, cy = center
+    missing.sort(key=lambda tile: (tile[0] - cx) ** 2 + (tile[1] - cy) ** 2)
+    waited = {}
+    for tile in missing:
+        future = request_tile(*tile)
+        if future is None:
+            break
+        if len(waited) < MAX_WAITED_TILES:
+            waited[tile] = future
+
+    if waited:
+        wait(list(waited.values()), timeout=TILE_FETCH_WAIT)
+    for tile, future in waited.items():
+        if future.done() and future.exception() is None:
+            indexes[tile] = future.result()
+    return indexes, len(tiles) - len(indexes)
+
+
+def cluster_nurseries(south, west, north, east, zoom):
+    """
+    Return (clusters, missing_tiles) inside a bounding box for a map zoom level.
+    Single nurseries come back as points, everything else as a cluster with
+    its count, centroid and a few representative names. missing_tiles counts
+    the tiles not included yet because they are still loading.
+    """
+    tiles = tiles_for_bbox(south, west, north, east)
+    xs, ys = mercator_unit([(south + north) / 2], [(west + east) / 2])
+    center = (int(xs[0] * 2 ** TILE_ZOOM), int(ys[0] * 2 ** TILE_ZOOM))
+    indexes, missing_tiles = get_tile_indexes(tiles, center, fetch=zoom >= MIN_FETCH_ZOOM)
+
+    # Merge cells across tiles, since cells below TILE_ZOOM span several tiles.
+    # Zoomed out, each tile adds just the one precomputed cell of its coarse level.
+    merged = {}
+    for index in indexes.values():
+        for key, cluster in index.cells(zoom).items():
+            existing = merged.get(key)
+            if existing is None:
+                merged[key] = (index, cluster[0], cluster[1], cluster[2], list(cluster[3]), cluster[4])
+            else:
+                names = existing[4]
+                names.extend(cluster[3][:CLUSTER_NAME_SAMPLES - len(names)])
+                merged[key] = (existing[0], existing[1] + cluster[0], existing[2] + cluster[1],
+                               existing[3] + cluster[2], names, existing[5])
+
+    results = []
+    for index, count, lat_sum, lon_sum, names, first_point in merged.values():
+        lat = lat_sum / count
+        lon = lon_sum / count
+        if not (south <= lat <= north and west <= lon <= east):
+            continue
+
+        if count == 1:
+            point = index.points[first_point]
+            results.append({
+                'type': 'point',
+                'id': point['id'],
+                'name': point['name'],
+                'nursery_type': point['type'],
+                'lat': point['lat'],
+                'lon': point['lon'],
+            })
+        else:
+            results.append({
+                'type': 'cluster',
+                'count': count,
+                'lat': round(lat, 6),
+                'lon': round(lon, 6),
+                'names': names,
+            })
+    return results, missing_tiles
@@ -0,0 +1,425 @@
+"""
+Named SQL statements for PocketFarm, written once and rendered per dialect.
+
+Statements use `?` placeholders and a few tokens for the parts SQLite and
+PostgreSQL spell differently:
+
+    {now}          current timestamp
+    {today}        current date
+    {true}/{false} boolean literals
+    {returning_id} appended to INSERTs whose new id is needed
+
+Upserts use `INSERT ... ON CONFLICT ... DO NOTHING/UPDATE`, which both
+databases accept as-is (SQLite 3.24+). A statement that can't be written
+portably may instead map each dialect to its own SQL.
+"""
+
+from contextlib import contextmanager
+from datetime import date, datetime
+from functools import lru_cache
+from itertools import count
+
+from database_config import is_sqlite
+
+DIALECT_TOKENS = {
+    'sqlite': {
+        'now': "datetime('now')",
+        'today': "date('now')",
+        'true': '1',
+        'false': '0',
+        'returning_id': '',
+    },
+    'postgres': {
+        'now': 'CURRENT_TIMESTAMP',
+        'today': 'CURRENT_DATE',
+        'true': 'TRUE',
+        'false': 'FALSE',
+        'returning_id': 'RETURNING id',
+    },
+}
+
+STATEMENTS = {
+    # Users
+    'user_by_email': "SELECT * FROM users WHERE email = ?",
+    'user_id_by_id': "SELECT id FROM users WHERE id = ?",
+    'user_id_by_email': "SELECT id FROM users WHERE email = ?",
+    'user_location_by_id': "SELECT id, location_city, location_state, location_country FROM users WHERE id = ?",
+    'user_verification_by_email': """
+        SELECT id, email_verified FROM users
+        WHERE email = ?
+    """,
+    'users_list': """
+        SELECT id, name, email, location_city, location_state, location_country
+        FROM users
+    """,
+    'users_with_location': """
+        SELECT u.id, u.location_latitude, u.location_longitude, np.weather_alerts
+        FROM users u
+        LEFT JOIN notification_preferences np ON u.id = np.user_id
+        WHERE u.location_latitude IS NOT NULL AND u.location_longitude IS NOT NULL
+    """,
+    'insert_user': """
+        INSERT INTO users (name, email, password, phone, location_city, location_state,
+                           location_country, location_latitude, location_longitude, email_verified)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, {false})
+        {returning_id}
+    """,
+    'insert_google_user': """
+        INSERT INTO users (name, email, password, location_city, location_state,
+                           location_country, location_latitude, location_longitude, email_verified)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, {true})
+        {returning_id}
+    """,
+    'mark_email_verified': "UPDATE users SET email_verified = {true} WHERE id = ?",
+    'update_watering_by_device': "UPDATE users SET last_watered_date = ?, next_watering_date = ? WHERE device_token = ?",
+    'update_next_watering_by_device': "UPDATE users SET next_watering_date = ? WHERE device_token = ?",
+    'delete_user': "DELETE FROM users WHERE id = ?",
+    'users_table_exists': {
+        'sqlite': "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'users'",
+        'postgres': "SELECT table_name FROM information_schema.tables WHERE table_name = 'users'",
+    },
+
+    # Verification tokens
+    'insert_verification_token': "INSERT INTO verification_tokens (user_id, token, expires_at) VALUES (?, ?, ?)",
+    'valid_verification_token': """
+        SELECT * FROM verification_tokens
+        WHERE user_id = ? AND token = ? AND expires_at > {now}
+    """,
+    'delete_verification_token': "DELETE FROM verification_tokens WHERE user_id = ? AND token = ?",
+    'delete_user_verification_tokens': "DELETE FROM verification_tokens WHERE user_id = ?",
+
+    # Crops and libraries
+    'crop_id_by_name': "SELECT id FROM crops WHERE name = ?",
+    'add_user_crop': """
+        INSERT INTO user_crops (user_id, crop_id) VALUES (?, ?)
+        ON CONFLICT (user_id, crop_id) DO NOTHING
+    """,
+    'user_crop_names': """
+        SELECT crops.name FROM user_crops
+        JOIN crops ON user_crops.crop_id = crops.id
+        WHERE user_crops.user_id = ?
+    """,
+    'remove_user_crop': "DELETE FROM user_crops WHERE user_id = ? AND crop_id = ?",
+    'user_crop_ids': "SELECT crop_id FROM user_crops WHERE user_id = ?",
+    # Bulk library changes take the crop ids as one JSON array parameter
+    'add_user_crops': {
+        # SQLite needs the WHERE to tell the upsert clause from a join constraint
+        'sqlite': """
+            INSERT INTO user_crops (user_id, crop_id)
+            SELECT ?, value FROM json_each(?) WHERE 1
+            ON CONFLICT (user_id, crop_id) DO NOTHING
+        """,
+        'postgres': """
+            INSERT INTO user_crops (user_id, crop_id)
+            SELECT ?, value::int FROM json_array_elements_text(?::json)
+            ON CONFLICT (user_id, crop_id) DO NOTHING
+        """,
+    },
+    'remove_user_crops': {
+        'sqlite': "DELETE FROM user_crops WHERE user_id = ? AND crop_id IN (SELECT value FROM json_each(?))",
+        'postgres': """
+            DELETE FROM user_crops
+            WHERE user_id = ? AND crop_id IN (SELECT value::int FROM json_array_elements_text(?::json))
+        """,
+    },
+    'delete_user_crops': "DELETE FROM user_crops WHERE user_id = ?",
+    'catalog_crops': """
+        SELECT id, name, imageURL, scientific_name, description, origin, growing_conditions,
+               planting_info, care_instructions, storage_info, nutritional_info, culinary_info
+        FROM crops
+        ORDER BY id
+    """,
+    'catalog_schedules': "SELECT crop_name, growing_time, watering_frequency, fertilization_schedule FROM crop_schedule",
+    'crop_catalog_version': "SELECT version FROM reference_data_version WHERE name = 'crops'",
+
+    # Watering schedules
+    'count_user_schedules': "SELECT COUNT(*) FROM watering_schedules WHERE user_id = ?",
+    'user_schedules': """
+        SELECT
+            c.name,
+            c.imageURL,
+            ws.last_watered,
+            ws.next_watering,
+            cs.growing_time,
+            cs.watering_frequency,
+            cs.fertilization_schedule,
+            ws.water_status
+        FROM watering_schedules ws
+        JOIN crops c ON ws.crop_id = c.id
+        JOIN crop_schedule cs ON c.name = cs.crop_name
+        WHERE ws.user_id = ?
+    """,
+    'due_unwatered_crops': """
+        SELECT ws.id, ws.user_id, c.name, ws.next_watering
+        FROM watering_schedules ws
+        JOIN crops c ON ws.crop_id = c.id
+        WHERE ws.water_status = {false}
+        AND ws.next_watering <= {today}
+    """,
+    'postpone_watering': "UPDATE watering_schedules SET next_watering = ? WHERE id = ?",
+    'delete_user_schedules': "DELETE FROM watering_schedules WHERE user_id = ?",
+
+    # Notifications
+    'weather_alerts_enabled': "SELECT weather_alerts FROM notification_preferences WHERE user_id = ?",
+    'last_matching_notification': """
+        SELECT timestamp FROM notifications
+        WHERE message LIKE ? AND user_id = ?
+        ORDER BY timestamp DESC LIMIT 1
+    """,
+    'insert_notification': "INSERT INTO notifications (user_id, message) VALUES (?, ?)",
+    # Repeats of a reminder whose text changes share a coalesce_key (see notification_retention)
+    'insert_keyed_notification': "INSERT INTO notifications (user_id, message, coalesce_key) VALUES (?, ?, ?)",
+    # Newest first, one page at a time; "before" pages continue after a (timestamp, id) cursor
+    'user_notifications': """
+        SELECT id, message, timestamp, read_status, repeat_count
+        FROM notifications
+        WHERE user_id = ?
+        ORDER BY timestamp DESC, id DESC
+        LIMIT ?
+    """,
+    'user_notifications_before': """
+        SELECT id, message, timestamp, read_status, repeat_count
+        FROM notifications
+        WHERE user_id = ? AND (timestamp, id) < (?, ?)
+        ORDER BY timestamp DESC, id DESC
+        LIMIT ?
+    """,
+    'user_unread_notifications': """
+        SELECT id, message, timestamp, read_status, repeat_count
+        FROM notifications
+        WHERE user_id = ? AND read_status = {false}
+        ORDER BY timestamp DESC, id DESC
+        LIMIT ?
+    """,
+    'user_unread_notifications_before': """
+        SELECT id, message, timestamp, read_status, repeat_count
+        FROM notifications
+        WHERE user_id = ? AND read_status = {false} AND (timestamp, id) < (?, ?)
+        ORDER BY timestamp DESC, id DESC
+        LIMIT ?
+    """,
+    # Maintained by triggers on notifications (migration 8)
+    'user_unread_counter': "SELECT unread FROM notification_counters WHERE user_id = ?",
+    'delete_user_notification_counter': "DELETE FROM notification_counters WHERE user_id = ?",
+    'mark_notifications_read': """
+        UPDATE notifications
+        SET read_status = {true}
+        WHERE user_id = ? AND read_status = {false}
+    """,
+    'delete_user_notifications': "DELETE FROM notifications WHERE user_id = ?",
+    'delete_user_archived_notifications': "DELETE FROM notifications_archive WHERE user_id = ?",
+
+    # Notification retention. Coalescing and the per-user cap only look at rows
+    # added since the job's mark in retention_marks.
+    'retention_mark': "SELECT last_id FROM retention_marks WHERE job = ?",
+    'set_retention_mark': """
+        INSERT INTO retention_marks (job, last_id) VALUES (?, ?)
+        ON CONFLICT (job) DO UPDATE SET last_id = excluded.last_id
+    """,
+    # The highest id and count among the next N rows after a mark
+    'new_notifications_batch_end': """
+        SELECT MAX(id), COUNT(*) FROM (
+            SELECT id FROM notifications
+            WHERE id > ?
+            ORDER BY id LIMIT ?
+        ) batch
+    """,
+    'new_notification_groups': """
+        SELECT user_id, COALESCE(coalesce_key, message), read_status, MAX(id)
+        FROM notifications
+        WHERE id > ? AND id <= ?
+        GROUP BY user_id, COALESCE(coalesce_key, message), read_status
+    """,
+    'coalesce_group_total': """
+        SELECT COUNT(*), SUM(repeat_count)
+        FROM notifications
+        WHERE user_id = ? AND read_status = ? AND COALESCE(coalesce_key, message) = ? AND id <= ?
+    """,
+    'delete_coalesced_duplicates': """
+        DELETE FROM notifications
+        WHERE user_id = ? AND read_status = ? AND COALESCE(coalesce_key, message) = ? AND id < ?
+    """,
+    'set_notification_repeat_count': "UPDATE notifications SET repeat_count = ? WHERE id = ?",
+    # Batches walk idx_notifications_read_timestamp up to the Nth oldest expired row
+    'expired_batch_end': """
+        SELECT MAX(timestamp), COUNT(*) FROM (
+            SELECT timestamp FROM notifications
+            WHERE read_status = {true} AND timestamp < ?
+            ORDER BY timestamp LIMIT ?
+        ) batch
+    """,
+    'archive_expired': """
+        INSERT INTO notifications_archive (id, user_id, message, timestamp, read_status, repeat_count)
+        SELECT id, user_id, message, timestamp, read_status, repeat_count
+        FROM notifications
+        WHERE read_status = {true} AND timestamp < ? AND timestamp <= ?
+        ON CONFLICT (id) DO NOTHING
+    """,
+    'delete_expired': """
+        DELETE FROM notifications
+        WHERE read_status = {true} AND timestamp < ? AND timestamp <= ?
+    """,
+    'users_with_new_notifications': """
+        SELECT DISTINCT user_id FROM notifications
+        WHERE id > ? AND id <= ?
+    """,
+    'last_notification_id': "SELECT MAX(id) FROM notifications",
+    'notification_cap_cutoff': """
+        SELECT id FROM notifications
+        WHERE user_id = ?
+        ORDER BY id DESC LIMIT 1 OFFSET ?
+    """,
+    'over_cap_batch_end': """
+        SELECT MAX(id) FROM (
+            SELECT id FROM notifications
+            WHERE user_id = ? AND read_status = {true} AND id <= ?
+            ORDER BY id LIMIT ?
+        ) batch
+    """,
+    'archive_over_cap': """
+        INSERT INTO notifications_archive (id, user_id, message, timestamp, read_status, repeat_count)
+        SELECT id, user_id, message, timestamp, read_status, repeat_count
+        FROM notifications
+        WHERE user_id = ? AND read_status = {true} AND id <= ?
+        ON CONFLICT (id) DO NOTHING
+    """,
+    'delete_over_cap': """
+        DELETE FROM notifications
+        WHERE user_id = ? AND read_status = {true} AND id <= ?
+    """,
+
+    # Exports, in id order; the "id > ?" keyset lets a page continue where the last stopped
+    'export_users': """
+        SELECT id, name, email, location_city, location_state, location_country,
+               created_at, email_verified
+        FROM users
+        WHERE id > ?
+        ORDER BY id
+    """,
+    'export_user_profile': """
+        SELECT id, name, email, location_city, location_state, location_country,
+               created_at, email_verified
+        FROM users
+        WHERE id = ?
+    """,
+    'export_user_crops': """
+        SELECT uc.id, c.name
+        FROM user_crops uc
+        JOIN crops c ON c.id = uc.crop_id
+        WHERE uc.user_id = ? AND uc.id > ?
+        ORDER BY uc.id
+    """,
+    'export_user_schedules': """
+        SELECT ws.id, c.name, ws.last_watered, ws.next_watering, ws.watering_frequency,
+               ws.fertilization_schedule, ws.water_status
+        FROM watering_schedules ws
+        JOIN crops c ON c.id = ws.crop_id
+        WHERE ws.user_id = ? AND ws.id > ?
+        ORDER BY ws.id
+    """,
+    'export_user_notifications': """
+        SELECT id, message, timestamp, read_status, repeat_count
+        FROM notifications
+        WHERE user_id = ? AND id > ?
+        ORDER BY id
+    """,
+    'export_user_archived_notifications': """
+        SELECT id, message, timestamp, read_status, repeat_count, archived_at
+        FROM notifications_archive
+        WHERE user_id = ? AND id > ?
+        ORDER BY id
+    """,
+}
+
+
+# Server-side cursors need a name that is unique on their connection
+_cursor_ids = count()
+
+
+def dialect_of(conn):
+    """'sqlite' or 'postgres' for a pooled or raw connection."""
+    return 'sqlite' if is_sqlite(conn) else 'postgres'
+
+
+@lru_cache(maxsize=None)
+def render(name, dialect):
+    """SQL text for a named statement in the given dialect."""
+    sql = STATEMENTS[name]
+    if isinstance(sql, dict):
+        sql = sql[dialect]
+    sql = sql.format(**DIALECT_TOKENS[dialect])
+    if dialect == 'postgres':
+        # psycopg2 uses %s placeholders, so literal percent signs must be doubled
+        sql = sql.replace('%', '%%').replace('?', '%s')
+    return sql
+
+
+def run(cursor, name, params=()):
+    """Execute a named statement on the cursor and return the cursor."""
+    cursor.execute(render(name, dialect_of(cursor.connection)), params)
+    return cursor
+
+
+def insert_returning_id(cursor, name, params=()):
+    """Execute a named INSERT and return the id of the new row."""
+    run(cursor, name, params)
+    if dialect_of(cursor.connection) == 'sqlite':
+        return cursor.lastrowid
+    return cursor.fetchone()[0]
+
+
+def iter_batches(conn, name, params=(), batch_size=500):
+    """Yield a named query's rows in lists of up to batch_size, without loading them all.
+
+    PostgreSQL reads through a server-side (named) cursor, so only one batch
+    is held at a time; SQLite already produces rows as they are fetched.
+    """
+    dialect = dialect_of(conn)
+    if dialect == 'postgres':
+        from psycopg2.extras import DictCursor
+        cursor = conn.cursor(name=f'stream_{name}_{next(_cursor_ids)}', cursor_factory=DictCursor)
+        cursor.itersize = batch_size
+    else:
+        cursor = conn.cursor()
+    try:
+        cursor.execute(render(name, dialect), params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+
+
+@contextmanager
+def transaction(conn):
+    """Commit the block as one transaction, or roll it back if it raises."""
+    if is_sqlite(conn) and not conn.in_transaction:
+        # sqlite3 only opens a transaction implicitly before writes
+        conn.execute('BEGIN')
+    try:
+        yield conn
+    except Exception:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+
+def as_text(value):
+    """Dates come back as strings from SQLite and as date objects from PostgreSQL."""
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def as_bytes(value):
+    """Password hashes are BLOBs in SQLite and BYTEA (memoryview) in PostgreSQL."""
+    if isinstance(value, memoryview):
+        return value.tobytes()
+    if isinstance(value, str):
+        return value.encode('utf-8')
+    return value
@@ -1,20 +1,103 @@
+"""
+Copy PocketFarm data from SQLite into PostgreSQL.
+
+Each table is read in primary-key order, MIGRATION_BATCH_SIZE rows at a
+time (keyset pagination), and every batch is written with COPY into a
+staging table and merged with ON CONFLICT DO NOTHING. The batch and its
+checkpoint in sqlite_import_progress commit together, so an interrupted run
+picks up after the last committed batch. Tables with no foreign keys
+between them are copied in parallel. Afterwards sequences are moved past
+the copied ids and every table's row count and checksum are compared. Rows
+left out of the copy (orphans, or ones clashing with a PostgreSQL-only
+unique constraint) are recorded in sqlite_import_skipped, reported, and left
+out of the comparison.
+
+Usage: python setup_postgres.py [--sqlite PATH] [--workers N] [--batch N] [--restart] [--verify-only]
+"""
+
 import os
 import sys
+import io
+import time
+import hashlib
+import argparse
+import threading
 import psycopg2
 import sqlite3
-import csv
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
 from dotenv import load_dotenv
-from psycopg2.extras import execute_values
+from migrations import migrate
 
 # Load environment variables
 load_dotenv()
 
-def get_sqlite_connection():
+MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "5000"))
+MIGRATION_WORKERS = int(os.getenv("MIGRATION_WORKERS", "4"))
+
+# table: (key column, columns). Columns missing from an older SQLite file are skipped.
+TABLES = {
+    'users': ('id', ['id', 'name', 'email', 'password', 'phone', 'location_city', 'location_state',
+                     'location_country', 'location_latitude', 'location_longitude', 'email_verified']),
+    'crops': ('id', ['id', 'name', 'imageURL', 'scientific_name', 'description', 'origin',
+                     'growing_conditions', 'planting_info', 'care_instructions', 'storage_info',
+                     'nutritional_info', 'culinary_info']),
+    'crop_schedule': ('crop_name', ['crop_name', 'growing_time', 'watering_frequency', 'fertilization_schedule']),
+    'notifications_archive': ('id', ['id', 'user_id', 'message', 'timestamp', 'read_status',
+                                     'repeat_count', 'archived_at']),
+    'user_crops': ('id', ['id', 'user_id', 'crop_id']),
+    'watering_schedules': ('id', ['id', 'user_id', 'crop_id', 'watering_frequency', 'fertilization_schedule',
+                                  'last_watered', 'next_watering', 'water_status']),
+    'verification_tokens': ('id', ['id', 'user_id', 'token', 'expires_at']),
+    'notifications': ('id', ['id', 'user_id', 'message', 'timestamp', 'read_status', 'repeat_count',
+                             'coalesce_key']),
+    'notification_preferences': ('id', ['id', 'user_id', 'watering_reminders', 'weather_alerts']),
+}
+
+# SQLite doesn't enforce foreign keys, so rows whose parent is gone are left behind
+PARENTS = {
+    'user_crops': [('user_id', 'users'), ('crop_id', 'crops')],
+    'watering_schedules': [('user_id', 'users'), ('crop_id', 'crops')],
+    'verification_tokens': [('user_id', 'users')],
+    'notifications': [('user_id', 'users')],
+    'notification_preferences': [('user_id', 'users')],
+}
+
+# Tables in a wave only reference tables from earlier waves
+WAVES = [
+    ['users', 'crops', 'crop_schedule', 'notifications_archive'],
+    ['user_crops', 'watering_schedules', 'verification_tokens', 'notifications', 'notification_preferences'],
+]
+
+CREATE_PROGRESS_TABLE = '''
+    CREATE TABLE IF NOT EXISTS sqlite_import_progress (
+        table_name TEXT PRIMARY KEY,
+        last_key TEXT,
+        rows_copied BIGINT NOT NULL DEFAULT 0,
+        completed BOOLEAN NOT NULL DEFAULT FALSE,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+CREATE_SKIPPED_TABLE = '''
+    CREATE TABLE IF NOT EXISTS sqlite_import_skipped (
+        table_name TEXT NOT NULL,
+        key TEXT NOT NULL,
+        PRIMARY KEY (table_name, key)
+    )
+'''
+
+_print_lock = threading.Lock()
+
+
+def log(message):
+    with _print_lock:
+        print(message, flush=True)
+
+def get_sqlite_connection(path='PocketFarm.db'):
     """Connect to SQLite database"""
     try:
-        conn = sqlite3.connect('PocketFarm.db')
-        conn.row_factory = sqlite3.Row
+        conn = sqlite3.connect(path)
         return conn
     except sqlite3.Error as e:
         print(f"SQLite connection error: {e}")
@@ -26,7 +109,7 @@ def get_postgres_connection():
     if not db_url:
         print("Error: DATABASE_URL environment variable not set")
         sys.exit(1)
-        
+
     try:
         conn = psycopg2.connect(db_url)
         conn.autocommit = True
@@ -36,123 +119,320 @@ def get_postgres_connection():
         sys.exit(1)
 
 def setup_postgres_schema(pg_conn):
-    """Create PostgreSQL schema using schema_postgres.sql"""
-    cursor = pg_conn.cursor()
-    
+    """Create or upgrade the PostgreSQL schema with the migration runner"""
     try:
-        with open('schema_postgres.sql', 'r') as f:
-            sql_script = f.read()
-            cursor.execute(sql_script)
+        migrate(pg_conn)
+        pg_conn.cursor().execute(CREATE_PROGRESS_TABLE)
+        pg_conn.cursor().execute(CREATE_SKIPPED_TABLE)
         print("PostgreSQL schema created successfully")
     except Exception as e:
         print(f"Error creating PostgreSQL schema: {e}")
         sys.exit(1)
-    finally:
-        cursor.close()
 
-def migrate_table(sqlite_conn, pg_conn, table_name, columns):
-    """Migrate data from SQLite table to PostgreSQL table"""
-    sqlite_cursor = sqlite_conn.cursor()
+def sqlite_columns(sqlite_conn, table_name):
+    """Columns of a SQLite table, or an empty list if it doesn't exist."""
+    return [row[1] for row in sqlite_conn.execute(f"PRAGMA table_info({table_name})")]
+
+def table_columns(sqlite_conn, table_name):
+    key, wanted = TABLES[table_name]
+    present = set(sqlite_columns(sqlite_conn, table_name))
+    return key, [col for col in wanted if col in present]
+
+def _copy_text(value):
+    """One field in COPY's text format."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, (bytes, memoryview)):
+        # bytea hex input; the backslash is doubled because COPY reads \x.. as an escape itself
+        return '\\\\x' + bytes(value).hex()
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+def _load_checkpoint(pg_cursor, table_name, key):
+    pg_cursor.execute(
+        "SELECT last_key, rows_copied, completed FROM sqlite_import_progress WHERE table_name = %s",
+        (table_name,)
+    )
+    row = pg_cursor.fetchone()
+    if row is None:
+        return None, 0, False
+    last_key, rows_copied, completed = row
+    if last_key is not None and key == 'id':
+        last_key = int(last_key)
+    return last_key, rows_copied, completed
+
+def migrate_table(sqlite_path, table_name, batch_size=MIGRATION_BATCH_SIZE):
+    """Stream one SQLite table into PostgreSQL, resuming from its checkpoint"""
+    sqlite_conn = get_sqlite_connection(sqlite_path)
+    pg_conn = get_postgres_connection()
+    pg_conn.autocommit = False
     pg_cursor = pg_conn.cursor()
-    
+
     try:
-        # Get data from SQLite
-        sqlite_cursor.execute(f"SELECT {', '.join(columns)} FROM {table_name}")
-        rows = sqlite_cursor.fetchall()
-        
-        if not rows:
-            print(f"No data found in SQLite table '{table_name}'")
-            return
-            
-        # Convert to list of dicts
-        data = []
-        for row in rows:
-            row_dict = {}
-            for i, col in enumerate(columns):
-                row_dict[col] = row[i]
-            data.append(row_dict)
-            
-        # Insert into PostgreSQL
-        column_names = ', '.join(columns)
-        placeholders = ', '.join([f'%({col})s' for col in columns])
-        query = f"INSERT INTO {table_name} ({column_names}) VALUES ({placeholders}) ON CONFLICT DO NOTHING"
-        
-        # Execute in batches to avoid memory issues
-        batch_size = 100
-        for i in range(0, len(data), batch_size):
-            batch = data[i:i+batch_size]
-            pg_cursor.executemany(query, batch)
-            
+        key, columns = table_columns(sqlite_conn, table_name)
+        if not columns:
+            log(f"Skipping '{table_name}': not in the SQLite database")
+            return 0
+        cols = ', '.join(columns)
+
+        parents = ' AND '.join(f"{col} IN (SELECT id FROM {parent})" for col, parent in PARENTS.get(table_name, []))
+        merge = (
+            f"INSERT INTO {table_name} ({cols}) SELECT {cols} FROM import_{table_name} "
+            f"{'WHERE ' + parents if parents else ''} ON CONFLICT DO NOTHING"
+        )
+        skipped = 0
+
+        last_key, rows_copied, completed = _load_checkpoint(pg_cursor, table_name, key)
+        if completed:
+            log(f"'{table_name}' already migrated ({rows_copied} rows)")
+            return rows_copied
+        if last_key is not None:
+            log(f"Resuming '{table_name}' after {key} {last_key!r} ({rows_copied} rows already copied)")
+
+        key_index = columns.index(key)
+        # Rows are staged per batch and cleared on commit
+        pg_cursor.execute(
+            f"CREATE TEMP TABLE import_{table_name} ON COMMIT DELETE ROWS AS "
+            f"SELECT {cols} FROM {table_name} WITH NO DATA"
+        )
         pg_conn.commit()
-        print(f"Migrated {len(rows)} rows from '{table_name}'")
+
+        first_page = f"SELECT {cols} FROM {table_name} ORDER BY {key} LIMIT ?"
+        next_page = f"SELECT {cols} FROM {table_name} WHERE {key} > ? ORDER BY {key} LIMIT ?"
+        start = time.monotonic()
+
+        while True:
+            if last_key is None:
+                rows = sqlite_conn.execute(first_page, (batch_size,)).fetchall()
+            else:
+                rows = sqlite_conn.execute(next_page, (last_key, batch_size)).fetchall()
+            if not rows:
+                break
+
+            buffer = io.StringIO()
+            for row in rows:
+                buffer.write('\t'.join(_copy_text(value) for value in row))
+                buffer.write('\n')
+            buffer.seek(0)
+
+            last_key = rows[-1][key_index]
+            rows_copied += len(rows)
+            pg_cursor.copy_expert(f"COPY import_{table_name} ({cols}) FROM STDIN", buffer)
+            pg_cursor.execute(merge)
+            # Rows whose key didn't land: orphans, or clashes with another unique constraint
+            pg_cursor.execute(
+                f"SELECT s.{key} FROM import_{table_name} s "
+                f"WHERE NOT EXISTS (SELECT 1 FROM {table_name} t WHERE t.{key} = s.{key})"
+            )
+            skipped_keys = [(table_name, str(row[0])) for row in pg_cursor.fetchall()]
+            if skipped_keys:
+                pg_cursor.executemany(
+                    "INSERT INTO sqlite_import_skipped (table_name, key) VALUES (%s, %s) ON CONFLICT DO NOTHING",
+                    skipped_keys
+                )
+                skipped += len(skipped_keys)
+            pg_cursor.execute('''
+                INSERT INTO sqlite_import_progress (table_name, last_key, rows_copied, updated_at)
+                VALUES (%s, %s, %s, CURRENT_TIMESTAMP)
+                ON CONFLICT (table_name) DO UPDATE
+                SET last_key = excluded.last_key, rows_copied = excluded.rows_copied, updated_at = excluded.updated_at
+            ''', (table_name, str(last_key), rows_copied))
+            # The batch and its checkpoint commit together
+            pg_conn.commit()
+
+            if len(rows) < batch_size:
+                break
+            if rows_copied % (batch_size * 20) == 0:
+                log(f"  '{table_name}': {rows_copied} rows")
+
+        pg_cursor.execute('''
+            INSERT INTO sqlite_import_progress (table_name, rows_copied, completed, updated_at)
+            VALUES (%s, %s, TRUE, CURRENT_TIMESTAMP)
+            ON CONFLICT (table_name) DO UPDATE
+            SET rows_copied = excluded.rows_copied, completed = TRUE, updated_at = excluded.updated_at
+        ''', (table_name, rows_copied))
+        pg_conn.commit()
+
+        elapsed = time.monotonic() - start
+        rate = rows_copied / elapsed if elapsed > 0 else 0
+        log(f"Migrated {rows_copied} rows from '{table_name}' in {elapsed:.1f}s ({rate:.0f} rows/s)"
+            + (f", {skipped} skipped as orphaned or conflicting" if skipped else ''))
+        return rows_copied
     except Exception as e:
-        print(f"Error migrating table '{table_name}': {e}")
+        pg_conn.rollback()
+        log(f"Error migrating table '{table_name}': {e}")
+        raise
+    finally:
+        pg_cursor.close()
+        pg_conn.close()
+        sqlite_conn.close()
+
+def reset_sequences(pg_conn):
+    """Move each id sequence past the ids copied from SQLite"""
+    pg_cursor = pg_conn.cursor()
+    try:
+        for table_name, (key, _) in TABLES.items():
+            if key != 'id':
+                continue
+            # pg_get_serial_sequence is NULL for tables whose ids aren't SERIAL
+            pg_cursor.execute(f'''
+                SELECT setval(seq, COALESCE(MAX(id), 1), MAX(id) IS NOT NULL)
+                FROM {table_name}, pg_get_serial_sequence('{table_name}', 'id') AS seq
+                WHERE seq IS NOT NULL
+                GROUP BY seq
+            ''')
+        print("Sequences reset")
     finally:
-        sqlite_cursor.close()
         pg_cursor.close()
 
-def import_crop_data(pg_conn):
-    """Import crop data from CSV files if available"""
+def _normalizer(data_type):
+    """Convert a value from either database to one comparable form for a PostgreSQL column type."""
+    def to_bool(v):
+        return v if isinstance(v, bool) else str(v).lower() in ('1', 't', 'true')
+
+    def to_date(v):
+        return v if isinstance(v, date) and not isinstance(v, datetime) else date.fromisoformat(str(v)[:10])
+
+    def to_timestamp(v):
+        if not isinstance(v, datetime):
+            # SQLite timestamps are naive UTC text
+            v = datetime.fromisoformat(str(v))
+        if v.tzinfo is not None:
+            v = v.astimezone(timezone.utc).replace(tzinfo=None)
+        return v
+
+    def to_bytes(v):
+        # bcrypt hashes are BLOBs in SQLite and bytea (memoryview) in PostgreSQL
+        return v.encode() if isinstance(v, str) else bytes(v)
+
+    convert = {
+        'boolean': to_bool,
+        'bytea': to_bytes,
+        'smallint': int,
+        'integer': int,
+        'bigint': int,
+        'real': lambda v: round(float(v), 6),
+        'double precision': lambda v: round(float(v), 6),
+        'numeric': lambda v: round(float(v), 6),
+        'date': to_date,
+        'timestamp without time zone': to_timestamp,
+        'timestamp with time zone': to_timestamp,
+    }.get(data_type, str)
+
+    def normalize(value):
+        if value is None:
+            return None
+        try:
+            return convert(value)
+        except (TypeError, ValueError):
+            return str(value)
+    return normalize
+
+def _checksum(rows, normalizers):
+    """Order-independent checksum and row count over a stream of rows"""
+    total = 0
+    count = 0
+    for row in rows:
+        values = tuple(normalize(value) for normalize, value in zip(normalizers, row))
+        digest = hashlib.blake2b(repr(values).encode(), digest_size=8).digest()
+        total = (total + int.from_bytes(digest, 'big')) % (1 << 64)
+        count += 1
+    return count, total
+
+def verify_table(sqlite_path, table_name, batch_size=MIGRATION_BATCH_SIZE):
+    """Compare row counts and checksums for one table; returns True when they match"""
+    sqlite_conn = get_sqlite_connection(sqlite_path)
+    pg_conn = get_postgres_connection()
+    pg_conn.autocommit = False
+
     try:
-        # Check if crop data files exist
-        if os.path.exists('crop.csv'):
-            crop_data = pd.read_csv('crop.csv')
-            
-            pg_cursor = pg_conn.cursor()
-            
-            # Clear existing data if needed
-            pg_cursor.execute("DELETE FROM crop_schedule")
-            
-            # Process each row
-            for _, row in crop_data.iterrows():
-                pg_cursor.execute(
-                    "INSERT INTO crop_schedule (crop_name, growing_time, watering_frequency, fertilization_schedule) VALUES (%s, %s, %s, %s)",
-                    (row['crop_name'], row['growing_time'], row['watering_frequency'], row['fertilization_schedule'])
-                )
-                
-            pg_conn.commit()
-            print("Crop schedule data imported successfully")
-    except Exception as e:
-        print(f"Error importing crop data: {e}")
+        key, columns = table_columns(sqlite_conn, table_name)
+        if not columns:
+            return True
+        cols = ', '.join(columns)
+
+        pg_cursor = pg_conn.cursor()
+        pg_cursor.execute(
+            "SELECT column_name, data_type FROM information_schema.columns WHERE table_name = %s",
+            (table_name,)
+        )
+        types = {name: data_type for name, data_type in pg_cursor.fetchall()}
+        pg_cursor.close()
+        normalizers = [_normalizer(types.get(col.lower(), 'text')) for col in columns]
+
+        pg_cursor = pg_conn.cursor()
+        pg_cursor.execute("SELECT key FROM sqlite_import_skipped WHERE table_name = %s", (table_name,))
+        skipped = {row[0] for row in pg_cursor.fetchall()}
+        pg_cursor.close()
+
+        # Compare only the rows the migration copied
+        key_index = columns.index(key)
+        sqlite_rows = (row for row in sqlite_conn.execute(f"SELECT {cols} FROM {table_name}")
+                       if str(row[key_index]) not in skipped)
+        sqlite_count, sqlite_sum = _checksum(sqlite_rows, normalizers)
+
+        # A named cursor streams from the server instead of loading the table
+        stream = pg_conn.cursor(name=f'verify_{table_name}')
+        stream.itersize = batch_size
+        stream.execute(f"SELECT {cols} FROM {table_name}")
+        pg_count, pg_sum = _checksum(stream, normalizers)
+        stream.close()
+
+        ok = sqlite_count == pg_count and sqlite_sum == pg_sum
+        status = 'OK' if ok else 'MISMATCH'
+        log(f"{status:<8} {table_name}: sqlite {sqlite_count} rows / {sqlite_sum:016x}, "
+            f"postgres {pg_count} rows / {pg_sum:016x}"
+            + (f" ({len(skipped)} sqlite rows skipped during copy)" if skipped else ''))
+        return ok
+    finally:
+        pg_conn.rollback()
+        pg_conn.close()
+        sqlite_conn.close()
+
+def run_in_parallel(fn, sqlite_path, tables, workers, **kwargs):
+    """Run fn(sqlite_path, table) for each table on a thread pool; returns {table: result}"""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {table: pool.submit(fn, sqlite_path, table, **kwargs) for table in tables}
+        return {table: future.result() for table, future in futures.items()}
 
 def main():
+    parser = argparse.ArgumentParser(description="Copy PocketFarm data from SQLite into PostgreSQL")
+    parser.add_argument('--sqlite', default='PocketFarm.db', help="SQLite database to read")
+    parser.add_argument('--workers', type=int, default=MIGRATION_WORKERS, help="tables copied at once")
+    parser.add_argument('--batch', type=int, default=MIGRATION_BATCH_SIZE, help="rows per COPY batch")
+    parser.add_argument('--restart', action='store_true', help="ignore checkpoints from earlier runs")
+    parser.add_argument('--verify-only', action='store_true', help="only compare counts and checksums")
+    args = parser.parse_args()
+
     print("Starting database migration from SQLite to PostgreSQL...")
-    
-    # Connect to both databases
-    sqlite_conn = get_sqlite_connection()
+    start = time.monotonic()
+
     pg_conn = get_postgres_connection()
-    
+
     # Setup PostgreSQL schema
     setup_postgres_schema(pg_conn)
-    
-    # Define table structures to migrate
-    tables = {
-        'users': ['id', 'name', 'email', 'password', 'phone', 'location_city', 'location_state', 
-                 'location_country', 'location_latitude', 'location_longitude', 'email_verified'],
-        'crops': ['id', 'name', 'imageURL', 'scientific_name', 'description', 'origin', 
-                 'growing_conditions', 'planting_info', 'care_instructions', 'storage_info', 
-                 'nutritional_info', 'culinary_info'],
-        'crop_schedule': ['id', 'crop_name', 'growing_time', 'watering_frequency', 'fertilization_schedule'],
-        'user_crops': ['id', 'user_id', 'crop_id'],
-        'watering_schedules': ['id', 'user_id', 'crop_id', 'watering_frequency', 'fertilization_schedule', 
-                              'last_watered', 'next_watering', 'water_status'],
-        'verification_tokens': ['id', 'user_id', 'token', 'expires_at'],
-        'notifications': ['id', 'user_id', 'message', 'timestamp', 'read_status'],
-        'notification_preferences': ['id', 'user_id', 'weather_alerts']
-    }
-    
-    # Migrate each table
-    for table, columns in tables.items():
-        migrate_table(sqlite_conn, pg_conn, table, columns)
-    
-    # Import additional crop data if needed
-    import_crop_data(pg_conn)
-    
-    # Close connections
-    sqlite_conn.close()
+
+    if not args.verify_only:
+        if args.restart:
+            pg_conn.cursor().execute("DELETE FROM sqlite_import_progress")
+            pg_conn.cursor().execute("DELETE FROM sqlite_import_skipped")
+
+        try:
+            for wave in WAVES:
+                run_in_parallel(migrate_table, args.sqlite, wave, args.workers, batch_size=args.batch)
+        except Exception:
+            print("Migration stopped; run again to resume from the last checkpoint")
+            pg_conn.close()
+            sys.exit(1)
+
+        reset_sequences(pg_conn)
+
+    results = run_in_parallel(verify_table, args.sqlite, list(TABLES), args.workers, batch_size=args.batch)
     pg_conn.close()
-    
-    print("Migration completed successfully")
+
+    if not all(results.values()):
+        print(f"Migration finished with mismatches in: {', '.join(t for t, ok in results.items() if not ok)}")
+        sys.exit(1)
+    print(f"Migration completed successfully in {time.monotonic() - start:.1f}s")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
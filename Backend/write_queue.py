@@ -0,0 +1,199 @@
+"""
+Optional single-writer path for SQLite.
+
+With SQLITE_WRITE_QUEUE=true every execute_write() call is handed to one
+writer thread instead of committing on the caller's own connection. The
+writer drains whatever has queued up (up to WRITE_QUEUE_MAX_BATCH), runs
+each piece of work inside its own savepoint and commits the whole batch at
+once, so concurrent writers share one commit instead of fighting over the
+database lock. Callers block on a future until the batch holding their
+write has committed.
+
+A write that raises is rolled back to its savepoint and the exception is
+re-raised in the caller; the rest of the batch still commits. PostgreSQL
+handles concurrent writers itself, so there the work runs directly.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from database_config import get_db, get_cursor, use_postgres, configure_sqlite
+from queries import transaction
+
+SQLITE_WRITE_QUEUE = os.getenv("SQLITE_WRITE_QUEUE", "false").lower() == "true"
+WRITE_QUEUE_MAX_BATCH = int(os.getenv("WRITE_QUEUE_MAX_BATCH", "64"))
+WRITE_QUEUE_TIMEOUT = float(os.getenv("WRITE_QUEUE_TIMEOUT", "30"))  # seconds a caller waits for its commit
+
+
+class WriteQueueStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.writes = 0
+        self.failed_writes = 0
+        self.failed_batches = 0
+        self.max_batch = 0
+        self.commit_time_total = 0.0
+
+    def batch_done(self, size, failed, commit_time):
+        with self._lock:
+            self.batches += 1
+            self.writes += size
+            self.failed_writes += failed
+            self.max_batch = max(self.max_batch, size)
+            self.commit_time_total += commit_time
+
+    def batch_failed(self, size):
+        with self._lock:
+            self.failed_batches += 1
+            self.failed_writes += size
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'batches': self.batches,
+                'writes': self.writes,
+                'failed_writes': self.failed_writes,
+                'failed_batches': self.failed_batches,
+                'avg_batch_size': round(self.writes / self.batches, 2) if self.batches else 0.0,
+                'max_batch_size': self.max_batch,
+                'avg_commit_ms': round(self.commit_time_total * 1000 / self.batches, 3) if self.batches else 0.0,
+            }
+
+
+class WriteQueue:
+    """One writer thread with its own connection, committing queued work in groups."""
+
+    def __init__(self, db_path, max_batch=WRITE_QUEUE_MAX_BATCH):
+        self.db_path = db_path
+        self.max_batch = max_batch
+        self.stats = WriteQueueStats()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, work):
+        """Queue work(cursor) and return a Future for its result."""
+        future = Future()
+        self._queue.put((work, future))
+        return future
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def _connect(self):
+        # Autocommit mode: the writer issues BEGIN/SAVEPOINT/COMMIT itself
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return configure_sqlite(conn)
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        conn = self._connect()
+        while True:
+            batch = self._next_batch()
+            # Skip callers that gave up before their write started
+            batch = [(work, future) for work, future in batch if future.set_running_or_notify_cancel()]
+            if batch:
+                self._commit_batch(conn, batch)
+
+    def _commit_batch(self, conn, batch):
+        outcomes = []
+        failed = 0
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            for work, future in batch:
+                cursor.execute('SAVEPOINT write')
+                try:
+                    outcomes.append((True, work(cursor)))
+                    cursor.execute('RELEASE write')
+                except Exception as e:
+                    cursor.execute('ROLLBACK TO write')
+                    cursor.execute('RELEASE write')
+                    outcomes.append((False, e))
+                    failed += 1
+            start = time.monotonic()
+            cursor.execute('COMMIT')
+            commit_time = time.monotonic() - start
+        except Exception as e:
+            # The batch as a whole failed (lock timeout, disk error): nothing was committed
+            if conn.in_transaction:
+                conn.rollback()
+            self.stats.batch_failed(len(batch))
+            print(f"Error committing write batch: {str(e)}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        finally:
+            cursor.close()
+
+        self.stats.batch_done(len(batch), failed, commit_time)
+        # Results are only released once the batch is durable
+        for (_, future), (ok, value) in zip(batch, outcomes):
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+
+_write_queue = None
+_write_queue_lock = threading.Lock()
+
+
+def write_queue_enabled():
+    return SQLITE_WRITE_QUEUE and not use_postgres()
+
+
+def get_write_queue():
+    """Start the writer thread on first use."""
+    global _write_queue
+    if _write_queue is None:
+        with _write_queue_lock:
+            if _write_queue is None:
+                _write_queue = WriteQueue(os.getenv("DATABASE_URL", "PocketFarm.db"))
+    return _write_queue
+
+
+def execute_write(work):
+    """Run work(cursor) in a write transaction and return what it returns."""
+    if write_queue_enabled():
+        future = get_write_queue().submit(work)
+        try:
+            return future.result(timeout=WRITE_QUEUE_TIMEOUT)
+        except FutureTimeout:
+            # Only stops the write if the writer hasn't picked it up yet
+            future.cancel()
+            raise
+
+    conn = get_db()
+    try:
+        cursor = get_cursor(conn)
+        try:
+            with transaction(conn):
+                return work(cursor)
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
+
+
+def write_queue_stats():
+    """Batch counters for the metrics endpoint."""
+    if not write_queue_enabled():
+        return {'enabled': False}
+    stats = get_write_queue().stats.as_dict()
+    stats.update({'enabled': True, 'queue_depth': get_write_queue().depth(), 'max_batch': WRITE_QUEUE_MAX_BATCH})
+    return stats
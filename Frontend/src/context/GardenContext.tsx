@@ -1,7 +1,9 @@
-import React, { createContext, useContext, useEffect, useState } from 'react';
+import React, { createContext, useContext, useEffect, useRef, useState } from 'react';
 import { useAuth } from './AuthContext';
 import axios from 'axios';
 import { toast } from 'sonner';
+import { useQuery } from '@tanstack/react-query';
+import { fetchHomeDashboard, homeDashboardQueryKey } from '@/utils/api/dashboardApi';
 
 interface GardenContextType {
   userCrops: string[];
@@ -15,41 +17,52 @@ export const GardenProvider: React.FC<{ children: React.ReactNode }> = ({ childr
   const { user } = useAuth();
   const [userCrops, setUserCrops] = useState<string[]>([]);
 
-  // Fetch the user's garden crops when the user changes
+  const seededFor = useRef<number | null>(null);
+
+  // The garden comes from the home screen dashboard, which the Dashboard page shares
+  const { data: dashboard, error: dashboardError } = useQuery({
+    queryKey: homeDashboardQueryKey(user?.id),
+    queryFn: () => fetchHomeDashboard(user!.id),
+    enabled: !!user?.id,
+  });
+
   useEffect(() => {
-    const fetchUserCrops = async () => {
-      if (user?.id) {
+    if (dashboardError) {
+      console.error('Error fetching user crops:', dashboardError);
+      toast.error('Failed to load your garden');
+    }
+  }, [dashboardError]);
+
+  // Seed the garden once per user; later changes are tracked locally
+  useEffect(() => {
+    const ensureSchedules = async (userId: number, crops: string[]) => {
+      // Create schedules for all crops
+      for (const crop of crops) {
         try {
-          const response = await axios.get('https://pocketfarm1.onrender.com/get_user_crops', {
-            headers: {
-              'Authorization': `Bearer ${user.id}`,
-            },
+          await axios.post('https://pocketfarm1.onrender.com/user_schedule', {
+            user_id: Number(userId),
+            crop_name: crop,
           });
-
-          const crops = response.data;
-          setUserCrops(crops);
-          
-          // Create schedules for all crops
-          for (const crop of crops) {
-            try {
-              await axios.post('https://pocketfarm1.onrender.com/user_schedule', {
-                user_id: Number(user.id),
-                crop_name: crop,
-              });
-            } catch (error) {
-              console.error(`Error creating schedule for ${crop}:`, error);
-              // Don't show error toast for schedule creation as it's not critical
-            }
-          }
         } catch (error) {
-          console.error('Error fetching user crops:', error);
-          toast.error('Failed to load your garden');
+          console.error(`Error creating schedule for ${crop}:`, error);
+          // Don't show error toast for schedule creation as it's not critical
         }
       }
     };
 
-    fetchUserCrops();
-  }, [user?.id]);
+    if (!user?.id) {
+      seededFor.current = null;
+      setUserCrops([]);
+      return;
+    }
+    if (!dashboard?.crops || seededFor.current === user.id) {
+      return;
+    }
+    seededFor.current = user.id;
+    const crops = dashboard.crops.map((crop) => crop.name);
+    setUserCrops(crops);
+    ensureSchedules(user.id, crops);
+  }, [user?.id, dashboard]);
 
   const addCropToGarden = async (cropName: string) => {
     if (!user?.id) {
@@ -11,7 +11,7 @@ import { Crop } from '@/utils/types/cropTypes';
 import { toast } from 'sonner';
 import CropCard from '@/components/CropCard';
 import { useQuery } from '@tanstack/react-query';
-import axios from 'axios';
+import { fetchHomeDashboard, homeDashboardCity, homeDashboardQueryKey } from '@/utils/api/dashboardApi';
 import BottomNavigation from '@/components/BottomNavigation';
 import Header from '@/components/Header';
 
@@ -35,33 +35,43 @@ const Dashboard: React.FC = () => {
   const [cropDetails, setCropDetails] = useState<Crop[]>([]);
   const [notifications, setNotifications] = useState<Notification[]>([]);
 
-  // Fetch notifications
-  const { data: userNotifications } = useQuery({
-    queryKey: ['userNotifications', user?.id],
-    queryFn: async () => {
-      if (!user) return [];
-      try {
-        const response = await axios.get(`https://pocketfarm1.onrender.com/notifications/${Number(user.id)}`);
-        return response.data;
-      } catch (error) {
-        console.error('Error fetching notifications:', error);
-        return [];
-      }
-    },
+  // Crops, notifications and weather come in one request shared with GardenContext
+  const { data: dashboard } = useQuery({
+    queryKey: homeDashboardQueryKey(user?.id),
+    queryFn: () => fetchHomeDashboard(user!.id),
     enabled: !!user,
   });
+  const [dashboardCity] = useState(homeDashboardCity);
 
   useEffect(() => {
-    if (userNotifications) {
-      setNotifications(userNotifications);
+    if (dashboard?.notifications) {
+      setNotifications(dashboard.notifications.items);
+    }
+    if (dashboard?.weather) {
+      setWeatherInfo({
+        temp: dashboard.weather.temp,
+        condition: dashboard.weather.condition,
+        icon: dashboard.weather.icon,
+      });
+    } else if (dashboard && dashboardCity) {
+      // The dashboard left the weather out because the lookup was slow
+      fetchWeatherData(dashboardCity);
     }
-  }, [userNotifications]);
+  }, [dashboard]);
 
-  // Fetch crop details for the user's garden crops
+  // Fetch crop details for the user's garden crops the dashboard didn't include
   useEffect(() => {
+    const known = new Map<string, Crop>();
+    (dashboard?.crops || []).forEach((crop) => known.set(crop.name, crop));
+    cropDetails.forEach((crop) => known.set(crop.name, crop));
+
     const fetchCropDetails = async () => {
       try {
         const cropDetailsPromises = userCrops.map(async (cropName) => {
+          const knownCrop = known.get(cropName);
+          if (knownCrop) {
+            return knownCrop;
+          }
           const response = await fetch(`https://pocketfarm1.onrender.com/crop/${cropName}`);
           if (!response.ok) {
             throw new Error(`Failed to fetch details for ${cropName}`);
@@ -77,10 +87,8 @@ const Dashboard: React.FC = () => {
       }
     };
 
-    if (userCrops.length > 0) {
-      fetchCropDetails();
-    }
-  }, [userCrops]);
+    fetchCropDetails();
+  }, [userCrops, dashboard]);
 
   // Fetch weather data from the backend
   const fetchWeatherData = async (location: string) => {
@@ -135,8 +143,8 @@ const Dashboard: React.FC = () => {
         const location = await requestLocationPermission();
         setUserLocation(location);
 
-        // Fetch weather data for the user's location
-        if (location.city) {
+        // The dashboard already has the weather for the stored city
+        if (location.city && location.city !== dashboardCity) {
           fetchWeatherData(location.city);
         }
       } catch (error) {
@@ -153,7 +161,9 @@ const Dashboard: React.FC = () => {
         toast.info('Using default location (Kochi). Some features may be limited.');
 
         // Fetch weather data for the fallback location
-        fetchWeatherData(fallbackLocation.city);
+        if (fallbackLocation.city !== dashboardCity) {
+          fetchWeatherData(fallbackLocation.city);
+        }
       } finally {
         setIsLoadingLocation(false);
       }
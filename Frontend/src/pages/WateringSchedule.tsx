@@ -13,6 +13,7 @@ import { Dialog, DialogContent, DialogHeader, DialogTitle, DialogDescription } f
 import { format, addDays, isSameDay, parseISO } from 'date-fns';
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import axios from 'axios';
+import { fetchDashboard } from '@/utils/api/dashboardApi';
 import { Calendar } from '@/components/ui/calendar';
 import BottomNavigation from '@/components/BottomNavigation';
 import { useNavigationHistory } from '@/utils/useNavigationHistory';
@@ -49,37 +50,22 @@ const WateringSchedule: React.FC = () => {
   const [localWateredStatus, setLocalWateredStatus] = useState<Record<string, boolean>>({});
   const { goBack } = useNavigationHistory('/garden');
 
-  // Fetch user's crop schedules
-  const { data: cropSchedules, isLoading: isLoadingSchedules } = useQuery({
+  // Fetch user's crop schedules and notifications in one dashboard request
+  const { data: scheduleDashboard, isLoading: isLoadingSchedules } = useQuery({
     queryKey: ['userCropSchedules', user?.id],
     queryFn: async () => {
-      if (!user) return [];
+      if (!user) return null;
       try {
-        const response = await axios.get(`https://pocketfarm1.onrender.com/user_schedule/${Number(user.id)}`);
-        return response.data;
+        return await fetchDashboard(user.id, { sections: 'schedules,notifications' });
       } catch (error) {
         console.error('Error fetching schedules:', error);
-        return [];
-      }
-    },
-    enabled: !!user,
-  });
-
-  // Fetch notifications
-  const { data: userNotifications } = useQuery({
-    queryKey: ['userNotifications', user?.id],
-    queryFn: async () => {
-      if (!user) return [];
-      try {
-        const response = await axios.get(`https://pocketfarm1.onrender.com/notifications/${Number(user.id)}`);
-        return response.data;
-      } catch (error) {
-        console.error('Error fetching notifications:', error);
-        return [];
+        return null;
       }
     },
     enabled: !!user,
   });
+  const cropSchedules = scheduleDashboard?.schedules;
+  const userNotifications = scheduleDashboard?.notifications?.items;
 
   // Update localWateredStatus when cropSchedules changes
   useEffect(() => {
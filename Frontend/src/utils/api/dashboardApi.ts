@@ -0,0 +1,62 @@
+import axios from 'axios';
+import { Crop } from '../types/cropTypes';
+import { getUserLocation } from '../locationUtils';
+import config from '../../config';
+
+// Base URL constant for API calls now from config
+const API_BASE_URL = config.API_BASE_URL;
+
+export interface DashboardNotification {
+  id: number;
+  message: string;
+  timestamp: string;
+  read: boolean;
+  count?: number;
+}
+
+export interface DashboardWeather {
+  temp: number;
+  condition: string;
+  humidity: number;
+  wind_speed: number;
+  icon: string;
+}
+
+export interface DashboardData {
+  user_id: number;
+  crops?: Crop[];
+  schedules?: any[];
+  notifications?: {
+    items: DashboardNotification[];
+    unread: number;
+    next_cursor: string | null;
+  };
+  weather?: DashboardWeather | null;
+}
+
+// Fetch any subset of the home screen sections in one request
+export const fetchDashboard = async (
+  userId: string | number,
+  params: Record<string, string> = {}
+): Promise<DashboardData> => {
+  const response = await axios.get(`${API_BASE_URL}/dashboard/${Number(userId)}`, { params });
+  return response.data;
+};
+
+// The home screen query is shared by GardenContext and Dashboard so it only runs once
+export const homeDashboardQueryKey = (userId?: string | number) => ['dashboard', userId];
+
+// City the home screen asked the weather for, so a matching geolocation can skip /weather
+export const homeDashboardCity = (): string | undefined => getUserLocation()?.city || undefined;
+
+export const fetchHomeDashboard = (userId: string | number): Promise<DashboardData> => {
+  const params: Record<string, string> = {
+    sections: 'crops,notifications,weather',
+    crop_view: 'full',
+  };
+  const city = homeDashboardCity();
+  if (city) {
+    params.location = city;
+  }
+  return fetchDashboard(userId, params);
+};
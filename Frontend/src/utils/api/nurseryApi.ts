@@ -6,6 +6,9 @@ import config from '../../config';
 // Base URL constant for API calls now from config
 const API_BASE_URL = config.API_BASE_URL;
 
+// The backend widens its search until it has found this many nurseries
+const NEARBY_NURSERY_LIMIT = 50;
+
 // Fetch nearby nurseries using Overpass API
 export const fetchNearbyNurseries = async (latitude: number, longitude: number): Promise<Nursery[]> => {
   console.log('Fetching nurseries near:', { latitude, longitude });
@@ -24,6 +27,8 @@ export const fetchNearbyNurseries = async (latitude: number, longitude: number):
         body: JSON.stringify({
           latitude,
           longitude,
+          search: 'adaptive',
+          limit: NEARBY_NURSERY_LIMIT,
         }),
         credentials: 'include', // Add credentials for cookie-based authentication if needed
       });
@@ -278,6 +283,8 @@ const checkAddressUpdates = async (nurseries: Nursery[]): Promise<Nursery[]> =>
       body: JSON.stringify({
         latitude: firstNursery.latitude || firstNursery.lat,
         longitude: firstNursery.longitude || firstNursery.lon,
+        search: 'adaptive',
+        limit: NEARBY_NURSERY_LIMIT,
       }),
     });
 